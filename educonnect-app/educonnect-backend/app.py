@@ -1,4 +1,7 @@
-from flask import Flask, request, jsonify, send_file
+import serving
+serving.patch()  # SOCKETIO_ASYNC_MODE=gevent/eventlet: must run before the imports below
+
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
@@ -35,13 +38,30 @@ from flask_bcrypt import check_password_hash, generate_password_hash
 from flask import Flask, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ml_matcher import RLTutorMatchingSystem
+from model_registry import ModelRegistry
+from experiments import COUNTER_FIELDS, Experiment, ExperimentRegistry, summarize_arm
+from event_log import EventLogWriter, iter_chunks, csv_stream, npz_stream
+from message_writer import GroupCommitWriter
+from notification_dispatch import NotificationDispatcher, NotificationCoalescer
+from presence import PresenceRegistry, SharedPresenceRegistry, PresenceFanout
+from socket_broker import socketio_options, presence_store_url, open_store
+from serving import ASYNC_MODE, offload
+from typing_throttle import TypingThrottle
 from sqlalchemy import event
+from sqlalchemy.orm import contains_eager, load_only
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.engine import Engine
 load_dotenv()
 import cloudinary
 import cloudinary.uploader
 import hashlib
 import time
+import threading
+import queue
+import atexit
+import click
+import base64
+import binascii
 import uuid
 import urllib.parse
 import requests
@@ -134,22 +154,82 @@ cloudinary.config(
 os.environ['OPENBLAS_NUM_THREADS'] = '1'
 os.environ['MKL_NUM_THREADS'] = '1'
 
-rl_system = RLTutorMatchingSystem()
+initial_model = RLTutorMatchingSystem(
+    state_buckets=int(os.getenv('RL_STATE_BUCKETS', 4096)),
+    coarse_states=os.getenv('RL_COARSE_STATES', 'True') == 'True'
+)
 
-MODEL_PATH = 'rl_model.pkl'
+MODEL_PATH = 'rl_model.pkl'  # seeds the first model version of a fresh database
+# Retrained models to load as new versions, plus every version's pickle
+# (versions/) and online-learning checkpoint (checkpoints/). With several
+# workers or hosts this must be storage they all share.
+MODEL_DIR = os.getenv('MODEL_DIR', 'models')
+MODEL_SYNC_INTERVAL = float(os.getenv('MODEL_SYNC_INTERVAL', '15'))  # seconds
 if os.path.exists(MODEL_PATH):
-    rl_system.load_model(MODEL_PATH)
+    initial_model.load_model(MODEL_PATH)
     print("✓ Loaded existing RL model")
 else:
     print("✓ Starting with fresh RL model")
 
+# Handlers call current_model() once and use that snapshot for the whole
+# request, so a hot swap never changes the model under an in-flight call.
+# The registry is this worker's cache; the ModelVersion table says which
+# version is active and every worker follows it (see sync_active_model).
+model_registry = ModelRegistry(
+    initial_model,
+    description=MODEL_PATH if os.path.exists(MODEL_PATH) else 'fresh model',
+    version_id='startup'
+)
+del initial_model
+
+
+def current_model():
+    """The active RLTutorMatchingSystem version"""
+    return current_model_version()[1]
+
+
+def current_model_version():
+    """(version_id, model) of the active version, read together"""
+    if not _model_sync_started:
+        ensure_model_sync()
+    return model_registry.snapshot()
+
+
+# A/B tests between matcher configurations (see experiments.py). The
+# running one is an ExperimentRun row that every worker follows, checked
+# every EXPERIMENT_SYNC_INTERVAL seconds; counters live in memory and each
+# worker adds its own to ExperimentArmStats every EXPERIMENT_FLUSH_INTERVAL
+experiments = ExperimentRegistry()
+EXPERIMENT_FLUSH_INTERVAL = int(os.getenv('EXPERIMENT_FLUSH_INTERVAL', '30'))  # seconds
+EXPERIMENT_SYNC_INTERVAL = int(os.getenv('EXPERIMENT_SYNC_INTERVAL', '15'))  # seconds
+
 update_counter = 0
+learned_outcomes = {}  # version id -> outcomes this worker learned on it online
+active_checkpoint = None  # where the active version's online learning is saved
+_model_sync_started = False
+_model_sync_lock = threading.Lock()
 
 db = SQLAlchemy()
 app = Flask(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
-active_connections = {}  # {user_id: sid}
-user_rooms = {}  # {user_id: [room_ids]}
+# Several processes can serve sockets when SOCKETIO_MESSAGE_QUEUE is set:
+# any Flask-SocketIO queue URL (redis://...) relays emits between them, and
+# broker://host:port is the stand-in from socket_broker.py. Presence then
+# lives in PRESENCE_STORE_URL (redis:// or broker://), which defaults to the
+# queue URL only when that is redis:// or broker:// and is required otherwise
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+PRESENCE_STORE_URL = presence_store_url(SOCKETIO_MESSAGE_QUEUE, os.getenv('PRESENCE_STORE_URL'))
+PRESENCE_HEARTBEAT_SECONDS = float(os.getenv('PRESENCE_HEARTBEAT_SECONDS', '5'))
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE,
+                    **socketio_options(SOCKETIO_MESSAGE_QUEUE))
+if PRESENCE_STORE_URL:
+    # Sockets of a worker that died without disconnecting them are swept by
+    # the others, and their users announced offline
+    presence = SharedPresenceRegistry(open_store(PRESENCE_STORE_URL),
+                                      heartbeat_interval=PRESENCE_HEARTBEAT_SECONDS,
+                                      on_offline=lambda user_id: presence_fanout.changed(user_id, 'offline'))
+    atexit.register(presence.purge_local)
+else:
+    presence = PresenceRegistry()  # sockets, rooms and last activity per user
 CORS(app)
 DAILY_API_KEY = os.getenv('DAILY_API_KEY')
 
@@ -210,6 +290,31 @@ def missing_token_callback(error):
 migrate = Migrate(app, db)
 mail.init_app(app)
 
+def admin_required(f):
+    """Like @jwt_required(), and the user must be an admin (403 otherwise)"""
+    @wraps(f)
+    @jwt_required()
+    def decorated(*args, **kwargs):
+        user = db.session.get(User, int(get_jwt_identity()))
+        if not user or user.user_type != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    
+    return decorated
+
+
+@app.cli.command('make-admin')
+@click.argument('email')
+def make_admin_command(email):
+    """Give an existing account access to the /api/admin endpoints"""
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        raise click.ClickException(f"No user with email {email}")
+    user.user_type = 'admin'
+    db.session.commit()
+    print(f"✓ {email} is now an admin")
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -292,6 +397,11 @@ class FCMToken(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_used = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    
+    __table_args__ = (
+        # send_fcm_notifications: active tokens of the target users
+        db.Index('ix_fcm_token_user_active', 'user_id', 'is_active'),
+    )
 
 class StudentProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -338,6 +448,7 @@ class TutorProfile(db.Model):
     min_session_length = db.Column(db.String(10))
     max_students = db.Column(db.String(10))
     preferred_age_groups = db.Column(db.Text)  # JSON array
+    match_features = db.Column(db.Text)  # JSON, normalized matcher features (see refresh_tutor_match_features)
 
 class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -376,6 +487,13 @@ class Enrollment(db.Model):
     progress = db.Column(db.Float, default=0.0)
     completed = db.Column(db.Boolean, default=False)
     certificate_issued = db.Column(db.Boolean, default=False)
+    
+    __table_args__ = (
+        # A student's enrollments, and the (student, course) existence checks
+        db.Index('ix_enrollment_student_course', 'student_id', 'course_id'),
+        # Certificate issuing: completed enrollments of one course
+        db.Index('ix_enrollment_course_completed', 'course_id', 'completed'),
+    )
 
 class OfflineDownload(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -383,6 +501,10 @@ class OfflineDownload(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     downloaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_offline_download_user_course', 'user_id', 'course_id'),
+    )
 
 
 
@@ -390,8 +512,32 @@ class Conversation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     participant1_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     participant2_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # Canonical pair (lower user id, higher user id): one row per pair,
+    # whichever participant wrote first
+    min_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    max_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     last_message = db.Column(db.String(500))
     last_message_time = db.Column(db.DateTime)
+    last_message_id = db.Column(db.Integer)
+    # Read state per participant: the last message id each has read, and
+    # how many messages from the other side arrived after it
+    participant1_last_read_id = db.Column(db.Integer)
+    participant2_last_read_id = db.Column(db.Integer)
+    participant1_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    participant2_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.min_user_id is None and self.participant1_id is not None and self.participant2_id is not None:
+            self.min_user_id, self.max_user_id = conversation_pair(self.participant1_id, self.participant2_id)
+    
+    __table_args__ = (
+        db.UniqueConstraint('min_user_id', 'max_user_id', name='uq_conversation_pair'),
+        # Inbox: (participant1 = u OR participant2 = u) ORDER BY last_message_time;
+        # each side of the OR gets its own index
+        db.Index('ix_conversation_participant1_last', 'participant1_id', 'last_message_time'),
+        db.Index('ix_conversation_participant2_last', 'participant2_id', 'last_message_time'),
+    )
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -402,6 +548,12 @@ class Message(db.Model):
     file_url = db.Column(db.String(500))      # 🔥 ADD THIS
     file_type = db.Column(db.String(50))      # 🔥 ADD THIS (image/voice/file)
     file_name = db.Column(db.String(255))  
+    server_id = db.Column(db.String(32), unique=True, index=True)  # assigned before the row is written
+    
+    __table_args__ = (
+        # History pages are (timestamp, id) keyset seeks within a conversation
+        db.Index('ix_message_conversation_timestamp', 'conversation_id', 'timestamp', 'id'),
+    )
 
 # Optional: Booking model
 class Booking(db.Model):
@@ -445,232 +597,352 @@ class AssignmentSubmission(db.Model):
     
     # Relationships
     student = db.relationship('User', backref='assignment_submissions')
+    
+    __table_args__ = (
+        # A student's submission for an assignment (also the duplicate check)
+        db.Index('ix_assignment_submission_assignment_student', 'assignment_id', 'student_id'),
+        # Graded/total counts and class averages per assignment
+        db.Index('ix_assignment_submission_assignment_status', 'assignment_id', 'status'),
+    )
 
 
+class Recommendation(db.Model):
+    """Precomputed top-N tutor matches for one student (see refresh_recommendations)"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    matches = db.Column(db.Text, nullable=False)  # JSON array, best match first
+    stale = db.Column(db.Boolean, default=False)  # recomputed on next read
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-def send_fcm_notification(user_id, title, body, data=None, notification_type='general'):
+
+class RecommendationTutor(db.Model):
+    """One tutor in a student's stored Recommendation, so the students a tutor appears for can be looked up by index"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    tutor_id = db.Column(db.Integer, nullable=False, index=True)  # tutor user id
+
+
+class ExperimentArmStats(db.Model):
+    """Flushed counters for one arm of a matcher experiment"""
+    id = db.Column(db.Integer, primary_key=True)
+    experiment = db.Column(db.String(100), nullable=False)
+    arm = db.Column(db.String(50), nullable=False)
+    impressions = db.Column(db.Integer, default=0)
+    cache_hits = db.Column(db.Integer, default=0)  # served from Recommendation
+    latency_ms_sum = db.Column(db.Float, default=0.0)
+    latency_ms_max = db.Column(db.Float, default=0.0)
+    outcomes = db.Column(db.Integer, default=0)
+    reward_sum = db.Column(db.Float, default=0.0)
+    reward_sq_sum = db.Column(db.Float, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('experiment', 'arm', name='uq_experiment_arm'),)
+
+
+class ExperimentRun(db.Model):
     """
-    Send FCM notification with EduConnect branding (ENHANCED VERSION)
+    A matcher experiment as started by an admin, shared by every worker
+
+    The running one is the row with no stopped_at.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    arms = db.Column(db.Text, nullable=False)  # JSON, as validated by Experiment
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    stopped_at = db.Column(db.DateTime, index=True)
+
+
+class MatchImpression(db.Model):
+    """Append-only log of ranked tutor lists served to students"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, nullable=False, index=True)
+    tutor_ids = db.Column(db.Text, nullable=False)  # JSON array, best match first
+    scores = db.Column(db.Text, nullable=False)  # JSON array, aligned with tutor_ids
+    model_version = db.Column(db.String(20))
+    use_rl = db.Column(db.Boolean, default=True)
+    precomputed = db.Column(db.Boolean, default=False)
+    experiment = db.Column(db.String(100))
+    arm = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ModelVersion(db.Model):
+    """
+    An RL model version shared by every worker
+
+    The active version is the one activated last. Its pickle is `artifact`
+    in MODEL_DIR/versions/ and never changes once written.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='building')  # building, ready, failed
+    source = db.Column(db.String(200))
+    description = db.Column(db.Text)
+    artifact = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    activated_at = db.Column(db.DateTime, index=True)
+
+    @property
+    def version(self):
+        return f"v{self.id}"
+
+
+class MatchOutcome(db.Model):
+    """Append-only log of match outcomes, with the features the model learned from"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, nullable=False, index=True)
+    tutor_id = db.Column(db.Integer, nullable=False)
+    reward = db.Column(db.Float, nullable=False)
+    outcome = db.Column(db.Text, nullable=False)  # JSON, as sent by the client
+    student_features = db.Column(db.Text)  # JSON, normalized matcher features
+    tutor_features = db.Column(db.Text)  # JSON, normalized matcher features
+    model_version = db.Column(db.String(20))
+    source = db.Column(db.String(20))  # record-outcome | quick-feedback
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+
+# ✅ YOUR FRONTEND URL (Vercel PWA)
+FCM_FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://hult-ten.vercel.app')
+
+# ✅ EDUCONNECT BRANDING - Icon and Badge URLs (icons from the Vercel deployment)
+FCM_ICON_URL = f"{FCM_FRONTEND_URL}/logo192.png"
+FCM_BADGE_URL = f"{FCM_FRONTEND_URL}/logo192.png"
+
+# FCM accepts at most 500 messages per send_each call
+FCM_BATCH_SIZE = 500
+
+# ✅ CUSTOM EMOJIS AND STYLING BY TYPE
+NOTIFICATION_STYLES = {
+    'call': {
+        'emoji': '📞',
+        'color': '#10b981',  # Green for calls
+        'require_interaction': True,
+        'vibrate': [200, 100, 200, 100, 200],
+        'actions': [
+            {'action': 'answer', 'title': '✅ Answer'},
+            {'action': 'decline', 'title': '❌ Decline'}
+        ]
+    },
+    'message': {
+        'emoji': '💬',
+        'color': '#8b5cf6',  # Purple (EduConnect brand)
+        'require_interaction': False,
+        'vibrate': [100, 50, 100],
+        'actions': [
+            {'action': 'reply', 'title': '📝 Reply'},
+            {'action': 'view', 'title': '👁️ View'}
+        ]
+    },
+    'test': {
+        'emoji': '🔔',
+        'color': '#f59e0b',  # Orange for test
+        'require_interaction': False,
+        'vibrate': [200],
+        'actions': [
+            {'action': 'open', 'title': '🚀 Open App'}
+        ]
+    },
+    'general': {
+        'emoji': '🔔',
+        'color': '#8b5cf6',  # EduConnect purple
+        'require_interaction': False,
+        'vibrate': [100],
+        'actions': [
+            {'action': 'open', 'title': '📱 Open'}
+        ]
+    }
+}
+
+
+def build_notification_templates():
+    """The parts of each type's FCM payload that never change, built once at startup"""
+    templates = {}
+    for notification_type, style in NOTIFICATION_STYLES.items():
+        templates[notification_type] = dict(
+            style,
+            # ✅ ACTION BUTTONS
+            webpush_actions=[
+                fcm_messaging.WebpushNotificationAction(action=action['action'], title=action['title'])
+                for action in style['actions']
+            ] or None,
+            # ✅ HEADERS
+            webpush_headers={
+                'TTL': '86400',  # 24 hours
+                'Urgency': 'high' if notification_type == 'call' else 'normal'
+            }
+        )
+    return templates
+
+NOTIFICATION_TEMPLATES = build_notification_templates()
+
+
+def notification_click_url(notification_type, notification_data):
+    """✅ BUILD PROPER CLICK URL: absolute HTTPS, defaulting by type"""
+    click_url = notification_data.get('url')
+    
+    if not click_url:
+        # Default URLs based on notification type
+        if notification_type == 'call':
+            meeting_id = notification_data.get('meeting_id', '')
+            click_url = f"{FCM_FRONTEND_URL}/video-call?meetingId={meeting_id}"
+        elif notification_type == 'message':
+            click_url = f"{FCM_FRONTEND_URL}/messages"  # ✅ Opens messages in PWA
+        else:
+            click_url = FCM_FRONTEND_URL
+    
+    # Ensure URL is absolute HTTPS
+    if not click_url.startswith('https://') and not click_url.startswith('http://'):
+        click_url = FCM_FRONTEND_URL + click_url
+    
+    if click_url.startswith('http://'):
+        click_url = click_url.replace('http://', 'https://')
+    
+    return click_url
+
+
+def send_fcm_notifications(user_ids, title, body, data=None, notification_type='general'):
+    """
+    Send one notification to every active device of every user in user_ids
+    
+    One token query, one send_each batch per FCM_BATCH_SIZE devices, and
+    one UPDATE each for delivered and invalid tokens, whatever the number
+    of users or devices. Returns {user_id: devices reached}.
     """
     global FIREBASE_ENABLED
     if not FIREBASE_ENABLED:
         print("⚠️ Firebase not enabled, skipping notification")
-        return False
+        return {}
+    
+    user_ids = [int(user_id) for user_id in user_ids]
     
     try:
-        # Get all active FCM tokens for this user
-        tokens = FCMToken.query.filter_by(
-            user_id=user_id,
-            is_active=True
+        # Get all active FCM tokens for these users
+        tokens = FCMToken.query.options(load_only(FCMToken.id, FCMToken.user_id, FCMToken.token)).filter(
+            FCMToken.user_id.in_(user_ids) & (FCMToken.is_active == True)
         ).all()
         
         if not tokens:
-            print(f"⚠️ No FCM tokens found for user {user_id}")
-            return False
+            print(f"⚠️ No FCM tokens found for users {user_ids}")
+            return {}
         
-        # ✅ YOUR FRONTEND URL (Vercel PWA)
-        frontend_url = os.getenv('FRONTEND_URL', 'https://hult-ten.vercel.app')
+        template = NOTIFICATION_TEMPLATES.get(notification_type, NOTIFICATION_TEMPLATES['general'])
         
         # Prepare notification data
-        notification_data = data or {}
+        notification_data = dict(data or {})
         notification_data['type'] = notification_type
         notification_data['timestamp'] = datetime.utcnow().isoformat()
-        notification_data['user_id'] = str(user_id)
-        
-        # ✅ BUILD PROPER CLICK URL
-        click_url = notification_data.get('url')
-        
-        if not click_url:
-            # Default URLs based on notification type
-            if notification_type == 'call':
-                meeting_id = notification_data.get('meeting_id', '')
-                click_url = f"{frontend_url}/video-call?meetingId={meeting_id}"
-            elif notification_type == 'message':
-                conversation_id = notification_data.get('conversation_id', '')
-                click_url = f"{frontend_url}/messages"  # ✅ Opens messages in PWA
-            else:
-                click_url = frontend_url
-        
-        # Ensure URL is absolute HTTPS
-        if not click_url.startswith('https://') and not click_url.startswith('http://'):
-            click_url = frontend_url + click_url
-        
-        if click_url.startswith('http://'):
-            click_url = click_url.replace('http://', 'https://')
         
+        click_url = notification_click_url(notification_type, notification_data)
         print(f"📍 Click URL: {click_url}")
         
-        # ✅ EDUCONNECT BRANDING - Icon and Badge URLs
-        # Option 1: Use icons from your Vercel deployment
-        icon_url = f"{frontend_url}/logo192.png"
-        badge_url = f"{frontend_url}/logo192.png"
-        
-        # Option 2: Use direct URLs if icons are in public folder
-        # icon_url = "https://hult-ten.vercel.app/logo192.png"
-        # badge_url = "https://hult-ten.vercel.app/logo192.png"
-        
-        # ✅ CUSTOM EMOJIS AND STYLING BY TYPE
-        notification_styles = {
-            'call': {
-                'emoji': '📞',
-                'color': '#10b981',  # Green for calls
-                'require_interaction': True,
-                'vibrate': [200, 100, 200, 100, 200],
-                'actions': [
-                    {'action': 'answer', 'title': '✅ Answer'},
-                    {'action': 'decline', 'title': '❌ Decline'}
-                ]
-            },
-            'message': {
-                'emoji': '💬',
-                'color': '#8b5cf6',  # Purple (EduConnect brand)
-                'require_interaction': False,
-                'vibrate': [100, 50, 100],
-                'actions': [
-                    {'action': 'reply', 'title': '📝 Reply'},
-                    {'action': 'view', 'title': '👁️ View'}
-                ]
-            },
-            'test': {
-                'emoji': '🔔',
-                'color': '#f59e0b',  # Orange for test
-                'require_interaction': False,
-                'vibrate': [200],
-                'actions': [
-                    {'action': 'open', 'title': '🚀 Open App'}
-                ]
-            },
-            'general': {
-                'emoji': '🔔',
-                'color': '#8b5cf6',  # EduConnect purple
-                'require_interaction': False,
-                'vibrate': [100],
-                'actions': [
-                    {'action': 'open', 'title': '📱 Open'}
-                ]
-            }
-        }
-        
-        style = notification_styles.get(notification_type, notification_styles['general'])
-        
-        # ✅ ADD EMOJI TO TITLE
-        styled_title = f"{style['emoji']} {title}"
-        
-        # Convert all data values to strings (FCM requirement)
-        notification_data = {k: str(v) for k, v in notification_data.items()}
-        
         # ✅ ADD CLICK ACTION DATA
         notification_data['click_action'] = click_url
         notification_data['fcm_options'] = json.dumps({'link': click_url})
         
-        successful_sends = 0
-        invalid_tokens = []
+        # ✅ ADD EMOJI TO TITLE
+        styled_title = f"{template['emoji']} {title}"
+        
+        # Shared by every device: only the token and the user_id in data differ
+        notification = fcm_messaging.Notification(title=styled_title, body=body)
+        
+        # ✅ WEB PUSH CONFIGURATION (Desktop/Mobile Browser)
+        webpush = fcm_messaging.WebpushConfig(
+            notification=fcm_messaging.WebpushNotification(
+                title=styled_title,
+                body=body,
+                icon=FCM_ICON_URL,
+                badge=FCM_BADGE_URL,
+                tag=notification_type,  # Groups similar notifications
+                require_interaction=template['require_interaction'],
+                vibrate=template['vibrate'],
+                actions=template['webpush_actions'],
+                data={'url': click_url, 'type': notification_type}
+            ),
+            # ✅ FCM OPTIONS - CRITICAL FOR PWA REDIRECT
+            fcm_options=fcm_messaging.WebpushFCMOptions(link=click_url),
+            headers=template['webpush_headers']
+        )
         
-        for token_obj in tokens:
-            try:
-                # ✅ CREATE ENHANCED MESSAGE
-                message = fcm_messaging.Message(
-                    notification=fcm_messaging.Notification(
-                        title=styled_title,
-                        body=body,
-                        # image=icon_url  # Optional: Large image (uncomment if needed)
-                    ),
-                    data=notification_data,
-                    token=token_obj.token,
-                    
-                    # ✅ WEB PUSH CONFIGURATION (Desktop/Mobile Browser)
-                    webpush=fcm_messaging.WebpushConfig(
-                        notification=fcm_messaging.WebpushNotification(
-                            title=styled_title,
-                            body=body,
-                            icon=icon_url,
-                            badge=badge_url,
-                            tag=notification_type,  # Groups similar notifications
-                            require_interaction=style['require_interaction'],
-                            vibrate=style['vibrate'],
-                            
-                            # ✅ EDUCONNECT BRANDING - Background color
-                            # Note: This works in some browsers (Chrome Android)
-                            # Format: #RRGGBB
-                            # color='#8b5cf6',  # Uncomment if supported
-                            
-                            # ✅ ACTION BUTTONS
-                            actions=[
-                                fcm_messaging.WebpushNotificationAction(
-                                    action=action['action'],
-                                    title=action['title']
-                                ) for action in style['actions']
-                            ] if style['actions'] else None,
-                            
-                            # ✅ CUSTOM DATA
-                            data={
-                                'url': click_url,
-                                'type': notification_type
-                            }
-                        ),
-                        
-                        # ✅ FCM OPTIONS - CRITICAL FOR PWA REDIRECT
-                        fcm_options=fcm_messaging.WebpushFCMOptions(
-                            link=click_url  # This makes clicking open the PWA!
-                        ),
-                        
-                        # ✅ HEADERS (Optional - for debugging)
-                        headers={
-                            'TTL': '86400',  # 24 hours
-                            'Urgency': 'high' if notification_type == 'call' else 'normal'
-                        }
-                    ),
-                    
-                    # ✅ ANDROID CONFIGURATION (For future native app)
-                    android=fcm_messaging.AndroidConfig(
-                        priority='high',
-                        notification=fcm_messaging.AndroidNotification(
-                            title=styled_title,
-                            body=body,
-                            icon='@drawable/ic_notification',
-                            color=style['color'],
-                            sound='default',
-                            channel_id='educonnect_notifications',
-                            click_action=click_url,
-                            tag=notification_type
-                        ),
-                        data=notification_data
-                    )
-                )
-                
-                # Send message
-                response = fcm_messaging.send(message)
-                print(f"✅ Notification sent: {response}")
-                
-                # Update last_used timestamp
-                token_obj.last_used = datetime.utcnow()
-                successful_sends += 1
-                
-            except fcm_messaging.UnregisteredError:
-                print(f"❌ Invalid token, marking inactive: {token_obj.id}")
-                invalid_tokens.append(token_obj)
-            except fcm_messaging.SenderIdMismatchError:
-                print(f"❌ Token belongs to different project: {token_obj.id}")
-                invalid_tokens.append(token_obj)
-            except Exception as e:
-                print(f"❌ Error sending to token {token_obj.id}: {e}")
-                import traceback
-                traceback.print_exc()
+        # ✅ ANDROID CONFIGURATION (For future native app); data comes from the message
+        android = fcm_messaging.AndroidConfig(
+            priority='high',
+            notification=fcm_messaging.AndroidNotification(
+                title=styled_title,
+                body=body,
+                icon='@drawable/ic_notification',
+                color=template['color'],
+                sound='default',
+                channel_id='educonnect_notifications',
+                click_action=click_url,
+                tag=notification_type
+            )
+        )
+        
+        # Convert all data values to strings (FCM requirement)
+        data_by_user = {
+            user_id: {k: str(v) for k, v in dict(notification_data, user_id=user_id).items()}
+            for user_id in {token_obj.user_id for token_obj in tokens}
+        }
         
-        # Mark invalid tokens as inactive
-        for invalid_token in invalid_tokens:
-            invalid_token.is_active = False
+        messages = [
+            fcm_messaging.Message(
+                notification=notification,
+                data=data_by_user[token_obj.user_id],
+                token=token_obj.token,
+                webpush=webpush,
+                android=android
+            )
+            for token_obj in tokens
+        ]
+        
+        delivered = []
+        invalid = []
+        reached = {}
+        for start in range(0, len(messages), FCM_BATCH_SIZE):
+            batch_tokens = tokens[start:start + FCM_BATCH_SIZE]
+            response = offload(fcm_messaging.send_each, messages[start:start + FCM_BATCH_SIZE])
+            
+            for token_obj, result in zip(batch_tokens, response.responses):
+                if result.success:
+                    delivered.append(token_obj.id)
+                    reached[token_obj.user_id] = reached.get(token_obj.user_id, 0) + 1
+                elif isinstance(result.exception, (fcm_messaging.UnregisteredError,
+                                                   fcm_messaging.SenderIdMismatchError)):
+                    invalid.append(token_obj.id)
+                else:
+                    print(f"❌ Error sending to token {token_obj.id}: {result.exception}")
         
+        # Bulk bookkeeping: one UPDATE per outcome, not one per token
+        if delivered:
+            FCMToken.query.filter(FCMToken.id.in_(delivered)).update(
+                {FCMToken.last_used: datetime.utcnow()}, synchronize_session=False
+            )
+        if invalid:
+            print(f"❌ Marking {len(invalid)} invalid tokens inactive: {invalid}")
+            FCMToken.query.filter(FCMToken.id.in_(invalid)).update(
+                {FCMToken.is_active: False}, synchronize_session=False
+            )
         db.session.commit()
         
-        print(f"📊 Notification results: {successful_sends}/{len(tokens)} successful")
-        return successful_sends > 0
+        print(f"📊 Notification results: {len(delivered)}/{len(tokens)} successful")
+        return reached
         
     except Exception as e:
         print(f"❌ Error sending FCM notification: {e}")
         import traceback
         traceback.print_exc()
-        return False
+        db.session.rollback()
+        return {}
+
+
+def send_fcm_notification(user_id, title, body, data=None, notification_type='general'):
+    """
+    Send FCM notification with EduConnect branding (ENHANCED VERSION)
+    
+    True if at least one of the user's devices was reached.
+    """
+    return bool(send_fcm_notifications([user_id], title, body, data, notification_type))
 
 
 # ============================================================================
@@ -709,8 +981,71 @@ def send_call_notification(caller_id, receiver_id, meeting_id, join_url):
         print(f"❌ Error sending call notification: {e}")
         return False
 
-def send_message_notification(sender_id, receiver_id, message_text, conversation_id):
-    """Send new message notification"""
+# Push sends run on a worker pool so Socket.IO handlers never wait on FCM
+notification_dispatcher = NotificationDispatcher(
+    workers=int(os.getenv('NOTIFY_WORKERS', '4')),
+    max_queue=int(os.getenv('NOTIFY_QUEUE_MAX', '10000')),
+    context=app.app_context
+)
+
+# Presence-aware message pushes: nothing is pushed to a receiver who is
+# looking at the conversation (live socket in its room, active within
+# PUSH_IDLE_SECONDS); other messages to the same receiver and conversation
+# within PUSH_COALESCE_SECONDS go out as one notification
+PUSH_IDLE_SECONDS = float(os.getenv('PUSH_IDLE_SECONDS', '300'))
+PUSH_COALESCE_SECONDS = float(os.getenv('PUSH_COALESCE_SECONDS', '5'))
+push_routing_stats = {'skipped_live': 0, 'skipped_at_flush': 0, 'pushed': 0}
+
+
+def touch_user(user_id):
+    """Record socket activity (presence for push routing)"""
+    if user_id is not None:
+        presence.touch(user_id)
+
+
+def user_sees_conversation(user_id, room):
+    """True if user_id has a live socket, used it recently and has joined room"""
+    idle = presence.idle_seconds(user_id)
+    if idle is None or idle > PUSH_IDLE_SECONDS:
+        return False
+    return room is not None and presence.in_room(user_id, room)
+
+
+def flush_message_pushes(key, items):
+    """One notification per (receiver, conversation) window, unless they came back meanwhile"""
+    receiver_id, conversation_id = key
+    latest = items[-1]
+    if user_sees_conversation(receiver_id, latest['room']):
+        push_routing_stats['skipped_at_flush'] += len(items)
+        return
+    
+    push_routing_stats['pushed'] += 1
+    notification_dispatcher.submit(
+        send_message_notification,
+        sender_id=latest['sender_id'],
+        receiver_id=receiver_id,
+        message_text=latest['text'],
+        conversation_id=conversation_id,
+        message_count=len(items)
+    )
+
+
+message_push_coalescer = NotificationCoalescer(flush_message_pushes, window=PUSH_COALESCE_SECONDS)
+
+
+def route_message_notification(sender_id, receiver_id, message_text, conversation_id, room):
+    """Push a chat message to the receiver only if they are not already looking at it"""
+    if user_sees_conversation(receiver_id, room):
+        push_routing_stats['skipped_live'] += 1
+        return
+    message_push_coalescer.add((str(receiver_id), conversation_id), {
+        'sender_id': sender_id,
+        'text': message_text,
+        'room': room
+    })
+
+def send_message_notification(sender_id, receiver_id, message_text, conversation_id, message_count=1):
+    """Send new message notification (message_count > 1: a collapsed burst, message_text is the latest)"""
     try:
         sender = User.query.get(sender_id)
         if not sender:
@@ -721,9 +1056,14 @@ def send_message_notification(sender_id, receiver_id, message_text, conversation
         
         frontend_url = os.getenv('FRONTEND_URL', 'https://hult-ten.vercel.app')
         
+        if message_count > 1:
+            title = f"{message_count} new messages from {sender.full_name}"
+        else:
+            title = f"New message from {sender.full_name}"
+        
         return send_fcm_notification(
             user_id=receiver_id,
-            title=f"New message from {sender.full_name}",
+            title=title,
             body=preview,
             data={
                 'type': 'message',
@@ -826,6 +1166,14 @@ def unregister_fcm_token():
 
 # Replace ONLY the initiate_video_call handler
 
+def emit_to_user(event, data, user_id):
+    """Emit to every live socket (tab, device) of user_id; False if they have none"""
+    sids = presence.sids(user_id) if user_id is not None else set()
+    for sid in sids:
+        socketio.emit(event, data, room=sid)
+    return bool(sids)
+
+
 @socketio.on('initiate_video_call')
 def handle_initiate_video_call_with_notification(data):
     """Handle video call initiation with FCM notification"""
@@ -843,15 +1191,12 @@ def handle_initiate_video_call_with_notification(data):
         print(f"{'='*70}")
         
         # Send Socket.IO event (for users currently online)
-        receiver_sid = active_connections.get(receiver_id)
-        
-        if receiver_sid:
-            emit('incoming_video_call', {
-                'meetingId': meeting_id,
-                'callerId': caller_id,
-                'callerName': caller_name,
-                'joinUrl': join_url
-            }, room=receiver_sid)
+        if emit_to_user('incoming_video_call', {
+            'meetingId': meeting_id,
+            'callerId': caller_id,
+            'callerName': caller_name,
+            'joinUrl': join_url
+        }, receiver_id):
             print(f"✅ [VIDEO] Socket notification sent")
         
         # ALWAYS send FCM notification (works even when app is closed)
@@ -894,12 +1239,10 @@ def handle_call_accepted(data):
         
         # Notify the caller
         if caller_id:
-            caller_sid = active_connections.get(caller_id)
-            if caller_sid:
-                emit('call_accepted', {
-                    'meetingId': meeting_id,
-                    'acceptedBy': accepted_by
-                }, room=caller_sid)
+            if emit_to_user('call_accepted', {
+                'meetingId': meeting_id,
+                'acceptedBy': accepted_by
+            }, caller_id):
                 print(f"✅ [VIDEO] Notified caller {caller_id}")
         else:
             # Fallback: broadcast to all
@@ -925,12 +1268,10 @@ def handle_call_declined(data):
         
         # Notify the caller
         if caller_id:
-            caller_sid = active_connections.get(caller_id)
-            if caller_sid:
-                emit('call_declined', {
-                    'meetingId': meeting_id,
-                    'declinedBy': declined_by
-                }, room=caller_sid)
+            if emit_to_user('call_declined', {
+                'meetingId': meeting_id,
+                'declinedBy': declined_by
+            }, caller_id):
                 print(f"✅ [VIDEO] Notified caller {caller_id} of decline")
         else:
             # Fallback: broadcast to all
@@ -956,12 +1297,10 @@ def handle_end_video_call(data):
         
         # Notify the other participant
         if other_user_id:
-            other_sid = active_connections.get(other_user_id)
-            if other_sid:
-                emit('call_ended', {
-                    'meetingId': meeting_id,
-                    'endedBy': ended_by
-                }, room=other_sid)
+            if emit_to_user('call_ended', {
+                'meetingId': meeting_id,
+                'endedBy': ended_by
+            }, other_user_id):
                 print(f"✅ [VIDEO] Notified other user {other_user_id}")
         else:
             # Fallback: broadcast to all
@@ -975,13 +1314,25 @@ def handle_end_video_call(data):
 
 
 # Add debug endpoint to check online users
+ONLINE_USERS_PAGE_SIZE = 100
+ONLINE_USERS_PAGE_MAX = 1000
+
 @app.route('/api/socket/online-users', methods=['GET'])
+@admin_required
 def get_online_users():
-    """Check which users are currently online"""
+    """Check which users are currently online (at most ?limit=, admins only)"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', ONLINE_USERS_PAGE_SIZE)), ONLINE_USERS_PAGE_MAX))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    connections = presence.snapshot(limit + 1)
+    online_users = list(connections)[:limit]
     return jsonify({
-        'online_users': list(active_connections.keys()),
-        'total': len(active_connections),
-        'connections': {str(k): v for k, v in active_connections.items()}
+        'online_users': online_users,
+        'total': presence.stats()['online_users'],
+        'truncated': len(connections) > limit,
+        'connections': {user_id: sorted(connections[user_id]) for user_id in online_users}
     }), 200
 
 
@@ -993,28 +1344,28 @@ def test_call_notification(receiver_id):
     try:
         caller_id = int(get_jwt_identity())
         
-        receiver_sid = active_connections.get(receiver_id)
+        receiver_sids = presence.sids(receiver_id)
         
-        if not receiver_sid:
+        if not receiver_sids:
             return jsonify({
                 'success': False,
                 'error': 'Receiver not online',
                 'receiver_id': receiver_id,
-                'online_users': list(active_connections.keys())
+                'online_users': presence.online_users()
             }), 404
         
-        # Send test notification directly to sid
-        socketio.emit('test_notification', {
+        # Send test notification directly to each of the receiver's sockets
+        emit_to_user('test_notification', {
             'message': 'Test notification from API',
             'from': caller_id,
             'timestamp': datetime.utcnow().isoformat()
-        }, room=receiver_sid)
+        }, receiver_id)
         
         return jsonify({
             'success': True,
             'receiver_id': receiver_id,
-            'receiver_sid': receiver_sid,
-            'message': 'Test notification sent to receiver sid'
+            'receiver_sids': sorted(receiver_sids),
+            'message': 'Test notification sent to receiver sids'
         }), 200
         
     except Exception as e:
@@ -1119,7 +1470,7 @@ def send_password_reset_email(user_email, reset_url):
         </html>
         """
 
-        msg.send()
+        offload(msg.send)
         print(f"✅ [EMAIL] Password reset email sent to {user_email}")
         return True
         
@@ -1141,25 +1492,58 @@ def check_account_locked(user):
             db.session.commit()
     return False, 0
 
+def contact_ids(user_ids):
+    """{str(user id): {str(partner id)}}: everyone each user has a conversation with, in one query"""
+    ids = [int(u) for u in user_ids if str(u).isdigit()]
+    contacts = {str(u): set() for u in ids}
+    if not ids:
+        return contacts
+    rows = db.session.query(Conversation.participant1_id, Conversation.participant2_id).filter(
+        Conversation.participant1_id.in_(ids) | Conversation.participant2_id.in_(ids)
+    )
+    for first, second in rows:
+        if str(first) in contacts:
+            contacts[str(first)].add(str(second))
+        if str(second) in contacts:
+            contacts[str(second)].add(str(first))
+    return contacts
+
+
+# Online/offline changes go only to the user's contacts, collapsed over
+# PRESENCE_COALESCE_SECONDS (a reload or reconnect in between is never announced)
+PRESENCE_COALESCE_SECONDS = float(os.getenv('PRESENCE_COALESCE_SECONDS', '1'))
+presence_fanout = PresenceFanout(
+    contacts=contact_ids,
+    deliver=lambda recipient, payload: emit_to_user('user_status', payload, recipient),
+    status=lambda user_id: 'online' if presence.is_online(user_id) else 'offline',
+    announce=presence.announce,
+    window=PRESENCE_COALESCE_SECONDS,
+    context=app.app_context
+)
+
+
 @socketio.on('connect')
 def handle_connect(auth):
     """Handle client connection"""
     user_id = auth.get('userId') if auth else None
     
     if user_id:
-        active_connections[user_id] = request.sid
-        user_rooms[user_id] = []
+        came_online = presence.connect(request.sid, user_id)
         
         print(f"✅ [SOCKET] User {user_id} connected with sid {request.sid}")
         
-        # Notify others that user is online
-        emit('user_status', {
-            'userId': user_id,
-            'status': 'online'
-        }, broadcast=True, include_self=False)
+        # Tell their contacts they are online (not again for a second tab)
+        if came_online:
+            presence_fanout.changed(user_id, 'online')
         
-        # Send list of online users to newly connected user
-        emit('users_online', list(active_connections.keys()))
+        # Send the newly connected user which of their contacts are online
+        try:
+            contacts = contact_ids([user_id]).get(str(user_id), set())
+        except Exception as e:
+            print(f"⚠️ [SOCKET] Loading contacts for {user_id} failed: {e}")
+            db.session.rollback()
+            contacts = set()
+        emit('users_online', [c for c in contacts if presence.is_online(c)])
     else:
         print(f"⚠️ [SOCKET] Connection without userId")
     
@@ -1169,32 +1553,210 @@ def handle_connect(auth):
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    sid = request.sid
-    
-    # Find user_id for this sid
-    user_id = None
-    for uid, s in active_connections.items():
-        if s == sid:
-            user_id = uid
-            break
+    # Socket.IO drops the sid from its rooms itself
+    user_id, went_offline = presence.disconnect(request.sid)
     
     if user_id:
-        # Remove from active connections
-        del active_connections[user_id]
-        
-        # Leave all rooms
-        if user_id in user_rooms:
-            for room in user_rooms[user_id]:
-                leave_room(room)
-            del user_rooms[user_id]
-        
-        print(f"❌ [SOCKET] User {user_id} disconnected")
+        print(f"❌ [SOCKET] User {user_id} disconnected ({'offline' if went_offline else 'other sockets still open'})")
+    
+    if went_offline:
+        # Tell their contacts they are offline
+        presence_fanout.changed(user_id, 'offline')
+
+def conversation_pair(user_a, user_b):
+    """(lower id, higher id): the canonical key of two users' conversation"""
+    user_a, user_b = int(user_a), int(user_b)
+    return (user_a, user_b) if user_a <= user_b else (user_b, user_a)
+
+def get_or_create_conversation(sender_id, receiver_id):
+    """
+    The two users' conversation, created if missing -> (conversation, created)
+
+    The lookup is one seek on the unique (min_user_id, max_user_id) index.
+    When two first messages race, the losing insert fails on that index
+    inside its savepoint and picks up the winner's row instead.
+    """
+    low, high = conversation_pair(sender_id, receiver_id)
+    conversation = Conversation.query.filter_by(min_user_id=low, max_user_id=high).first()
+    if conversation:
+        return conversation, False
+    
+    try:
+        with db.session.begin_nested():
+            conversation = Conversation(participant1_id=int(sender_id), participant2_id=int(receiver_id))
+            db.session.add(conversation)
+        return conversation, True
+    except IntegrityError:
+        return Conversation.query.filter_by(min_user_id=low, max_user_id=high).one(), False
+
+def participant_side(conversation, user_id):
+    """'participant1' or 'participant2' for a participant of the conversation, else None"""
+    user_id = int(user_id)
+    if conversation.participant1_id == user_id:
+        return 'participant1'
+    if conversation.participant2_id == user_id:
+        return 'participant2'
+    return None
+
+def record_conversation_messages(conversation, messages):
+    """
+    Update the conversation's read state for new (flushed) messages, in send order
+    
+    Unread counters move in SQL (unread = unread + n), so concurrent
+    writers don't lose counts. A sender has read up to their own last
+    message, so their counter restarts from what the other side sent after it.
+    """
+    conversation.last_message_id = messages[-1].id
+    
+    for side in ('participant1', 'participant2'):
+        user_id = getattr(conversation, f'{side}_id')
+        own = [i for i, message in enumerate(messages) if int(message.sender_id) == user_id]
+        start = own[-1] + 1 if own else 0
+        received = sum(1 for message in messages[start:] if int(message.sender_id) != user_id)
+        
+        if own:
+            setattr(conversation, f'{side}_last_read_id', messages[own[-1]].id)
+            setattr(conversation, f'{side}_unread', received)
+        elif received:
+            setattr(conversation, f'{side}_unread', getattr(Conversation, f'{side}_unread') + received)
+
+def mark_conversation_read(conversation, user_id, message_id=None):
+    """
+    Move user_id's read cursor forward to message_id (default: the last message)
+    
+    Returns the new cursor, or None if user_id isn't a participant. The
+    cursor never moves back; messages newer than it stay unread.
+    
+    The counter is recomputed from the new cursor inside the same UPDATE
+    (an index range over the messages after it), so a message written
+    meanwhile is either counted or not yet visible, never lost.
+    """
+    side = participant_side(conversation, user_id)
+    if side is None:
+        return None
+    
+    last_read_column = getattr(Conversation, f'{side}_last_read_id')
+    unread_column = getattr(Conversation, f'{side}_unread')
+    message_id = conversation.last_message_id if message_id is None else int(message_id)
+    if message_id is None:
+        return getattr(conversation, f'{side}_last_read_id')
+    
+    unread = db.session.query(db.func.count(Message.id)).filter(
+        (Message.conversation_id == Conversation.id) &
+        (Message.id > message_id) &
+        (Message.sender_id != int(user_id))
+    ).correlate(Conversation).scalar_subquery()
+    
+    Conversation.query.filter(
+        (Conversation.id == conversation.id) &
+        (last_read_column.is_(None) | (last_read_column < message_id))
+    ).update({last_read_column: message_id, unread_column: unread}, synchronize_session=False)
+    db.session.commit()
+    db.session.refresh(conversation)
+    return getattr(conversation, f'{side}_last_read_id')
+
+def write_message_batch(items):
+    """
+    Persist chat messages in one transaction -> [(message id, conversation id)]
+    
+    items are Message fields plus receiver_id, in send order. All messages
+    go out in one flush, and each conversation is looked up once per batch.
+    """
+    try:
+        conversations = {}  # pair -> Conversation
+        grouped = {}  # pair -> [Message]
+        messages = []
+        for fields in items:
+            pair = conversation_pair(fields['sender_id'], fields['receiver_id'])
+            conversation = conversations.get(pair)
+            if conversation is None:
+                conversation, created = get_or_create_conversation(fields['sender_id'], fields['receiver_id'])
+                if created:
+                    print(f"💬 [MESSAGE] New conversation {conversation.id}")
+                conversations[pair] = conversation
+            conversation.last_message = fields['text']
+            conversation.last_message_time = fields['timestamp']
+            
+            message = Message(
+                conversation_id=conversation.id,
+                sender_id=fields['sender_id'],
+                text=fields['text'],
+                timestamp=fields['timestamp'],
+                file_url=fields['file_url'],
+                file_type=fields['file_type'],
+                file_name=fields['file_name'],
+                server_id=fields['server_id']
+            )
+            db.session.add(message)
+            messages.append(message)
+            grouped.setdefault(pair, []).append(message)
         
-        # Notify others that user is offline
-        emit('user_status', {
-            'userId': user_id,
-            'status': 'offline'
-        }, broadcast=True)
+        db.session.flush()
+        for pair, group in grouped.items():
+            record_conversation_messages(conversations[pair], group)
+        results = [(message.id, message.conversation_id) for message in messages]
+        db.session.commit()
+        return results
+    except Exception:
+        db.session.rollback()
+        raise
+
+# Write-behind mode: messages are broadcast at once and group-committed by
+# a background writer; message_delivered is only sent after the commit.
+# MESSAGE_EMIT_AFTER_FLUSH also holds the broadcast until then, so nobody
+# sees a message that could still be lost. Order is kept per conversation;
+# with one writer shard it is kept globally.
+MESSAGE_WRITE_BEHIND = os.getenv('MESSAGE_WRITE_BEHIND', 'False') == 'True'
+MESSAGE_EMIT_AFTER_FLUSH = os.getenv('MESSAGE_EMIT_AFTER_FLUSH', 'False') == 'True'
+
+message_writer = GroupCommitWriter(
+    write_message_batch,
+    shards=int(os.getenv('MESSAGE_WRITER_SHARDS', '1')),
+    max_buffer=int(os.getenv('MESSAGE_WRITE_BUFFER', '5000')),
+    batch_size=int(os.getenv('MESSAGE_FLUSH_BATCH', '100')),
+    flush_interval=float(os.getenv('MESSAGE_FLUSH_INTERVAL_MS', '5')) / 1000,
+    context=app.app_context
+)
+atexit.register(message_writer.flush)
+
+
+@app.route('/api/admin/messaging/stats', methods=['GET'])
+@admin_required
+def admin_messaging_stats():
+    """Chat persistence, presence, typing and push dispatch counters"""
+    return jsonify({
+        'success': True,
+        'write_behind': MESSAGE_WRITE_BEHIND,
+        'emit_after_flush': MESSAGE_EMIT_AFTER_FLUSH,
+        'message_writer': message_writer.stats(),
+        'notifications': notification_dispatcher.stats(),
+        'push_routing': dict(push_routing_stats, coalescer=message_push_coalescer.stats()),
+        'presence': dict(presence.stats(), fanout=presence_fanout.stats()),
+        'typing': typing_throttle.stats()
+    }), 200
+
+
+def finish_message_delivery(message_data, room, sid, db_message_id, db_conversation_id, broadcast):
+    """After the message is committed: broadcast (if not done yet), push, ack the sender"""
+    if broadcast:
+        socketio.emit('receive_message', dict(message_data, id=db_message_id, status='delivered'), room=room)
+    
+    # Send FCM notification (for offline, idle or elsewhere users), off this thread
+    route_message_notification(
+        sender_id=message_data['sender_id'],
+        receiver_id=message_data['receiver_id'],
+        message_text=message_data['text'] or 'Sent a file',
+        conversation_id=db_conversation_id,
+        room=room
+    )
+    
+    # Send delivery confirmation to sender
+    socketio.emit('message_delivered', {
+        'messageId': message_data['clientMessageId'],
+        'dbMessageId': db_message_id,
+        'serverId': message_data['serverId'],
+        'status': 'delivered'
+    }, room=sid)
 
 @socketio.on('send_message')
 def handle_send_message_with_notification(data):
@@ -1211,69 +1773,64 @@ def handle_send_message_with_notification(data):
         file_name = data.get('file_name')
         
         print(f"📤 [MESSAGE] From {sender_id} to {receiver_id}")
+        touch_user(sender_id)
+        typing_throttle.clear(sender_id, conversation_id)
         
-        # Get or create conversation
-        conversation = Conversation.query.filter(
-            ((Conversation.participant1_id == sender_id) & (Conversation.participant2_id == receiver_id)) |
-            ((Conversation.participant1_id == receiver_id) & (Conversation.participant2_id == sender_id))
-        ).first()
-        
-        if not conversation:
-            conversation = Conversation(
-                participant1_id=sender_id,
-                participant2_id=receiver_id,
-                last_message=text,
-                last_message_time=datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            )
-            db.session.add(conversation)
-            db.session.flush()
-        else:
-            conversation.last_message = text
-            conversation.last_message_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        
-        # Save message
-        message = Message(
-            conversation_id=conversation.id,
-            sender_id=sender_id,
-            text=text,
-            timestamp=datetime.fromisoformat(timestamp.replace('Z', '+00:00')),
-            file_url=file_url,
-            file_type=file_type,
-            file_name=file_name
-        )
-        db.session.add(message)
-        db.session.commit()
+        fields = {
+            'server_id': uuid.uuid4().hex,
+            'sender_id': int(sender_id),
+            'receiver_id': int(receiver_id),
+            'text': text,
+            'timestamp': datetime.fromisoformat(timestamp.replace('Z', '+00:00')),
+            'file_url': file_url,
+            'file_type': file_type,
+            'file_name': file_name
+        }
         
         # Broadcast via Socket.IO (for online users)
         message_data = {
-            'id': message.id,
+            'id': None,
+            'serverId': fields['server_id'],
+            'clientMessageId': message_id,
             'conversationId': conversation_id,
             'sender_id': sender_id,
             'receiver_id': receiver_id,
             'text': text,
             'timestamp': timestamp,
-            'status': 'delivered',
+            'status': 'sent',
             'file_url': file_url,
             'file_type': file_type,
             'file_name': file_name
         }
+        sid = request.sid
+        broadcast_done = False
         
-        emit('receive_message', message_data, room=conversation_id)
-        
-        # Send FCM notification (for offline users or background tabs)
-        send_message_notification(
-            sender_id=sender_id,
-            receiver_id=receiver_id,
-            message_text=text or 'Sent a file',
-            conversation_id=conversation.id
-        )
+        if MESSAGE_WRITE_BEHIND:
+            if not MESSAGE_EMIT_AFTER_FLUSH:
+                emit('receive_message', message_data, room=conversation_id)
+                broadcast_done = True
+            
+            def on_persisted(result, error):
+                if error is not None:
+                    print(f"❌ [MESSAGE] Write-behind failed for {fields['server_id']}: {error}")
+                    socketio.emit('message_error', {
+                        'error': str(error),
+                        'messageId': message_id,
+                        'serverId': fields['server_id']
+                    }, room=sid)
+                    return
+                finish_message_delivery(message_data, conversation_id, sid, *result,
+                                        broadcast=not broadcast_done)
+            
+            try:
+                message_writer.submit(conversation_pair(sender_id, receiver_id), fields, on_persisted)
+                return
+            except queue.Full:
+                print("⚠️ [MESSAGE] Write-behind buffer full, writing synchronously")
         
-        # Send delivery confirmation to sender
-        emit('message_delivered', {
-            'messageId': message_id,
-            'dbMessageId': message.id,
-            'status': 'delivered'
-        }, room=request.sid)
+        db_message_id, db_conversation_id = write_message_batch([fields])[0]
+        finish_message_delivery(message_data, conversation_id, sid, db_message_id,
+                                db_conversation_id, broadcast=not broadcast_done)
         
     except Exception as e:
         print(f"❌ [MESSAGE] Error: {e}")
@@ -1296,11 +1853,7 @@ def handle_join_conversation(data):
     if conversation_id and user_id:
         join_room(conversation_id)
         
-        if user_id not in user_rooms:
-            user_rooms[user_id] = []
-        
-        if conversation_id not in user_rooms[user_id]:
-            user_rooms[user_id].append(conversation_id)
+        presence.join(request.sid, conversation_id)
         
         print(f"👥 [SOCKET] User {user_id} joined conversation {conversation_id}")
         
@@ -1319,8 +1872,7 @@ def handle_leave_conversation(data):
     if conversation_id and user_id:
         leave_room(conversation_id)
         
-        if user_id in user_rooms and conversation_id in user_rooms[user_id]:
-            user_rooms[user_id].remove(conversation_id)
+        presence.leave(request.sid, conversation_id)
         
         print(f"👋 [SOCKET] User {user_id} left conversation {conversation_id}")
 
@@ -1335,6 +1887,8 @@ def handle_join_conversation(data):
     partner_id = data.get('partnerId')
     
     if conversation_id and user_id:
+        touch_user(user_id)
+        
         # Join the main room
         join_room(conversation_id)
         print(f"👥 [SOCKET] User {user_id} joined room: {conversation_id}")
@@ -1351,31 +1905,39 @@ def handle_join_conversation(data):
         else:
             print(f"⚠️ [SOCKET] No partnerId provided for user {user_id}")
         
-        if user_id not in user_rooms:
-            user_rooms[user_id] = []
-        
-        if conversation_id not in user_rooms[user_id]:
-            user_rooms[user_id].append(conversation_id)
+        presence.join(request.sid, conversation_id)
         
         # Log all rooms this user is in
-        print(f"📋 [SOCKET] User {user_id} is now in rooms: {user_rooms.get(user_id, [])}")
+        print(f"📋 [SOCKET] User {user_id} is now in rooms: {sorted(presence.rooms(user_id))}")
         
         emit('joined_conversation', {
             'conversationId': conversation_id,
             'userId': user_id
         }, room=conversation_id)
+# Clients send typing on every keystroke: the room hears user_typing at most
+# once per TYPING_EMIT_INTERVAL (clients hide it after 3s without one) and
+# user_stopped_typing TYPING_TIMEOUT seconds after the last keystroke if the
+# client's stop_typing never comes
+TYPING_EMIT_INTERVAL = float(os.getenv('TYPING_EMIT_INTERVAL', '2'))
+TYPING_TIMEOUT = float(os.getenv('TYPING_TIMEOUT', '5'))
+typing_throttle = TypingThrottle(
+    emit=lambda event, payload, room, sid: socketio.emit(event, payload, room=room, skip_sid=sid),
+    interval=TYPING_EMIT_INTERVAL,
+    timeout=TYPING_TIMEOUT
+)
+
+
 @socketio.on('typing')
 def handle_typing(data):
-    """Handle typing indicators"""
+    """Handle typing indicators (throttled, see typing_throttle)"""
     conversation_id = data.get('conversationId')
     user_id = data.get('userId')
     
     if conversation_id and user_id:
-        # Broadcast to everyone in the room except sender
-        emit('user_typing', {
-            'userId': user_id,
-            'conversationId': conversation_id
-        }, room=conversation_id, include_self=False)
+        touch_user(user_id)
+        
+        # To everyone in the room except sender
+        typing_throttle.typing(user_id, conversation_id, sid=request.sid)
 
 
 @socketio.on('stop_typing')
@@ -1385,10 +1947,8 @@ def handle_stop_typing(data):
     user_id = data.get('userId')
     
     if conversation_id and user_id:
-        emit('user_stopped_typing', {
-            'userId': user_id,
-            'conversationId': conversation_id
-        }, room=conversation_id, include_self=False)
+        typing_throttle.stop(user_id, conversation_id, sid=request.sid)
+
 
 
 @socketio.on('mark_as_read')
@@ -1399,12 +1959,26 @@ def handle_mark_as_read(data):
     message_ids = data.get('messageIds', [])
     
     print(f"✓ [SOCKET] User {user_id} read messages in {conversation_id}")
+    touch_user(user_id)
     
-    # Notify sender that messages were read
+    last_read_id = None
+    try:
+        conversation = Conversation.query.get(int(conversation_id)) if conversation_id else None
+        if conversation and user_id:
+            up_to = max((int(i) for i in message_ids), default=None)
+            last_read_id = mark_conversation_read(conversation, user_id, up_to)
+    except (TypeError, ValueError) as e:
+        print(f"⚠️ [SOCKET] Bad mark_as_read payload: {e}")
+    except Exception as e:
+        print(f"❌ [SOCKET] Saving read cursor failed: {e}")
+        db.session.rollback()
+    
+    # Notify sender that messages were read
     emit('messages_read', {
         'conversationId': conversation_id,
         'userId': user_id,
-        'messageIds': message_ids
+        'messageIds': message_ids,
+        'lastReadMessageId': last_read_id
     }, room=conversation_id, include_self=False)
 
 @app.route('/api/video/test', methods=['POST', 'GET'])
@@ -1587,9 +2161,7 @@ def socket_status():
     """Check Socket.IO server status"""
     return jsonify({
         'status': 'online',
-        'active_connections': len(active_connections),
-        'online_users': list(active_connections.keys()),
-        'user_rooms': {str(k): v for k, v in user_rooms.items()},
+        'active_connections': presence.stats()['sockets'],
         'protocol': 'Socket.IO'
     }), 200
 
@@ -1651,7 +2223,9 @@ def update_student_profile_enhanced():
     if 'learning_pace' in data:
         profile.learning_pace = data['learning_pace']
     
+    mark_recommendation_stale(user.id)
     db.session.commit()
+    current_model().invalidate_student_cache(user_id)
     
     print("✅ [PROFILE UPDATE] Profile updated successfully")
     
@@ -1691,14 +2265,19 @@ def register_with_verification():
             print("[REGISTER] Password too short")
             return jsonify({'error': 'Password must be at least 8 characters'}), 400
         
+        # Admins are made with `flask make-admin`, never through sign-up
+        role = data.get('role', 'student')
+        if role not in ('student', 'tutor'):
+            return jsonify({'error': 'Invalid role'}), 400
+        
         # Create new user
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed_password = offload(bcrypt.generate_password_hash, password).decode('utf-8')
         
         new_user = User(
             email=data['email'],
             password_hash=hashed_password,
             full_name=data['name'],
-            user_type=data.get('role', 'student'),
+            user_type=role,
             email_verified=True,  # Auto-verify for now
             failed_login_attempts=0
         )
@@ -1900,7 +2479,8 @@ def upload_message_attachment():
         resource_type = 'video' if (is_video or is_audio) else 'image'
         
         # Upload to Cloudinary
-        upload_result = cloudinary.uploader.upload(
+        upload_result = offload(
+            cloudinary.uploader.upload,
             file,
             resource_type=resource_type,
             folder='chat-attachments',
@@ -1975,7 +2555,7 @@ def login():
         print(f"[LOGIN] User found: {user.id}")
         
         # Check password
-        if not bcrypt.check_password_hash(user.password_hash, data['password']):
+        if not offload(bcrypt.check_password_hash, user.password_hash, data['password']):
             print("[LOGIN] Invalid password")
             return jsonify({'error': 'Invalid credentials'}), 401
         
@@ -2131,7 +2711,7 @@ def reset_password():
             return jsonify({'error': 'User not found'}), 404
         
         # Update password
-        user.password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        user.password_hash = offload(bcrypt.generate_password_hash, new_password).decode('utf-8')
         user.reset_password_token = None
         user.reset_password_expires = None
         user.failed_login_attempts = 0  # Reset failed attempts
@@ -2171,12 +2751,12 @@ def change_password():
         return jsonify({'error': 'User not found'}), 404
 
     # Check current password
-    if not check_password_hash(user.password_hash, current_password):
+    if not offload(check_password_hash, user.password_hash, current_password):
         return jsonify({'error': 'Current password is incorrect'}), 400
     print("Before:", user.password_hash)
     # Hash and save new password
     user = User.query.get(user_id)
-    user.password_hash = generate_password_hash(new_password)
+    user.password_hash = offload(generate_password_hash, new_password)
     print("After:", user.password_hash)
     db.session.commit()
     user_from_db = User.query.get(user_id)
@@ -2353,9 +2933,54 @@ def get_tutor_stats():
 # ============================================================================
 # TUTOR MESSAGING ROUTES
 # ============================================================================
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_PAGE_MAX = 200
+
+
+def encode_message_cursor(msg):
+    """Opaque (timestamp, id) position of a message, for before=/after="""
+    raw = json.dumps([msg.timestamp.isoformat(), msg.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_message_cursor(cursor):
+    """(timestamp, id) from encode_message_cursor; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, msg_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(msg_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def message_to_dict(msg):
+    return {
+        'id': msg.id,
+        'sender_id': msg.sender_id,
+        'text': msg.text or '',
+        'timestamp': msg.timestamp.isoformat() if msg.timestamp else None,
+        'conversation_id': msg.conversation_id,
+        'file_url': msg.file_url,      # ✅ ALWAYS include
+        'file_type': msg.file_type,    # ✅ ALWAYS include
+        'file_name': msg.file_name     # ✅ ALWAYS include
+    }
+
+
 @app.route('/api/conversations/<int:conversation_id>/messages', methods=['GET'])
 def get_conversation_messages_from_db(conversation_id):
-    """Get message history from database - FIXED VERSION"""
+    """
+    Get one page of message history, oldest first within the page
+    
+    Query params:
+    - limit: page size (default MESSAGE_PAGE_SIZE, max MESSAGE_PAGE_MAX)
+    - before: cursor; the page of messages just older than it
+    - after: cursor; the page of messages just newer than it
+    Without before/after, the newest page is returned.
+    
+    Pages are (timestamp, id) keyset seeks, so every page costs the same
+    no matter how long the conversation is. Use older_cursor as before=
+    to scroll back and newer_cursor as after= to fetch new messages.
+    """
     try:
         print(f"\n[MESSAGES] Fetching messages for conversation {conversation_id}")
         
@@ -2365,33 +2990,58 @@ def get_conversation_messages_from_db(conversation_id):
             print(f"[MESSAGES] Conversation {conversation_id} not found")
             return jsonify({'error': 'Conversation not found'}), 404
         
-        messages = Message.query.filter_by(
-            conversation_id=conversation_id
-        ).order_by(Message.timestamp.asc()).all()
-        
-        print(f"[MESSAGES] Found {len(messages)} messages in database")
-        
-        messages_list = []
-        for msg in messages:
-            message_data = {
-                'id': msg.id,
-                'sender_id': msg.sender_id,
-                'text': msg.text or '',
-                'timestamp': msg.timestamp.isoformat() if msg.timestamp else None,
-                'conversation_id': msg.conversation_id,
-                'file_url': msg.file_url,      # ✅ ALWAYS include
-                'file_type': msg.file_type,    # ✅ ALWAYS include
-                'file_name': msg.file_name     # ✅ ALWAYS include
-            }
-            
-            if msg.file_url:
-                print(f"[MESSAGES] Message {msg.id} has file: {msg.file_type} - {msg.file_name}")
-            
-            messages_list.append(message_data)
+        before = request.args.get('before')
+        after = request.args.get('after')
+        if before and after:
+            return jsonify({'error': 'Use either before or after, not both'}), 400
+        
+        try:
+            limit = max(1, min(int(request.args.get('limit', MESSAGE_PAGE_SIZE)), MESSAGE_PAGE_MAX))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        cursor = None
+        if before or after:
+            try:
+                cursor = decode_message_cursor(before or after)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        query = Message.query.filter(Message.conversation_id == conversation_id)
+        
+        if after:
+            timestamp, msg_id = cursor
+            query = query.filter(
+                (Message.timestamp > timestamp) |
+                ((Message.timestamp == timestamp) & (Message.id > msg_id))
+            ).order_by(Message.timestamp.asc(), Message.id.asc())
+        else:
+            if before:
+                timestamp, msg_id = cursor
+                query = query.filter(
+                    (Message.timestamp < timestamp) |
+                    ((Message.timestamp == timestamp) & (Message.id < msg_id))
+                )
+            query = query.order_by(Message.timestamp.desc(), Message.id.desc())
+        
+        # One extra row tells us whether there is another page that way
+        messages = query.limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if not after:
+            messages.reverse()
+        
+        print(f"[MESSAGES] Returning {len(messages)} messages")
+        
+        messages_list = [message_to_dict(msg) for msg in messages]
         
         return jsonify({
             'messages': messages_list,
-            'total': len(messages_list)
+            'total': len(messages_list),
+            'has_older': has_more if not after else True,
+            'has_newer': has_more if after else bool(before),
+            'older_cursor': encode_message_cursor(messages[0]) if messages else before,
+            'newer_cursor': encode_message_cursor(messages[-1]) if messages else after
         }), 200
         
     except Exception as e:
@@ -2404,6 +3054,157 @@ def get_conversation_messages_from_db(conversation_id):
         }), 500
 
 
+@app.route('/api/conversations/<int:conversation_id>/read', methods=['POST'])
+@jwt_required()
+def mark_conversation_read_route(conversation_id):
+    """Move the current user's read cursor (body: optional message_id, default the last message)"""
+    try:
+        user_id = int(get_jwt_identity())
+        conversation = Conversation.query.get(conversation_id)
+        
+        if not conversation:
+            return jsonify({'error': 'Conversation not found'}), 404
+        
+        side = participant_side(conversation, user_id)
+        if side is None:
+            return jsonify({'error': 'Not a participant of this conversation'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            message_id = int(data['message_id']) if data.get('message_id') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'message_id must be an integer'}), 400
+        
+        last_read_id = mark_conversation_read(conversation, user_id, message_id)
+        
+        socketio.emit('messages_read', {
+            'conversationId': conversation_id,
+            'userId': user_id,
+            'messageIds': [],
+            'lastReadMessageId': last_read_id
+        }, room=conversation_id)
+        
+        return jsonify({
+            'lastReadMessageId': last_read_id,
+            'unreadCount': getattr(conversation, f'{side}_unread')
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ [READ ERROR] {str(e)}")
+        return jsonify({'error': 'Failed to mark conversation as read'}), 500
+
+
+INBOX_PAGE_SIZE = 30
+INBOX_PAGE_MAX = 100
+
+
+def encode_inbox_cursor(conv):
+    """Opaque (last_message_time, id) position of a conversation, for before="""
+    raw = json.dumps([conv.last_message_time.isoformat() if conv.last_message_time else None, conv.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_inbox_cursor(cursor):
+    """(last_message_time or None, id) from encode_inbox_cursor; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, conv_id = json.loads(raw)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(conv_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def inbox_query(user_id, before=None):
+    """
+    (Conversation, partner User) rows of a user, most recent first
+    
+    The partner comes from the same joined query, so an inbox of any size
+    is one statement. Conversations without a last message sort last.
+    before: a decode_inbox_cursor() position; only rows after it in that order.
+    """
+    partner_id = db.case(
+        (Conversation.participant1_id == user_id, Conversation.participant2_id),
+        else_=Conversation.participant1_id
+    )
+    query = db.session.query(Conversation, User).join(User, User.id == partner_id).filter(
+        (Conversation.participant1_id == user_id) |
+        (Conversation.participant2_id == user_id)
+    ).options(load_only(User.id, User.full_name, User.user_type))
+    
+    if before:
+        timestamp, conv_id = before
+        if timestamp is None:
+            query = query.filter(Conversation.last_message_time.is_(None) & (Conversation.id < conv_id))
+        else:
+            query = query.filter(
+                (Conversation.last_message_time < timestamp) |
+                ((Conversation.last_message_time == timestamp) & (Conversation.id < conv_id)) |
+                Conversation.last_message_time.is_(None)
+            )
+    
+    return query.order_by(Conversation.last_message_time.desc().nulls_last(), Conversation.id.desc())
+
+
+def inbox_entry(conv, partner, user_id):
+    side = 'participant1' if conv.participant1_id == user_id else 'participant2'
+    return {
+        'id': conv.id,
+        'partnerId': partner.id,
+        'partnerName': partner.full_name,
+        'partnerType': partner.user_type,
+        'partnerAvatar': f'https://ui-avatars.com/api/?name={partner.full_name}',
+        'lastMessage': conv.last_message or '',
+        'lastMessageTime': conv.last_message_time.isoformat() if conv.last_message_time else None,
+        'lastMessageId': conv.last_message_id,
+        'lastReadMessageId': getattr(conv, f'{side}_last_read_id'),
+        'unreadCount': getattr(conv, f'{side}_unread') or 0
+    }
+
+
+@app.route('/api/inbox', methods=['GET'])
+@jwt_required()
+def get_inbox():
+    """
+    One page of the current user's conversations, most recent first
+    
+    Query params:
+    - limit: page size (default INBOX_PAGE_SIZE, max INBOX_PAGE_MAX)
+    - before: next_cursor of the previous page
+    """
+    try:
+        user_id = int(get_jwt_identity())
+        
+        try:
+            limit = max(1, min(int(request.args.get('limit', INBOX_PAGE_SIZE)), INBOX_PAGE_MAX))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        before = None
+        if request.args.get('before'):
+            try:
+                before = decode_inbox_cursor(request.args['before'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        # One extra row tells us whether there is another page
+        rows = inbox_query(user_id, before).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return jsonify({
+            'conversations': [inbox_entry(conv, partner, user_id) for conv, partner in rows],
+            'has_more': has_more,
+            'next_cursor': encode_inbox_cursor(rows[-1][0]) if has_more else None
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ [INBOX ERROR] {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({'error': 'Failed to retrieve conversations'}), 500
+
+
 @app.route('/api/tutors/<int:tutor_id>/conversations', methods=['GET', 'OPTIONS'])
 def get_tutor_conversations(tutor_id):
     """Get all conversations for a tutor from database"""
@@ -2419,39 +3220,14 @@ def get_tutor_conversations(tutor_id):
         if not tutor_profile:
             return jsonify({'error': 'Tutor not found'}), 404
         
-        user_id = tutor_profile.user_id
-        
-        # Get all conversations from database
-        conversations = Conversation.query.filter(
-            (Conversation.participant1_id == user_id) | 
-            (Conversation.participant2_id == user_id)
-        ).order_by(Conversation.last_message_time.desc()).all()
-        
-        print(f"[TUTOR CONV] Found {len(conversations)} conversations in database")
-        
         result = []
-        for conv in conversations:
-            # Determine partner (student)
-            partner_id = conv.participant2_id if conv.participant1_id == user_id else conv.participant1_id
-            partner = User.query.get(partner_id)
-            
-            if partner:
-                # Count unread messages (optional)
-                unread_count = 0
-                
-                result.append({
-                    'id': conv.id,
-                    'partnerId': partner.id,
-                    'studentId': partner.id,  # ✅ Add this field for compatibility
-                    'partnerName': partner.full_name,
-                    'studentName': partner.full_name,  # ✅ Add this field for compatibility
-                    'partnerAvatar': f'https://ui-avatars.com/api/?name={partner.full_name}',
-                    'lastMessage': conv.last_message or '',
-                    'lastMessageTime': conv.last_message_time.isoformat() if conv.last_message_time else None,
-                    'unreadCount': unread_count
-                })
-                
-                print(f"[TUTOR CONV] Added conversation with {partner.full_name} (ID: {partner.id})")
+        for conv, partner in inbox_query(tutor_profile.user_id).all():
+            entry = inbox_entry(conv, partner, tutor_profile.user_id)
+            entry['studentId'] = partner.id  # ✅ Add this field for compatibility
+            entry['studentName'] = partner.full_name  # ✅ Add this field for compatibility
+            result.append(entry)
+        
+        print(f"[TUTOR CONV] Found {len(result)} conversations in database")
         
         return jsonify(result), 200
         
@@ -2471,25 +3247,7 @@ def get_student_conversations(student_id):
         if not user:
             return jsonify({'error': 'Student not found'}), 404
         
-        conversations = Conversation.query.filter(
-            (Conversation.participant1_id == student_id) | 
-            (Conversation.participant2_id == student_id)
-        ).order_by(Conversation.last_message_time.desc()).all()
-        
-        result = []
-        for conv in conversations:
-            partner_id = conv.participant2_id if conv.participant1_id == student_id else conv.participant1_id
-            partner = User.query.get(partner_id)
-            
-            if partner:
-                result.append({
-                    'id': conv.id,
-                    'partnerId': partner.id,
-                    'partnerName': partner.full_name,
-                    'partnerAvatar': f'https://ui-avatars.com/api/?name={partner.full_name}',
-                    'lastMessage': conv.last_message or '',
-                    'lastMessageTime': conv.last_message_time.isoformat() if conv.last_message_time else None
-                })
+        result = [inbox_entry(conv, partner, student_id) for conv, partner in inbox_query(student_id).all()]
         
         return jsonify(result), 200
         
@@ -2553,6 +3311,8 @@ def complete_tutor_onboarding():
             profile.availability = json.dumps(data['availability'])
             print(f"[ONBOARDING] Updated availability")
         
+        refresh_tutor_match_features(profile)
+        
         # ✅ CRITICAL: Set verified to True
         profile.verified = True
         print(f"[ONBOARDING] Set verified = True")
@@ -2564,6 +3324,7 @@ def complete_tutor_onboarding():
         # ✅ Commit transaction
         db.session.commit()
         print(f"[ONBOARDING] ✅ Committed successfully")
+        schedule_tutor_recommendation_refresh(profile.user_id)
         
         # ✅ Refresh to verify
         db.session.refresh(profile)
@@ -2643,13 +3404,483 @@ def login_alt():
 # ML-POWERED TUTOR MATCHING ENDPOINT
 # ============================================================================
 
-def save_model_if_needed():
-    """Save model every 10 updates"""
+def save_model_if_needed(model_version, matcher):
+    """Count an online update; checkpoint the active version every 10 updates"""
     global update_counter
     update_counter += 1
-    if update_counter % 10 == 0:
-        rl_system.save_model(MODEL_PATH)
-        print(f"✓ Auto-saved RL model (update #{update_counter})")
+    learned_outcomes[model_version] = learned_outcomes.get(model_version, 0) + 1
+    checkpoint = active_checkpoint
+    if update_counter % 10 == 0 and checkpoint and model_version == model_registry.active_version():
+        save_model_artifact(matcher, checkpoint)
+        print(f"✓ Auto-saved RL model {model_version} (update #{update_counter})")
+
+
+def tutor_raw_match_dict(tutor):
+    """Decode the TutorProfile columns the matching system reads"""
+    return {
+        'id': tutor.user_id,
+        'expertise': json.loads(tutor.expertise) if tutor.expertise else [],
+        'languages': json.loads(tutor.languages) if tutor.languages else [],
+        'availability': json.loads(tutor.availability) if tutor.availability else {},
+        'rating': tutor.rating or 4.0,
+        'total_sessions': tutor.total_sessions or 0,
+        'teaching_style': getattr(tutor, 'teaching_style', 'adaptive')
+    }
+
+
+def refresh_tutor_match_features(tutor):
+    """
+    Normalize a tutor's matcher features once, at write time
+    
+    Call this whenever expertise, languages, availability, teaching style,
+    rating or total_sessions change, before committing.
+    """
+    features = current_model().prepare_tutor_features(tutor_raw_match_dict(tutor))
+    tutor.match_features = json.dumps(features)
+    return features
+
+
+def tutor_to_match_dict(tutor):
+    """Convert a TutorProfile row into the dict format used by the matching system"""
+    if tutor.match_features:
+        return {
+            'id': tutor.user_id,
+            'name': tutor.user.full_name,
+            'features': json.loads(tutor.match_features)
+        }
+    
+    # Rows written before match_features existed
+    tutor_dict = tutor_raw_match_dict(tutor)
+    tutor_dict['name'] = tutor.user.full_name
+    return tutor_dict
+
+
+def student_to_match_dict(student):
+    """Convert a StudentProfile row into the dict format used by the matching system"""
+    return {
+        'preferred_subjects': json.loads(student.preferred_subjects) if student.preferred_subjects else [],
+        'skill_level': student.skill_level or 'intermediate',
+        'learning_style': student.learning_style or 'visual',
+        'available_time': student.available_time or 'evening',
+        'preferred_languages': json.loads(student.preferred_languages) if student.preferred_languages else ['english'],
+        'math_score': student.math_score or 5,
+        'science_score': student.science_score or 5,
+        'language_score': student.language_score or 5,
+        'tech_score': student.tech_score or 5,
+        'motivation_level': student.motivation_level or 7
+    }
+
+
+EXPLANATION_SALT = 'match-explanation'
+
+
+def make_explanation_id(student_id, tutor_id, use_rl):
+    """Opaque, signed handle that lets a client ask for one match breakdown later"""
+    return serializer.dumps([student_id, tutor_id, bool(use_rl)], salt=EXPLANATION_SALT)
+
+
+RECOMMENDATION_TOP_N = 10
+
+# A tutor's performance score has to move at least this much after an
+# outcome before their students' precomputed recommendations are refreshed
+RECOMMENDATION_PERF_EPSILON = 0.01
+
+
+# Everything tutor_to_match_dict, enhance_match and tutor_capacity read
+MATCH_TUTOR_COLUMNS = (
+    TutorProfile.user_id,
+    TutorProfile.match_features,
+    TutorProfile.expertise,
+    TutorProfile.languages,
+    TutorProfile.availability,
+    TutorProfile.rating,
+    TutorProfile.total_sessions,
+    TutorProfile.teaching_style,
+    TutorProfile.bio,
+    TutorProfile.hourly_rate,
+    TutorProfile.years_experience,
+    TutorProfile.education,
+    TutorProfile.max_students
+)
+
+
+def load_verified_tutors():
+    """
+    All verified tutors in one query
+    
+    Returns ({user_id: TutorProfile}, [matcher dicts]) in the same order.
+    Only MATCH_TUTOR_COLUMNS and User.full_name are loaded (the user comes
+    from the join, not a lazy load per tutor), so reading any other column
+    on these rows costs an extra query.
+    """
+    tutors = db.session.query(TutorProfile).join(TutorProfile.user).options(
+        load_only(*MATCH_TUTOR_COLUMNS),
+        contains_eager(TutorProfile.user).load_only(User.full_name)
+    ).filter(
+        User.user_type == 'tutor',
+        TutorProfile.verified == True
+    ).order_by(TutorProfile.user_id).all()
+    
+    tutors_by_id = {tutor.user_id: tutor for tutor in tutors}
+    return tutors_by_id, [tutor_to_match_dict(tutor) for tutor in tutors_by_id.values()]
+
+
+def enhance_match(match, tutor):
+    """Add the tutor card fields shown next to a match"""
+    return {
+        **match,
+        'bio': tutor.bio,
+        'hourly_rate': tutor.hourly_rate,
+        'years_experience': getattr(tutor, 'years_experience', ''),
+        'education': getattr(tutor, 'education', '')
+    }
+
+
+def rank_tutors_for_student(student_id, student_profile, tutors_by_id, tutors_list, use_rl=True, matcher=None):
+    """Top RECOMMENDATION_TOP_N enhanced matches for one student"""
+    matches = (matcher or current_model()).match_student_to_tutors(
+        student_id,
+        student_profile,
+        tutors_list,
+        use_rl=use_rl
+    )
+    
+    enhanced_matches = []
+    for match in matches[:RECOMMENDATION_TOP_N]:
+        tutor = tutors_by_id.get(match['tutor_id'])
+        if tutor:
+            enhanced_matches.append(enhance_match(match, tutor))
+    return enhanced_matches
+
+
+def save_recommendation(student_user_id, matches, existing):
+    """
+    Insert or update a student's Recommendation row (caller commits)
+    
+    existing is the caller's own lookup of the row (None when there is
+    none), so it is not queried again. When two requests for a new student
+    race, the losing insert fails on the unique student_id inside its
+    savepoint and updates the winner's row.
+    
+    The RecommendationTutor rows for the student are rewritten alongside.
+    """
+    matches_json = json.dumps(matches)
+    tutor_rows = [{'student_id': student_user_id, 'tutor_id': m['tutor_id']} for m in matches]
+    now = datetime.utcnow()
+    if existing is None:
+        try:
+            with db.session.begin_nested():
+                rec = Recommendation(student_id=student_user_id, matches=matches_json,
+                                     stale=False, computed_at=now)
+                db.session.add(rec)
+                if tutor_rows:
+                    db.session.execute(db.insert(RecommendationTutor), tutor_rows)
+            return rec
+        except IntegrityError:
+            existing = Recommendation.query.filter_by(student_id=student_user_id).one()
+    existing.matches = matches_json
+    existing.stale = False
+    existing.computed_at = now
+    RecommendationTutor.query.filter_by(student_id=student_user_id).delete(synchronize_session=False)
+    if tutor_rows:
+        db.session.execute(db.insert(RecommendationTutor), tutor_rows)
+    return existing
+
+
+def mark_recommendation_stale(student_user_id):
+    """Have the next match request recompute this student's recommendations (caller commits)"""
+    Recommendation.query.filter_by(student_id=student_user_id).update({'stale': True})
+
+
+def iter_active_students(student_ids=None, batch_size=200):
+    """Pipeline stage: yield batches of students that completed the survey"""
+    query = db.session.query(StudentProfile.user_id).filter(
+        StudentProfile.survey_completed == True
+    )
+    if student_ids is not None:
+        query = query.filter(StudentProfile.user_id.in_(student_ids))
+    user_ids = [row.user_id for row in query.order_by(StudentProfile.user_id).all()]
+    
+    for i in range(0, len(user_ids), batch_size):
+        batch_ids = user_ids[i:i + batch_size]
+        yield StudentProfile.query.filter(StudentProfile.user_id.in_(batch_ids)).all()
+
+
+def iter_ranked_students(student_batches, tutors_by_id, tutors_list):
+    """Pipeline stage: rank every tutor for each student in each batch"""
+    for batch in student_batches:
+        yield [
+            (student.user_id, rank_tutors_for_student(
+                str(student.user_id),
+                student_to_match_dict(student),
+                tutors_by_id,
+                tutors_list
+            ))
+            for student in batch
+        ]
+
+
+def refresh_recommendations(student_ids=None, batch_size=200):
+    """
+    Recompute precomputed recommendations
+    
+    Streams students -> ranking -> writes, committing once per batch.
+    With student_ids=None every active student is refreshed (nightly job).
+    """
+    tutors_by_id, tutors_list = load_verified_tutors()
+    refreshed = 0
+    
+    batches = iter_active_students(student_ids, batch_size)
+    for ranked in iter_ranked_students(batches, tutors_by_id, tutors_list):
+        existing = {
+            rec.student_id: rec
+            for rec in Recommendation.query.filter(
+                Recommendation.student_id.in_([user_id for user_id, _ in ranked])
+            ).all()
+        }
+        for user_id, matches in ranked:
+            save_recommendation(user_id, matches, existing.get(user_id))
+        db.session.commit()
+        refreshed += len(ranked)
+    
+    return refreshed
+
+
+def tutor_subject_terms(tutor, matcher):
+    """
+    Lower-case terms a student's preferred_subjects must contain to share a
+    subject with the tutor: the tutor's expertise plus the name and every
+    keyword of the subject groups it falls in
+    """
+    expertise = [e.lower() for e in (json.loads(tutor.expertise) if tutor.expertise else [])]
+    terms = set(expertise)
+    for subject in expertise:
+        category = matcher.get_subject_category(subject)
+        if category in matcher.subject_groups:
+            terms.add(category)
+            terms.update(matcher.subject_groups[category])
+    return sorted(terms)
+
+
+def refresh_recommendations_for_tutor(tutor_user_id, page_size=200):
+    """
+    Incremental refresh after a tutor's profile or performance changed
+    
+    Only two sets of students are read, a page at a time:
+    - those whose stored list contains the tutor: fully recomputed (the
+      tutor may have dropped out)
+    - those sharing a subject with the tutor: only this tutor is scored,
+      and spliced in when it beats the student's last recommendation
+    Anyone else is left to the nightly refresh-recommendations job.
+    """
+    matcher = current_model()
+    tutor = TutorProfile.query.filter_by(user_id=tutor_user_id).first()
+    tutor_dict = tutor_to_match_dict(tutor) if tutor and tutor.verified else None
+    
+    candidates = Recommendation.student_id.in_(
+        db.select(RecommendationTutor.student_id).where(RecommendationTutor.tutor_id == tutor_user_id)
+    )
+    if tutor_dict is not None:
+        subjects = db.func.lower(StudentProfile.preferred_subjects)
+        candidates = db.or_(candidates, *[subjects.contains(term, autoescape=True)
+                                          for term in tutor_subject_terms(tutor, matcher)])
+    
+    full_refresh = []
+    spliced = 0
+    after = 0
+    while True:
+        rows = db.session.query(Recommendation, StudentProfile).join(
+            StudentProfile, StudentProfile.user_id == Recommendation.student_id
+        ).filter(
+            Recommendation.stale == False,
+            Recommendation.student_id > after,
+            candidates
+        ).order_by(Recommendation.student_id).limit(page_size).all()
+        if not rows:
+            break
+        after = rows[-1][0].student_id
+        
+        for rec, student in rows:
+            matches = json.loads(rec.matches)
+            
+            if any(m['tutor_id'] == tutor_user_id for m in matches):
+                full_refresh.append(rec.student_id)
+                continue
+            
+            if tutor_dict is None:
+                continue
+            
+            match = matcher.match_student_to_tutors(
+                str(student.user_id),
+                student_to_match_dict(student),
+                [tutor_dict]
+            )[0]
+            
+            if len(matches) < RECOMMENDATION_TOP_N or match['match_score'] > matches[-1]['match_score']:
+                matches.append(enhance_match(match, tutor))
+                matches.sort(key=lambda m: m['match_score'], reverse=True)
+                save_recommendation(rec.student_id, matches[:RECOMMENDATION_TOP_N], rec)
+                spliced += 1
+        
+        db.session.commit()
+    
+    refreshed = refresh_recommendations(full_refresh, page_size) if full_refresh else 0
+    print(f"✓ Recommendations for tutor {tutor_user_id}: {spliced} spliced, {refreshed} recomputed")
+
+
+def _refresh_recommendations_for_tutor_task(tutor_user_id):
+    with app.app_context():
+        try:
+            refresh_recommendations_for_tutor(tutor_user_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error refreshing recommendations for tutor {tutor_user_id}: {e}")
+            import traceback
+            traceback.print_exc()
+
+
+def schedule_tutor_recommendation_refresh(tutor_user_id):
+    """Run refresh_recommendations_for_tutor off the request thread"""
+    socketio.start_background_task(_refresh_recommendations_for_tutor_task, tutor_user_id)
+
+
+@app.cli.command('refresh-recommendations')
+def refresh_recommendations_command():
+    """Nightly batch job: recompute every active student's recommendations"""
+    start = time.time()
+    refreshed = refresh_recommendations()
+    print(f"✓ Refreshed recommendations for {refreshed} students in {time.time() - start:.1f}s")
+
+
+# ============================================================================
+# MATCH EVENT LOG
+# ============================================================================
+
+def write_match_events(grouped):
+    """EventLogWriter batch callback: one multi-row insert per event kind"""
+    with app.app_context():
+        try:
+            impressions = grouped.get('impression')
+            if impressions:
+                for row in impressions:
+                    row['tutor_ids'] = json.dumps(row['tutor_ids'])
+                    row['scores'] = json.dumps(row['scores'])
+                db.session.execute(MatchImpression.__table__.insert(), impressions)
+            
+            outcomes = grouped.get('outcome')
+            if outcomes:
+                for row in outcomes:
+                    row['outcome'] = json.dumps(row['outcome'])
+                    row['student_features'] = json.dumps(row['student_features'])
+                    row['tutor_features'] = json.dumps(row['tutor_features'])
+                db.session.execute(MatchOutcome.__table__.insert(), outcomes)
+            
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+match_event_log = EventLogWriter(
+    write_match_events,
+    max_buffer=int(os.getenv('MATCH_EVENT_BUFFER', '10000')),
+    flush_interval=float(os.getenv('MATCH_EVENT_FLUSH_INTERVAL', '2'))
+)
+
+
+def log_match_impression(student_id, matches, model_version, use_rl, precomputed,
+                         experiment=None, arm=None):
+    """Queue one served ranking for the event log (never blocks the request)"""
+    match_event_log.log('impression', {
+        'student_id': int(student_id),
+        'tutor_ids': [match['tutor_id'] for match in matches],
+        'scores': [match['match_score'] for match in matches],
+        'model_version': model_version,
+        'use_rl': bool(use_rl),
+        'precomputed': precomputed,
+        'experiment': experiment.name if experiment else None,
+        'arm': arm['name'] if arm else None,
+        'created_at': datetime.utcnow()
+    })
+
+
+def log_match_outcome(student_id, tutor_id, reward, outcome, student_features,
+                      tutor_features, model_version, source):
+    """Queue one outcome, with the features the model learned from, for the event log"""
+    match_event_log.log('outcome', {
+        'student_id': int(student_id),
+        'tutor_id': int(tutor_id),
+        'reward': reward,
+        'outcome': outcome,
+        'student_features': student_features,
+        'tutor_features': tutor_features,
+        'model_version': model_version,
+        'source': source,
+        'created_at': datetime.utcnow()
+    })
+
+
+def experiment_arm_for(student_id):
+    """(experiment, arm) for this student, or (None, None) when no experiment runs"""
+    if not _experiment_sync_started:
+        ensure_experiment_sync()
+    experiment = experiments.running()
+    if experiment is None:
+        return None, None
+    return experiment, experiment.assign(student_id)
+
+
+def arm_model(arm):
+    """
+    (model, version_id, is_active) an experiment arm is served by
+    
+    Arms pinned to a version that was evicted (or isn't built yet) fall
+    back to the active model. is_active says whether the arm ends up on the
+    active model, which is what the Recommendation table holds.
+    """
+    active_version, active = current_model_version()
+    if arm is None or not arm['model_version']:
+        return active, active_version, True
+    model = model_registry.get(arm['model_version'])
+    if model is None:
+        return active, active_version, True
+    return model, arm['model_version'], model is active
+
+
+def impression_for_outcome(student_id, tutor_id, recent=50):
+    """The latest logged impression that showed this tutor to the student, or None"""
+    impressions = MatchImpression.query.filter_by(student_id=int(student_id)).order_by(
+        MatchImpression.id.desc()
+    ).limit(recent).all()
+    for impression in impressions:
+        if int(tutor_id) in json.loads(impression.tutor_ids):
+            return impression
+    return None
+
+
+def outcome_model(impression):
+    """
+    (version_id, model) an outcome trains: the model that served the
+    impression while this worker still has it loaded (the active version or
+    one pinned by an experiment arm), otherwise the active model
+    """
+    if impression is not None and impression.model_version:
+        model = model_registry.get(impression.model_version)
+        if model is not None:
+            return impression.model_version, model
+    return current_model_version()
+
+
+def record_experiment_outcome(impression, reward):
+    """
+    Credit an outcome reward to the arm that served the impression, if it
+    belongs to the running experiment; outcomes without one are not credited
+    """
+    if not _experiment_sync_started:
+        ensure_experiment_sync()
+    experiment = experiments.running()
+    if experiment is not None and impression is not None and impression.experiment == experiment.name:
+        experiment.record_outcome(impression.arm, reward)
 
 
 @app.route('/api/match/tutors', methods=['POST'], endpoint="match")
@@ -2657,66 +3888,139 @@ def save_model_if_needed():
 def get_tutor_matches():
     """
     Get RL-enhanced tutor recommendations
+    
+    RL matches are served from the precomputed Recommendation table when the
+    student has a fresh row; otherwise they are computed live and stored.
+    
+    While an experiment is running the student's arm decides use_rl and the
+    model version, and the response says which arm served it.
+    
+    Each match only carries ids and scores plus an explanation_id;
+    the per-feature breakdown is served by /api/match/explain/<explanation_id>.
     """
     try:
+        start = time.perf_counter()
         student_id = get_jwt_identity()
         data = request.get_json()
         
         student_profile = data.get('student_profile')
-        use_rl = data.get('use_rl', True)
         
         if not student_profile:
             return jsonify({'error': 'Student profile required'}), 400
         
-        # Get all tutors from database
-        tutors = db.session.query(TutorProfile).join(User).filter(
-            User.user_type == 'tutor',
-            TutorProfile.verified == True
-        ).all()
+        experiment, arm = experiment_arm_for(student_id)
+        use_rl = arm['use_rl'] if arm else data.get('use_rl', True)
+        matcher, model_version, is_active_model = arm_model(arm)
         
-        # Convert to dict format for matching system
-        tutors_list = []
-        for tutor in tutors:
-            tutors_list.append({
-                'id': tutor.user_id,
-                'name': tutor.user.full_name,
-                'expertise': json.loads(tutor.expertise) if tutor.expertise else [],
-                'languages': json.loads(tutor.languages) if tutor.languages else [],
-                'availability': json.loads(tutor.availability) if tutor.availability else {},
-                'rating': tutor.rating or 4.0,
-                'total_sessions': tutor.total_sessions or 0,
-                'teaching_style': getattr(tutor, 'teaching_style', 'adaptive')
-            })
+        # The Recommendation table only holds the active model's RL ranking
+        use_precomputed = use_rl and is_active_model
+        
+        rec = None
+        if use_precomputed:
+            rec = Recommendation.query.filter_by(student_id=int(student_id)).first()
+        precomputed = bool(rec and not rec.stale)
+        
+        if precomputed:
+            enhanced_matches = json.loads(rec.matches)
+        else:
+            tutors_by_id, tutors_list = load_verified_tutors()
+            
+            # student_profile is only normalized on a per-student cache miss;
+            # the survey and profile endpoints invalidate it.
+            enhanced_matches = rank_tutors_for_student(
+                student_id,
+                student_profile,
+                tutors_by_id,
+                tutors_list,
+                use_rl=use_rl,
+                matcher=matcher
+            )
+            
+            if use_precomputed:
+                save_recommendation(int(student_id), enhanced_matches, rec)
+                db.session.commit()
+        
+        for match in enhanced_matches:
+            match['explanation_id'] = make_explanation_id(student_id, match['tutor_id'], use_rl)
+        
+        response = {
+            'success': True,
+            'matches': enhanced_matches,
+            'using_rl': use_rl,
+            'precomputed': precomputed
+        }
+        
+        log_match_impression(student_id, enhanced_matches, model_version, use_rl,
+                             precomputed, experiment, arm)
         
-        # Get matches using RL system
-        matches = rl_system.match_student_to_tutors(
+        if experiment is not None:
+            experiment.record_impression(
+                arm['name'],
+                (time.perf_counter() - start) * 1000,
+                cache_hit=precomputed
+            )
+            response['experiment'] = {'name': experiment.name, 'arm': arm['name']}
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        print(f"Error in get_tutor_matches: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/match/explain/<explanation_id>', methods=['GET', 'POST'], endpoint="match_explain")
+@jwt_required()
+def explain_tutor_match(explanation_id):
+    """
+    Compute the score breakdown for one match on demand
+    
+    POST may send the same "student_profile" used for matching; otherwise
+    the stored StudentProfile is used.
+    """
+    try:
+        student_id = get_jwt_identity()
+        
+        try:
+            handle_student_id, tutor_id, use_rl = serializer.loads(
+                explanation_id, salt=EXPLANATION_SALT
+            )
+        except BadSignature:
+            return jsonify({'error': 'Invalid explanation id'}), 400
+        
+        if str(handle_student_id) != str(student_id):
+            return jsonify({'error': 'Not authorized'}), 403
+        
+        tutor = db.session.query(TutorProfile).filter_by(user_id=tutor_id).first()
+        if not tutor:
+            return jsonify({'error': 'Tutor not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        student_profile = data.get('student_profile')
+        
+        if not student_profile:
+            student = db.session.query(StudentProfile).filter_by(user_id=student_id).first()
+            if not student:
+                return jsonify({'error': 'Student profile required'}), 400
+            student_profile = student_to_match_dict(student)
+        
+        # Same model the student's matches came from
+        matcher, _, _ = arm_model(experiment_arm_for(student_id)[1])
+        explanation = matcher.explain_match(
             student_id,
             student_profile,
-            tutors_list,
+            tutor_to_match_dict(tutor),
             use_rl=use_rl
         )
         
-        # Enhance with additional tutor info
-        enhanced_matches = []
-        for match in matches[:10]:  # Top 10
-            tutor = next((t for t in tutors if t.user_id == match['tutor_id']), None)
-            if tutor:
-                enhanced_matches.append({
-                    **match,
-                    'bio': tutor.bio,
-                    'hourly_rate': tutor.hourly_rate,
-                    'years_experience': getattr(tutor, 'years_experience', ''),
-                    'education': getattr(tutor, 'education', '')
-                })
-        
         return jsonify({
             'success': True,
-            'matches': enhanced_matches,
-            'using_rl': use_rl
+            'explanation': explanation
         }), 200
         
     except Exception as e:
-        print(f"Error in get_tutor_matches: {str(e)}")
+        print(f"Error in explain_tutor_match: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -2766,6 +4070,7 @@ def check_tutor_data():
 def test_match():
     """Debug matching with detailed logging"""
     try:
+        matcher = current_model()
         data = request.get_json()
         student_profile = data.get('student_profile')
         
@@ -2788,7 +4093,7 @@ def test_match():
         
         # Test prepare_student_features
         try:
-            student_features = rl_system.prepare_student_features(student_profile)
+            student_features = matcher.prepare_student_features(student_profile)
             print(f"✅ Student features prepared: {student_features}")
         except Exception as e:
             print(f"❌ Error in prepare_student_features: {e}")
@@ -2826,7 +4131,7 @@ def test_match():
                 print(f"  Languages: {tutor_dict['languages']}")
                 
                 # Test prepare_tutor_features
-                tutor_features = rl_system.prepare_tutor_features(tutor_dict)
+                tutor_features = matcher.prepare_tutor_features(tutor_dict)
                 print(f"  ✅ Tutor features prepared: {tutor_features}")
                 
             except Exception as e:
@@ -2987,7 +4292,8 @@ def submit_assignment(assignment_id):
                         print(f"[ASSIGNMENT UPLOAD] Uploading {filename} as {resource_type}")
                         
                         # Upload to Cloudinary
-                        upload_result = cloudinary.uploader.upload(
+                        upload_result = offload(
+                            cloudinary.uploader.upload,
                             file,
                             resource_type=resource_type,
                             folder=f'assignments/{assignment_id}',
@@ -3173,18 +4479,14 @@ def record_match_outcome():
         if not tutor:
             return jsonify({'error': 'Tutor not found'}), 404
         
-        tutor_profile = {
-            'id': tutor.user_id,
-            'expertise': tutor.expertise or [],
-            'languages': tutor.languages or [],
-            'availability': tutor.availability or {},
-            'rating': tutor.rating or 4.0,
-            'total_sessions': tutor.total_sessions or 0,
-            'teaching_style': tutor.teaching_style or 'adaptive'
-        }
+        # Train (and credit) whatever served the tutor to this student
+        impression = impression_for_outcome(student_id, tutor.user_id)
+        model_version, matcher = outcome_model(impression)
+        
+        tutor_profile = tutor_to_match_dict(tutor)
         
         # Record outcome in RL system
-        reward = rl_system.record_match_outcome(
+        reward = matcher.record_match_outcome(
             student_id,
             tutor_id,
             student_profile,
@@ -3193,7 +4495,7 @@ def record_match_outcome():
         )
         
         # Update tutor statistics in database
-        tutor.total_sessions = rl_system.tutor_performance[tutor_id]['total_matches']
+        tutor.total_sessions = matcher.tutor_performance[tutor_id]['total_matches']
         
         # Update average rating
         satisfaction = outcome.get('satisfaction_rating', 3) / 5.0
@@ -3204,10 +4506,27 @@ def record_match_outcome():
         else:
             tutor.rating = satisfaction * 5
         
+        # rating and total_sessions are matcher features too
+        refresh_tutor_match_features(tutor)
+        
+        # The student's weights changed
+        mark_recommendation_stale(int(student_id))
+        
         db.session.commit()
         
+        # rating always moves here, so the tutor's rows are refreshed every time
+        schedule_tutor_recommendation_refresh(tutor.user_id)
+        
+        record_experiment_outcome(impression, reward)
+        log_match_outcome(
+            student_id, tutor.user_id, reward, outcome,
+            matcher.get_student_features(student_id, student_profile),
+            matcher.resolve_tutor_features(tutor_profile),
+            model_version, 'record-outcome'
+        )
+        
         # Save model periodically
-        save_model_if_needed()
+        save_model_if_needed(model_version, matcher)
         
         return jsonify({
             'success': True,
@@ -3249,37 +4568,23 @@ def record_quick_feedback():
         if not student or not tutor:
             return jsonify({'error': 'Profile not found'}), 404
         
+        impression = impression_for_outcome(student_id, tutor.user_id)
+        model_version, matcher = outcome_model(impression)
+        
         # Create simplified outcome
         outcome = data.get('outcome')
 
         if not outcome:
                 return jsonify({'error': 'Outcome required'}), 400
         
-        student_profile = {
-            'preferred_subjects': student.preferred_subjects or [],
-            'skill_level': student.skill_level or 'intermediate',
-            'learning_style': student.learning_style or 'visual',
-            'available_time': student.available_time or 'evening',
-            'preferred_languages': student.preferred_languages or ['english'],
-            'math_score': student.math_score or 5,
-            'science_score': student.science_score or 5,
-            'language_score': student.language_score or 5,
-            'tech_score': student.tech_score or 5,
-            'motivation_level': student.motivation_level or 7
-        }
+        # Only normalized on a cache miss (see RLTutorMatchingSystem.get_student_features)
+        student_profile = student_to_match_dict(student)
         
-        tutor_profile = {
-            'id': tutor.user_id,
-            'expertise': tutor.expertise or [],
-            'languages': tutor.languages or [],
-            'availability': tutor.availability or {},
-            'rating': tutor.rating or 4.0,
-            'total_sessions': tutor.total_sessions or 0,
-            'teaching_style': tutor.teaching_style or 'adaptive'
-        }
+        tutor_profile = tutor_to_match_dict(tutor)
+        perf_before = matcher.calculate_tutor_performance_score(tutor_id)
         
         # Record in RL system
-        reward = rl_system.record_match_outcome(
+        reward = matcher.record_match_outcome(
             student_id,
             tutor_id,
             student_profile,
@@ -3287,7 +4592,22 @@ def record_quick_feedback():
             outcome
         )
         
-        save_model_if_needed()
+        mark_recommendation_stale(student.user_id)
+        db.session.commit()
+        
+        perf_after = matcher.calculate_tutor_performance_score(tutor_id)
+        if abs(perf_after - perf_before) >= RECOMMENDATION_PERF_EPSILON:
+            schedule_tutor_recommendation_refresh(tutor.user_id)
+        
+        record_experiment_outcome(impression, reward)
+        log_match_outcome(
+            student_id, tutor.user_id, reward, outcome,
+            matcher.get_student_features(student_id, student_profile),
+            matcher.resolve_tutor_features(tutor_profile),
+            model_version, 'quick-feedback'
+        )
+        
+        save_model_if_needed(model_version, matcher)
         
         return jsonify({
             'success': True,
@@ -3307,7 +4627,8 @@ def get_tutor_performance(tutor_id):
     Get detailed performance metrics for a tutor
     """
     try:
-        perf = rl_system.tutor_performance[tutor_id]
+        matcher = current_model()
+        perf = matcher.tutor_performance[tutor_id]
         
         if perf['total_matches'] == 0:
             return jsonify({
@@ -3328,7 +4649,7 @@ def get_tutor_performance(tutor_id):
                 'student_retention': perf['student_retention'],
                 'response_time_score': perf['response_time_score'],
                 'reliability_score': perf['reliability_score'],
-                'overall_score': rl_system.calculate_tutor_performance_score(tutor_id)
+                'overall_score': matcher.calculate_tutor_performance_score(tutor_id)
             }
         }), 200
         
@@ -3345,7 +4666,7 @@ def get_student_preferences():
     """
     try:
         student_id = get_jwt_identity()
-        prefs = rl_system.student_preferences[student_id]
+        prefs = current_model().student_preferences[student_id]
         
         if not prefs['match_history']:
             return jsonify({
@@ -3375,30 +4696,34 @@ def get_student_preferences():
 
 # Manual model management endpoints (admin only)
 @app.route('/api/admin/rl-model/save', methods=['POST'])
-@jwt_required()
+@admin_required
 def admin_save_model():
     """Admin endpoint to manually save model"""
     try:
-        # Check if admin (you'd add proper admin check here)
-        rl_system.save_model(MODEL_PATH)
+        model_version, matcher = current_model_version()
+        checkpoint = active_checkpoint
+        if not checkpoint:
+            return jsonify({'error': 'Model versions are not synced yet'}), 409
+        save_model_artifact(matcher, checkpoint)
         return jsonify({
             'success': True,
-            'message': 'Model saved successfully'
+            'message': f'Model {model_version} saved successfully'
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/admin/rl-model/stats', methods=['GET'])
-@jwt_required()
+@admin_required
 def admin_get_stats():
     """Get overall RL system statistics"""
     try:
-        total_tutors = len(rl_system.tutor_performance)
-        total_students = len(rl_system.student_preferences)
+        matcher = current_model()
+        total_tutors = len(matcher.tutor_performance)
+        total_students = len(matcher.student_preferences)
         total_matches = sum(
             perf['total_matches'] 
-            for perf in rl_system.tutor_performance.values()
+            for perf in matcher.tutor_performance.values()
         )
         
         return jsonify({
@@ -3408,11 +4733,808 @@ def admin_get_stats():
                 'total_students_tracked': total_students,
                 'total_matches_recorded': total_matches,
                 'model_updates': update_counter,
-                'exploration_rate': rl_system.epsilon
+                'model_version': model_registry.active_version(),
+                'exploration_rate': matcher.epsilon,
+                'q_table_states': len(matcher.q_table),
+                'state_space': matcher.state_encoder.stats(),
+                'event_log': match_event_log.stats()
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def model_artifact_path(version_id):
+    return os.path.join(MODEL_DIR, 'versions', f"{version_id}.pkl")
+
+
+def model_checkpoint_path(row):
+    """Online-learning checkpoint of one activation of a version"""
+    return os.path.join(MODEL_DIR, 'checkpoints', f"{row.version}-{row.activated_at:%Y%m%d%H%M%S%f}.pkl")
+
+
+def save_model_artifact(model, path):
+    """Write a model pickle atomically, so no worker ever loads half a file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    model.save_model(tmp)
+    os.replace(tmp, path)
+
+
+def write_model_version(row, model):
+    """Save a built model as the row's artifact and mark it ready (caller commits)"""
+    db.session.flush()  # assigns the id the version is named after
+    row.artifact = model_artifact_path(row.version)
+    save_model_artifact(model, row.artifact)
+    row.status = 'ready'
+
+
+def get_model_version(version_id):
+    """The ModelVersion row of a 'v<id>' version, or None"""
+    if not version_id or version_id[0] != 'v' or not version_id[1:].isdigit():
+        return None
+    return db.session.get(ModelVersion, int(version_id[1:]))
+
+
+def active_model_version():
+    """The ModelVersion every worker should serve (activated last), or None"""
+    return ModelVersion.query.filter(ModelVersion.activated_at.isnot(None)).order_by(
+        ModelVersion.activated_at.desc(), ModelVersion.id.desc()
+    ).first()
+
+
+def load_model_version(row, checkpoint=None):
+    """This worker's copy of a ready version, loaded from its pickle (or checkpoint) on first use"""
+    model = model_registry.get(row.version)
+    if model is None:
+        model = RLTutorMatchingSystem()
+        model.load_model(checkpoint if checkpoint and os.path.exists(checkpoint) else row.artifact)
+        model_registry.register(model, source=row.source, description=row.description or '',
+                                version_id=row.version)
+    return model
+
+
+def switch_active_model(row):
+    """Serve an activated version in this worker -> the version it replaced"""
+    global active_checkpoint
+    checkpoint = model_checkpoint_path(row)
+    load_model_version(row, checkpoint)
+    previous = model_registry.active_version()
+    model_registry.activate(row.version)
+    
+    old_checkpoint, active_checkpoint = active_checkpoint, checkpoint
+    if old_checkpoint and old_checkpoint != checkpoint and os.path.exists(old_checkpoint):
+        os.remove(old_checkpoint)
+    
+    # An older version may hold student features cached before a profile edit
+    model_registry.current().clear_student_cache()
+    return previous
+
+
+def keep_learned_model(version_id):
+    """
+    Save what this worker learned online on a version it no longer serves
+    as a new ready version, and reload the original pickle next time the
+    old version is used -> the new version id, or None if nothing was learned
+    """
+    learned = learned_outcomes.pop(version_id, 0)
+    model = model_registry.get(version_id)
+    model_registry.discard(version_id)
+    if not learned or model is None:
+        return None
+    
+    row = ModelVersion(source=f"learned:{version_id}",
+                       description=f"{version_id} plus {learned} outcomes learned online")
+    db.session.add(row)
+    write_model_version(row, model)
+    db.session.commit()
+    print(f"✓ [MODEL] Kept {learned} outcomes learned on {version_id} as {row.version}")
+    return row.version
+
+
+def activate_model_version(version_id):
+    """
+    Make a ready version the one every worker serves
+    
+    This worker switches at once, the others within MODEL_SYNC_INTERVAL.
+    Only this worker's online learning on the outgoing version is kept
+    (see keep_learned_model); run one worker to keep all of it.
+    Returns the kept version id (or None); raises KeyError for an unknown
+    version and ValueError when it isn't ready.
+    """
+    row = get_model_version(version_id)
+    if row is None:
+        raise KeyError(version_id)
+    if row.status != 'ready':
+        raise ValueError(f"Version {version_id} is {row.status}")
+    
+    load_model_version(row)  # fail before publishing a version that won't load
+    row.activated_at = datetime.utcnow()
+    Recommendation.query.update({'stale': True})
+    db.session.commit()
+    
+    previous = switch_active_model(row)
+    print(f"✓ [MODEL] Recommendations marked stale after activating {version_id}")
+    return keep_learned_model(previous) if previous != version_id else None
+
+
+def rollback_model_version():
+    """Re-activate the version that was active before the current one -> (version, kept version)"""
+    current = active_model_version()
+    previous = ModelVersion.query.filter(
+        ModelVersion.activated_at.isnot(None),
+        ModelVersion.status == 'ready',
+        ModelVersion.id != (current.id if current else None)
+    ).order_by(ModelVersion.activated_at.desc()).first()
+    if current is None or previous is None:
+        raise ValueError('No previous version to roll back to')
+    return previous.version, activate_model_version(previous.version)
+
+
+def sync_active_model():
+    """
+    Serve the version the ModelVersion table says is active -> True if
+    this worker switched. A fresh database gets the startup model as v1.
+    """
+    row = active_model_version()
+    if row is None:
+        row = ModelVersion(source='startup',
+                           description=MODEL_PATH if os.path.exists(MODEL_PATH) else 'fresh model',
+                           activated_at=datetime.utcnow())
+        db.session.add(row)
+        write_model_version(row, model_registry.current())
+        db.session.commit()
+    
+    if row.version == model_registry.active_version():
+        return False
+    previous = switch_active_model(row)
+    learned_outcomes.pop(previous, None)
+    model_registry.discard(previous)
+    print(f"✓ [MODEL] Serving {row.version}")
+    return True
+
+
+def _model_sync_loop():
+    while True:
+        with app.app_context():
+            try:
+                sync_active_model()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ [MODEL] Sync failed: {e}")
+        socketio.sleep(MODEL_SYNC_INTERVAL)
+
+
+def ensure_model_sync():
+    """Start following the shared active version (on the first current_model() call)"""
+    global _model_sync_started
+    with _model_sync_lock:
+        if _model_sync_started:
+            return
+        _model_sync_started = True
+    socketio.start_background_task(_model_sync_loop)
+
+
+@app.route('/api/admin/rl-model/versions', methods=['GET'])
+@admin_required
+def admin_list_model_versions():
+    """List model versions, which one is active and which this worker serves"""
+    active = active_model_version()
+    return jsonify({
+        'success': True,
+        'active_version': active.version if active else None,
+        'serving_version': model_registry.active_version(),
+        'versions': [
+            {
+                'version': row.version,
+                'status': row.status,
+                'source': row.source,
+                'description': row.description,
+                'error': row.error,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'activated_at': row.activated_at.isoformat() if row.activated_at else None,
+                'active': row is active,
+                'loaded': model_registry.get(row.version) is not None
+            }
+            for row in ModelVersion.query.order_by(ModelVersion.id).all()
+        ]
+    }), 200
+
+
+@app.route('/api/admin/rl-model/versions', methods=['POST'])
+@admin_required
+def admin_create_model_version():
+    """
+    Build a new model version in the background
+    
+    Request body:
+    {
+        "model_file": "retrained.pkl",  // load from MODEL_DIR, or
+        "base_weights": {...},          // clone the active model with overrides
+        "subject_groups": {...},
+        "epsilon": 0.1,
+        "performance_blend": 0.3,
+        "description": "...",
+        "activate": true                // publish as soon as it is ready
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        activate = bool(data.get('activate', False))
+        description = data.get('description', '')
+        
+        if data.get('model_file'):
+            filepath = os.path.join(MODEL_DIR, secure_filename(data['model_file']))
+            if not os.path.exists(filepath):
+                return jsonify({'error': f'Model file not found in {MODEL_DIR}/'}), 404
+            
+            def factory():
+                model = RLTutorMatchingSystem()
+                model.load_model(filepath)
+                return model
+            source = f"file:{os.path.basename(filepath)}"
+        else:
+            overrides = {
+                key: data[key]
+                for key in ('base_weights', 'subject_groups', 'epsilon',
+                            'learning_rate', 'discount_factor', 'performance_blend')
+                if key in data
+            }
+            if 'performance_blend' in overrides and not 0 <= overrides['performance_blend'] <= 1:
+                return jsonify({'error': 'performance_blend must be between 0 and 1'}), 400
+            if 'base_weights' in overrides:
+                missing = set(RLTutorMatchingSystem.FEATURE_NAMES) - set(overrides['base_weights'])
+                if missing:
+                    return jsonify({'error': f'base_weights missing: {sorted(missing)}'}), 400
+            
+            base = current_model()
+            
+            def factory():
+                return base.clone(**overrides)
+            source = f"clone:{model_registry.active_version()}"
+        
+        row = ModelVersion(source=source, description=description)
+        db.session.add(row)
+        db.session.commit()
+        version_id = row.version
+        
+        def build():
+            try:
+                model = factory()
+                with app.app_context():
+                    write_model_version(get_model_version(version_id), model)
+                    db.session.commit()
+            except Exception as e:
+                with app.app_context():
+                    failed = get_model_version(version_id)
+                    failed.status = 'failed'
+                    failed.error = str(e)
+                    db.session.commit()
+                raise
+            return model
+        
+        def on_ready(version_id):
+            if not activate:
+                return
+            with app.app_context():
+                try:
+                    activate_model_version(version_id)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ [MODEL] Activating {version_id} failed: {e}")
+        
+        model_registry.build_async(
+            build,
+            source=source,
+            description=description,
+            on_ready=on_ready,
+            version_id=version_id
+        )
+        
+        return jsonify({
+            'success': True,
+            'version': version_id,
+            'status': 'building'
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/rl-model/versions/<version_id>/activate', methods=['POST'])
+@admin_required
+def admin_activate_model_version(version_id):
+    """Hot-swap every worker's serving model to a ready version"""
+    try:
+        kept_version = activate_model_version(version_id)
+        return jsonify({
+            'success': True,
+            'active_version': version_id,
+            'learned_version': kept_version
+        }), 200
+    except KeyError:
+        return jsonify({'error': 'Version not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+
+
+@app.route('/api/admin/rl-model/rollback', methods=['POST'])
+@admin_required
+def admin_rollback_model():
+    """
+    Re-activate the previously active model version
+    
+    What was learned online since is not thrown away: it becomes a new
+    ready version (learned_version) that can be activated again.
+    """
+    try:
+        version_id, kept_version = rollback_model_version()
+        return jsonify({
+            'success': True,
+            'active_version': version_id,
+            'learned_version': kept_version
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+
+
+def tutor_enrolled_loads():
+    """{TutorProfile.id: students with an unfinished enrollment in one of the tutor's courses}"""
+    return dict(
+        db.session.query(Course.tutor_id, db.func.count(db.distinct(Enrollment.student_id)))
+        .join(Enrollment, Enrollment.course_id == Course.id)
+        .filter(Enrollment.completed == False)
+        .group_by(Course.tutor_id)
+        .all()
+    )
+
+
+def tutor_capacity(tutor, enrolled=0, default=10):
+    """
+    Free seats: max_students minus the students the tutor already teaches,
+    never below 0. max_students is free text; fall back to the profile default
+    """
+    try:
+        max_students = int(tutor.max_students)
+    except (TypeError, ValueError):
+        max_students = default
+    return max(0, max_students - enrolled)
+
+
+@app.route('/api/admin/match/cohort', methods=['POST'])
+@admin_required
+def admin_assign_cohort():
+    """
+    Capacity-aware assignment of a cohort of students to tutors
+    
+    Request body (all optional):
+    {
+        "student_ids": [1, 2, 3],  // defaults to every student who completed the survey
+        "use_rl": true,
+        "block_size": 500
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        use_rl = data.get('use_rl', True)
+        block_size = max(1, int(data.get('block_size', 500)))
+        
+        query = StudentProfile.query.filter(StudentProfile.survey_completed == True)
+        if data.get('student_ids'):
+            query = query.filter(StudentProfile.user_id.in_(data['student_ids']))
+        students = [
+            (str(student.user_id), student_to_match_dict(student))
+            for student in query.order_by(StudentProfile.user_id).all()
+        ]
+        
+        tutors_by_id, tutors_list = load_verified_tutors()
+        loads = tutor_enrolled_loads()
+        capacities = [tutor_capacity(tutor, loads.get(tutor.id, 0)) for tutor in tutors_by_id.values()]
+        
+        start = time.time()
+        result = current_model().assign_cohort(
+            students,
+            tutors_list,
+            capacities,
+            use_rl=use_rl,
+            block_size=block_size
+        )
+        solve_time = time.time() - start
+        
+        print(f"✓ Cohort assignment: {len(result['assignments'])}/{len(students)} students "
+              f"in {solve_time * 1000:.0f}ms ({result['blocks']} blocks)")
+        
+        return jsonify({
+            'success': True,
+            'total_students': len(students),
+            'total_capacity': sum(capacities),  # free seats
+            'total_enrolled': sum(loads.get(tutor.id, 0) for tutor in tutors_by_id.values()),
+            'solve_time_ms': round(solve_time * 1000, 1),
+            **result
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in admin_assign_cohort: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# ============================================================================
+# MATCHER EXPERIMENTS
+# ============================================================================
+
+_experiment_flush_lock = threading.Lock()
+_experiment_sync_lock = threading.Lock()  # the sync loop and admin endpoints both sync
+_experiment_sync_started = False
+
+
+def flush_experiment_counters():
+    """Add the running experiment's in-memory counters to ExperimentArmStats"""
+    experiment = experiments.running()
+    if experiment is None:
+        return 0
+    return flush_experiment(experiment)
+
+
+def flush_experiment(experiment):
+    """
+    Add this worker's unflushed counters to ExperimentArmStats
+
+    Every worker flushes its own increments, so rows are updated in place
+    (x = x + delta) rather than read and written back.
+    """
+    with _experiment_flush_lock:
+        snapshot = experiment.counters.totals()
+        deltas = experiment.unflushed(snapshot)
+        if not deltas:
+            return 0
+        
+        now = datetime.utcnow()
+        for arm_name, delta in deltas.items():
+            values = {
+                field: getattr(ExperimentArmStats, field) + delta[field]
+                for field in COUNTER_FIELDS if field != 'latency_ms_max'
             }
+            values['latency_ms_max'] = db.case(
+                (ExperimentArmStats.latency_ms_max < delta['latency_ms_max'], delta['latency_ms_max']),
+                else_=ExperimentArmStats.latency_ms_max
+            )
+            values['updated_at'] = now
+            arm_rows = ExperimentArmStats.query.filter_by(experiment=experiment.name, arm=arm_name)
+            if arm_rows.update(values, synchronize_session=False):
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ExperimentArmStats(experiment=experiment.name, arm=arm_name,
+                                                      updated_at=now, **delta))
+            except IntegrityError:
+                arm_rows.update(values, synchronize_session=False)  # another worker added it first
+        
+        db.session.commit()
+        experiment.mark_flushed(snapshot)
+        return len(deltas)
+
+
+def experiment_run_dict(run):
+    return {
+        'name': run.name,
+        'arms': json.loads(run.arms),
+        'started_at': run.started_at.isoformat(),
+        'stopped_at': run.stopped_at.isoformat() if run.stopped_at else None
+    }
+
+
+def running_experiment_run():
+    """The ExperimentRun every worker should be running, or None"""
+    return ExperimentRun.query.filter(ExperimentRun.stopped_at.is_(None)).order_by(
+        ExperimentRun.started_at.desc(), ExperimentRun.id.desc()
+    ).first()
+
+
+def sync_running_experiment():
+    """
+    Run the experiment the ExperimentRun table says is running -> True if
+    this worker started or stopped one. A stopped experiment's last
+    counters are flushed first.
+    """
+    with _experiment_sync_lock:
+        run = running_experiment_run()
+        local = experiments.running()
+        if local is not None and run is not None and \
+                (local.name, local.started_at) == (run.name, run.started_at):
+            return False
+        if local is None and run is None:
+            return False
+        
+        if local is not None:
+            experiments.stop(local.name)
+            flush_experiment(local)
+        if run is not None:
+            experiment = Experiment(run.name, json.loads(run.arms),
+                                    sharded_counters=ASYNC_MODE == 'threading',
+                                    started_at=run.started_at)
+            for arm in experiment.arms:
+                row = get_model_version(arm['model_version'])
+                if row is not None and row.status == 'ready':
+                    load_model_version(row)
+            experiments.start(experiment)
+        return True
+
+
+def _experiment_loop():
+    last_flush = time.monotonic()
+    while True:
+        with app.app_context():
+            try:
+                sync_running_experiment()
+                if time.monotonic() - last_flush >= EXPERIMENT_FLUSH_INTERVAL:
+                    last_flush = time.monotonic()
+                    flush_experiment_counters()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ [EXPERIMENT] Sync failed: {e}")
+        socketio.sleep(min(EXPERIMENT_SYNC_INTERVAL, EXPERIMENT_FLUSH_INTERVAL))
+
+
+def ensure_experiment_sync():
+    """Start following the shared running experiment (on the first match request)"""
+    global _experiment_sync_started
+    with _experiment_flush_lock:
+        if _experiment_sync_started:
+            return
+        _experiment_sync_started = True
+    socketio.start_background_task(_experiment_loop)
+
+
+@app.route('/api/admin/experiments', methods=['GET'])
+@admin_required
+def admin_list_experiments():
+    """The running experiment and every experiment with flushed counters"""
+    run = running_experiment_run()
+    running = experiment_run_dict(run) if run else None
+    names = [
+        row.experiment
+        for row in db.session.query(ExperimentArmStats.experiment).distinct().all()
+    ]
+    return jsonify({
+        'success': True,
+        'running': running,
+        'serving': experiments.running().name if experiments.running() else None,
+        'experiments': sorted(names)
+    }), 200
+
+
+@app.route('/api/admin/experiments', methods=['POST'])
+@admin_required
+def admin_start_experiment():
+    """
+    Start an experiment in the match path
+    
+    Request body:
+    {
+        "name": "rl-vs-baseline",
+        "arms": [
+            {"name": "rl", "weight": 1, "use_rl": true},
+            {"name": "baseline", "weight": 1, "use_rl": false},
+            {"name": "v3", "weight": 1, "use_rl": true, "model_version": "v3"}
+        ]
+    }
+    
+    Reusing a name keeps its assignments and adds to its counters. The
+    experiment is saved as an ExperimentRun; other workers pick it up
+    within EXPERIMENT_SYNC_INTERVAL seconds.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            experiment = Experiment(data.get('name'), data.get('arms') or [])
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        pinned = {arm['model_version']: get_model_version(arm['model_version'])
+                  for arm in experiment.arms if arm['model_version']}
+        unknown = [version_id for version_id, row in pinned.items() if row is None or row.status != 'ready']
+        if unknown:
+            return jsonify({'error': f'Model versions not ready: {unknown}'}), 400
+        
+        running = running_experiment_run()
+        if running is not None:
+            return jsonify({'error': f'Experiment {running.name} is already running'}), 409
+        
+        run = ExperimentRun(name=experiment.name, arms=json.dumps(experiment.arms),
+                            started_at=experiment.started_at)
+        db.session.add(run)
+        db.session.commit()
+        
+        ensure_experiment_sync()
+        sync_running_experiment()
+        
+        return jsonify({
+            'success': True,
+            'experiment': experiment_run_dict(run)
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in admin_start_experiment: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/experiments/<name>/stop', methods=['POST'])
+@admin_required
+def admin_stop_experiment(name):
+    """
+    Stop the running experiment after a final flush of this worker's
+    counters; other workers flush theirs when they see it stopped
+    """
+    try:
+        run = running_experiment_run()
+        if run is None or run.name != name:
+            return jsonify({'error': 'Experiment is not running'}), 404
+        
+        run.stopped_at = datetime.utcnow()
+        db.session.commit()
+        sync_running_experiment()
+        
+        return jsonify({'success': True, 'stopped': name}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in admin_stop_experiment: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/experiments/<name>/report', methods=['GET'])
+@admin_required
+def admin_experiment_report(name):
+    """
+    Per-arm reward and latency for an experiment (this worker's counters
+    are flushed first; other workers' are up to EXPERIMENT_FLUSH_INTERVAL old)
+    """
+    try:
+        local = experiments.running()
+        if local is not None and local.name == name:
+            flush_experiment(local)
+        
+        run = running_experiment_run()
+        running = run if run is not None and run.name == name else None
+        rows = ExperimentArmStats.query.filter_by(experiment=name).order_by(ExperimentArmStats.arm).all()
+        if not rows and running is None:
+            return jsonify({'error': 'Experiment not found'}), 404
+        
+        arms = {
+            row.arm: summarize_arm({
+                'impressions': row.impressions,
+                'cache_hits': row.cache_hits,
+                'latency_ms_sum': row.latency_ms_sum,
+                'latency_ms_max': row.latency_ms_max,
+                'outcomes': row.outcomes,
+                'reward_sum': row.reward_sum,
+                'reward_sq_sum': row.reward_sq_sum
+            })
+            for row in rows
+        }
+        
+        return jsonify({
+            'success': True,
+            'experiment': name,
+            'running': running is not None,
+            'config': experiment_run_dict(running) if running is not None else None,
+            'arms': arms
         }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in admin_experiment_report: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+# Export column specs (see event_log.py for the column kinds)
+MATCH_EVENT_EXPORTS = {
+    'impressions': (MatchImpression, [
+        ('id', 'int'),
+        ('student_id', 'int'),
+        ('tutor_ids', 'int_list'),
+        ('scores', 'float_list'),
+        ('model_version', 'str'),
+        ('use_rl', 'bool'),
+        ('precomputed', 'bool'),
+        ('experiment', 'str'),
+        ('arm', 'str'),
+        ('created_at', 'datetime')
+    ]),
+    'outcomes': (MatchOutcome, [
+        ('id', 'int'),
+        ('student_id', 'int'),
+        ('tutor_id', 'int'),
+        ('reward', 'float'),
+        ('outcome', 'json'),
+        ('student_features', 'json'),
+        ('tutor_features', 'json'),
+        ('model_version', 'str'),
+        ('source', 'str'),
+        ('created_at', 'datetime')
+    ])
+}
+
+
+def iter_match_events(kind, chunk_size=5000, since_id=0):
+    """Stream an event table in id order, chunk_size rows at a time"""
+    model, _ = MATCH_EVENT_EXPORTS[kind]
+    table = model.__table__
+    
+    def fetch_after(last_id, limit):
+        return db.session.execute(
+            db.select(table).where(table.c.id > last_id).order_by(table.c.id).limit(limit)
+        ).mappings().all()
+    
+    return iter_chunks(fetch_after, chunk_size, since_id)
+
+
+def match_event_export_stream(kind, fmt, chunk_size=5000, since_id=0):
+    """Generator of CSV text or NPZ bytes for one event table"""
+    _, columns = MATCH_EVENT_EXPORTS[kind]
+    chunks = iter_match_events(kind, chunk_size, since_id)
+    if fmt == 'npz':
+        return npz_stream(chunks, columns, list_width=RECOMMENDATION_TOP_N)
+    return csv_stream(chunks, columns)
+
+
+@app.route('/api/admin/match-events/<kind>/export', methods=['GET'])
+@admin_required
+def admin_export_match_events(kind):
+    """
+    Stream the match impression/outcome log for offline analysis
+    
+    kind: impressions | outcomes
+    Query params: format=csv|npz (default csv), chunk_size=5000,
+    since_id=0 (export only newer events, for incremental pulls)
+    """
+    try:
+        if kind not in MATCH_EVENT_EXPORTS:
+            return jsonify({'error': 'kind must be impressions or outcomes'}), 404
+        
+        fmt = request.args.get('format', 'csv')
+        if fmt not in ('csv', 'npz'):
+            return jsonify({'error': 'format must be csv or npz'}), 400
+        
+        chunk_size = min(max(int(request.args.get('chunk_size', 5000)), 1), 50000)
+        since_id = int(request.args.get('since_id', 0))
+        
+        stream = match_event_export_stream(kind, fmt, chunk_size, since_id)
+        return Response(
+            stream_with_context(stream),
+            mimetype='application/octet-stream' if fmt == 'npz' else 'text/csv',
+            headers={'Content-Disposition': f'attachment; filename=match_{kind}.{fmt}'}
+        )
+        
+    except ValueError:
+        return jsonify({'error': 'chunk_size and since_id must be integers'}), 400
     except Exception as e:
+        print(f"Error in admin_export_match_events: {str(e)}")
         return jsonify({'error': str(e)}), 500
+
+
+@app.cli.command('export-match-events')
+@click.argument('kind', type=click.Choice(sorted(MATCH_EVENT_EXPORTS)))
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'npz']), default=None,
+              help='Defaults to the output file extension')
+@click.option('--chunk-size', default=5000, show_default=True)
+@click.option('--since-id', default=0, show_default=True)
+def export_match_events_command(kind, output, fmt, chunk_size, since_id):
+    """Write the match impression/outcome log to a CSV or NPZ file"""
+    fmt = fmt or ('npz' if output.endswith('.npz') else 'csv')
+    start = time.time()
+    mode = 'wb' if fmt == 'npz' else 'w'
+    with open(output, mode, **({} if fmt == 'npz' else {'newline': ''})) as f:
+        for piece in match_event_export_stream(kind, fmt, chunk_size, since_id):
+            f.write(piece)
+    print(f"✓ Exported match {kind} to {output} in {time.time() - start:.1f}s")
+
+
 @app.route('/api/debug/check-profile/<int:profile_id>', methods=['GET'])
 def debug_check_profile(profile_id):
     """Debug endpoint to check tutor profile"""
@@ -3622,8 +5744,11 @@ def save_student_survey():
         
         print("[SURVEY] About to commit to database...")
         
+        mark_recommendation_stale(user.id)
+        
         # Commit to database
         db.session.commit()
+        current_model().invalidate_student_cache(user_id)
         
         print(f"✅ [SURVEY] Successfully saved survey for user {user_id}")
         
@@ -3787,7 +5912,8 @@ def upload_material():
         filename = secure_filename(file.filename)
         
         # Upload to Cloudinary
-        upload_result = cloudinary.uploader.upload(
+        upload_result = offload(
+            cloudinary.uploader.upload,
             file,
             resource_type=resource_type,
             folder=f'course-materials/{course_id}',
@@ -4102,7 +6228,7 @@ def delete_material(material_id):
                     print(f"[DELETE] Deleting from Cloudinary: {public_id} (type: {resource_type})")
                     
                     # Delete from Cloudinary
-                    cloudinary.uploader.destroy(public_id, resource_type=resource_type)
+                    offload(cloudinary.uploader.destroy, public_id, resource_type=resource_type)
                     print(f"✅ [DELETE] Deleted from Cloudinary")
         except Exception as cloudinary_error:
             print(f"⚠️ [DELETE] Cloudinary deletion failed (non-critical): {cloudinary_error}")
@@ -4498,6 +6624,8 @@ def update_tutor_profile_enhanced():
         else:
             print(f"  ⚠️ WARNING: 'preferred_age_groups' column doesn't exist")
     
+    refresh_tutor_match_features(profile)
+    
     # Check if profile is complete (all required fields filled)
     is_complete = all([
         profile.bio and len(profile.bio) >= 20,
@@ -4520,6 +6648,7 @@ def update_tutor_profile_enhanced():
     try:
         db.session.commit()
         print("✅ [TUTOR PROFILE UPDATE] Profile committed to database successfully")
+        schedule_tutor_recommendation_refresh(profile.user_id)
     except Exception as e:
         db.session.rollback()
         print(f"❌ [TUTOR PROFILE ERROR] Database commit failed: {str(e)}")
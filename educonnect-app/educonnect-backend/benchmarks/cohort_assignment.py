@@ -0,0 +1,93 @@
+"""
+Benchmark: cohort assignment solve time vs cohort size
+
+Usage (from educonnect-backend/):
+    python benchmarks/cohort_assignment.py
+    python benchmarks/cohort_assignment.py --sizes 100 1000 5000 --tutors 300 --block-size 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_matcher import RLTutorMatchingSystem
+
+SUBJECTS = ['mathematics', 'physics', 'chemistry', 'biology', 'python', 'english',
+            'writing', 'statistics', 'calculus', 'music', 'art', 'history']
+LANGUAGES = ['english', 'spanish', 'french', 'hindi']
+SLOTS = ['morning', 'afternoon', 'evening']
+STYLES = ['visual', 'auditory', 'kinesthetic', 'hands-on']
+
+
+def make_students(n, rng):
+    return [
+        (f"s{i}", {
+            'preferred_subjects': rng.sample(SUBJECTS, rng.randint(1, 3)),
+            'preferred_languages': rng.sample(LANGUAGES, rng.randint(1, 2)),
+            'available_time': rng.choice(SLOTS),
+            'learning_style': rng.choice(STYLES),
+            'skill_level': rng.choice(['beginner', 'intermediate', 'advanced']),
+            'math_score': rng.randint(1, 10),
+            'motivation_level': rng.randint(1, 10)
+        })
+        for i in range(n)
+    ]
+
+
+def make_tutors(n, rng):
+    return [
+        {
+            'id': f"t{i}",
+            'name': f"Tutor {i}",
+            'expertise': rng.sample(SUBJECTS, rng.randint(1, 4)),
+            'languages': rng.sample(LANGUAGES, rng.randint(1, 2)),
+            'availability': {slot: rng.random() < 0.5 for slot in SLOTS},
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'total_sessions': rng.randint(0, 300),
+            'teaching_style': rng.choice(STYLES + ['adaptive'])
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument('--tutors', type=int, default=200)
+    parser.add_argument('--capacity', type=int, default=10, help='max_students per tutor')
+    parser.add_argument('--block-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tutors = make_tutors(args.tutors, rng)
+    capacities = [args.capacity] * len(tutors)
+
+    print(f"{'students':>9} {'tutors':>7} {'seats':>7} {'blocks':>7} "
+          f"{'matrix ms':>10} {'solve ms':>10} {'assigned':>9} {'avg score':>10}")
+
+    for size in args.sizes:
+        matcher = RLTutorMatchingSystem()
+        students = make_students(size, rng)
+
+        start = time.perf_counter()
+        scores = matcher.score_matrix(students, tutors)
+        matrix_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = matcher.assign_cohort(students, tutors, capacities,
+                                       block_size=args.block_size, scores=scores)
+        solve_time = time.perf_counter() - start
+
+        assigned = len(result['assignments'])
+        avg_score = result['total_score'] / max(assigned, 1)
+        print(f"{size:>9} {len(tutors):>7} {sum(capacities):>7} {result['blocks']:>7} "
+              f"{matrix_time * 1000:>10.1f} {solve_time * 1000:>10.1f} "
+              f"{assigned:>9} {avg_score:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
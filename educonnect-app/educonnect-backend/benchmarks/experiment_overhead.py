@@ -0,0 +1,96 @@
+"""
+Benchmark: per-request overhead of experiment assignment and counters
+
+Compares the cost of assign + record_impression (what the match endpoint
+adds while an experiment runs) against one live match_student_to_tutors
+call, single-threaded and with concurrent request threads. --shared uses
+the single lock-protected counter the gevent/eventlet modes get.
+
+Usage (from educonnect-backend/):
+    python benchmarks/experiment_overhead.py
+    python benchmarks/experiment_overhead.py --requests 200000 --threads 1 8 32 --tutors 200
+    python benchmarks/experiment_overhead.py --shared
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from experiments import Experiment
+from ml_matcher import RLTutorMatchingSystem
+from cohort_assignment import make_students, make_tutors
+
+ARMS = [
+    {'name': 'rl', 'weight': 2, 'use_rl': True},
+    {'name': 'baseline', 'weight': 1, 'use_rl': False},
+    {'name': 'candidate', 'weight': 1, 'use_rl': True, 'model_version': 'v2'}
+]
+
+
+def experiment_request(experiment, student_id):
+    """What get_tutor_matches does for an experiment, minus the matching itself"""
+    start = time.perf_counter()
+    arm = experiment.assign(student_id)
+    experiment.record_impression(arm['name'], (time.perf_counter() - start) * 1000)
+
+
+def run_threads(n_threads, n_requests, experiment):
+    per_thread = n_requests // n_threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            experiment_request(experiment, offset + i)
+
+    threads = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, per_thread * n_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--tutors', type=int, default=200)
+    parser.add_argument('--match-samples', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--shared', action='store_true', help='one lock-protected counter instead of shards')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tutors = make_tutors(args.tutors, rng)
+    students = make_students(args.match_samples, rng)
+
+    matcher = RLTutorMatchingSystem()
+    start = time.perf_counter()
+    for student_id, profile in students:
+        matcher.match_student_to_tutors(student_id, profile, tutors)
+    match_us = (time.perf_counter() - start) / len(students) * 1e6
+    print(f"live match ({args.tutors} tutors): {match_us:,.0f} us/request\n")
+
+    print(f"{'threads':>8} {'requests':>9} {'us/request':>11} {'% of match':>11} {'counted':>9}")
+    for n_threads in args.threads:
+        experiment = Experiment('bench', ARMS, sharded_counters=not args.shared)
+        elapsed, done = run_threads(n_threads, args.requests, experiment)
+        per_request_us = elapsed / done * 1e6
+
+        counted = sum(arm['impressions'] for arm in experiment.counters.totals().values())
+        print(f"{n_threads:>8} {done:>9} {per_request_us:>11.2f} "
+              f"{per_request_us / match_us * 100:>10.3f}% {counted:>9}")
+
+    experiment = Experiment('bench', ARMS, sharded_counters=not args.shared)
+    run_threads(1, args.requests, experiment)
+    start = time.perf_counter()
+    experiment.counters.totals()
+    print(f"\nflush snapshot: {(time.perf_counter() - start) * 1e6:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
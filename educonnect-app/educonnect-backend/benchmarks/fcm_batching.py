@@ -0,0 +1,133 @@
+"""
+Benchmark: batched FCM delivery against a local stand-in transport
+
+fcm_messaging.send_each is replaced by a stand-in that answers per token:
+tokens starting with "dead-" are unregistered, "foreign-" belong to another
+sender, "flaky-" fail transiently and everything else succeeds. Checks that
+a send, whatever the number of users and devices, costs one token query,
+one send_each call per 500 devices and at most two UPDATEs. It also checks
+that only unregistered or foreign tokens are deactivated. Exits non-zero
+when a check fails.
+
+Usage (from educonnect-backend/):
+    python benchmarks/fcm_batching.py
+    python benchmarks/fcm_batching.py --users 5000 --devices 2
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from match_query_count import StatementCounter
+
+
+class StandInTransport:
+    """Records send_each calls and answers like FCM would, per token"""
+
+    def __init__(self, fcm_messaging):
+        self.fcm = fcm_messaging
+        self.calls = []
+
+    def send_each(self, messages, dry_run=False, app=None):
+        assert len(messages) <= 500, 'FCM rejects more than 500 messages per call'
+        self.calls.append(messages)
+        responses = []
+        for i, message in enumerate(messages):
+            if message.token.startswith('dead-'):
+                error = self.fcm.UnregisteredError('Requested entity was not found.')
+            elif message.token.startswith('foreign-'):
+                error = self.fcm.SenderIdMismatchError('SenderId mismatch')
+            elif message.token.startswith('flaky-'):
+                error = RuntimeError('503 from upstream')
+            else:
+                error = None
+            responses.append(self.fcm.SendResponse(
+                None if error else {'name': f"projects/bench/messages/{len(self.calls)}-{i}"}, error
+            ))
+        return self.fcm.BatchResponse(responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1200, help='users in the fan-out scenario')
+    parser.add_argument('--devices', type=int, default=1, help='devices per user in the fan-out')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+
+    transport = StandInTransport(A.fcm_messaging)
+    A.fcm_messaging.send_each = transport.send_each
+    A.FIREBASE_ENABLED = True
+    failures = []
+
+    def check(condition, label):
+        print(f"  {'✓' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    with A.app.app_context():
+        A.db.create_all()
+        users = []
+        for i in range(args.users + 1):
+            user = A.User(email=f"u{i}@bench", password_hash='x', user_type='student', full_name=f"User {i}")
+            A.db.session.add(user)
+            A.db.session.flush()
+            users.append(user.id)
+
+        # One user, five devices: two good, one of each failure kind
+        single = users[0]
+        for token in ('good-a', 'good-b', 'dead-a', 'foreign-a', 'flaky-a'):
+            A.db.session.add(A.FCMToken(user_id=single, token=token, is_active=True))
+        for user_id in users[1:]:
+            for d in range(args.devices):
+                A.db.session.add(A.FCMToken(user_id=user_id, token=f"ok-{user_id}-{d}", is_active=True))
+        A.db.session.commit()
+        A.FCMToken.query.update({A.FCMToken.last_used: None})
+        A.db.session.commit()
+
+        engine = A.db.engine
+        print('single user, 5 devices:')
+        with StatementCounter(engine) as counter, contextlib.redirect_stdout(io.StringIO()):
+            ok = A.send_fcm_notification(single, 'Hello', 'World', {'url': '/messages'}, 'message')
+        tokens = {t.token: t for t in A.FCMToken.query.filter_by(user_id=single)}
+        check(ok, 'reported as delivered')
+        check(len(transport.calls) == 1 and len(transport.calls[0]) == 5, 'one send_each call with 5 messages')
+        check(counter.count <= 3, f"{counter.count} SQL statements (token query + 2 UPDATEs)")
+        check(not tokens['dead-a'].is_active and not tokens['foreign-a'].is_active,
+              'unregistered and foreign tokens deactivated')
+        check(tokens['flaky-a'].is_active and tokens['good-a'].is_active, 'transient failures stay active')
+        check(tokens['good-a'].last_used is not None and tokens['flaky-a'].last_used is None,
+              'last_used set only where delivered')
+        message = transport.calls[0][0]
+        check(message.data['user_id'] == str(single) and message.webpush.notification.title.startswith('💬'),
+              'per-user data and the message template applied')
+
+        transport.calls.clear()
+        devices = args.users * args.devices
+        print(f"fan-out to {args.users} users, {devices} devices:")
+        with StatementCounter(engine) as counter, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            reached = A.send_fcm_notifications(users[1:], 'Announcement', 'Class moved', None, 'general')
+            elapsed = time.perf_counter() - start
+        expected_calls = -(-devices // 500)
+        check(len(transport.calls) == expected_calls, f"{len(transport.calls)} send_each calls (expected {expected_calls})")
+        check(counter.count <= 3, f"{counter.count} SQL statements")
+        check(sum(reached.values()) == devices, f"{sum(reached.values())} devices reached")
+        print(f"  {elapsed * 1000:.1f}ms total, {elapsed / devices * 1e6:.1f}µs per device")
+
+    if failures:
+        print(f"\n❌ {len(failures)} checks failed")
+        sys.exit(1)
+    print('\n✓ All checks passed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: SQL statements and latency of the conversation inbox vs inbox size
+
+Seeds a throwaway SQLite database with one tutor talking to a growing number
+of students, then opens the tutor's inbox through the legacy endpoint and
+pages through GET /api/inbox. Every request must stay within --budget
+statements whatever the inbox size, and the pages must cover every
+conversation exactly once; the script exits non-zero otherwise.
+
+Usage (from educonnect-backend/):
+    python benchmarks/inbox_query_count.py
+    python benchmarks/inbox_query_count.py --students 10 300 2000 --page-size 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from match_query_count import StatementCounter
+
+
+def seed(A, n_students, rng):
+    A.db.drop_all()
+    A.db.create_all()
+    tutor = A.User(email='tutor@bench', password_hash='x', user_type='tutor', full_name='Bench Tutor')
+    A.db.session.add(tutor)
+    A.db.session.flush()
+    profile = A.TutorProfile(user_id=tutor.id, verified=True)
+    A.db.session.add(profile)
+
+    start = datetime(2025, 1, 1)
+    for i in range(n_students):
+        student = A.User(email=f"s{i}@bench", password_hash='x', user_type='student',
+                         full_name=f"Student {i}")
+        A.db.session.add(student)
+        A.db.session.flush()
+        # Either participant may have written first; a few share a timestamp
+        first, second = (tutor.id, student.id) if rng.random() < 0.5 else (student.id, tutor.id)
+        A.db.session.add(A.Conversation(
+            participant1_id=first,
+            participant2_id=second,
+            last_message=f"hello {i}",
+            last_message_time=start + timedelta(minutes=rng.randint(0, n_students // 2))
+        ))
+    A.db.session.commit()
+    return tutor.id, profile.id
+
+
+def timed(client, engine, url, headers):
+    with StatementCounter(engine) as counter, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), counter.count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, nargs='+', default=[10, 100, 300, 1000])
+    parser.add_argument('--page-size', type=int, default=30)
+    parser.add_argument('--budget', type=int, default=2, help='max SQL statements per request')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+    from flask_jwt_extended import create_access_token
+
+    rng = random.Random(args.seed)
+    client = A.app.test_client()
+    failed = False
+
+    print(f"{'students':>8} {'request':>16} {'statements':>11} {'ms':>8}")
+    with A.app.app_context():
+        engine = A.db.engine
+        for n_students in args.students:
+            with contextlib.redirect_stdout(io.StringIO()):
+                user_id, tutor_id = seed(A, n_students, rng)
+            headers = {'Authorization': f"Bearer {create_access_token(identity=str(user_id))}"}
+
+            A.db.session.remove()
+            legacy, count, elapsed = timed(client, engine, f"/api/tutors/{tutor_id}/conversations", headers)
+            failed |= count > args.budget or len(legacy) != n_students
+            print(f"{n_students:>8} {'legacy inbox':>16} {count:>11} {elapsed * 1000:>8.1f}")
+
+            seen, cursor, pages, worst, total_ms = [], None, 0, 0, 0.0
+            while True:
+                A.db.session.remove()
+                url = f"/api/inbox?limit={args.page_size}" + (f"&before={cursor}" if cursor else '')
+                page, count, elapsed = timed(client, engine, url, headers)
+                seen += [conv['id'] for conv in page['conversations']]
+                pages += 1
+                worst = max(worst, count)
+                total_ms += elapsed * 1000
+                cursor = page['next_cursor']
+                if not page['has_more']:
+                    break
+
+            in_order = [conv['id'] for conv in legacy]
+            failed |= worst > args.budget or seen != in_order
+            print(f"{n_students:>8} {f'{pages} pages':>16} {worst:>11} {total_ms / pages:>8.1f}")
+
+    if failed:
+        print(f"\n❌ Over the budget of {args.budget} statements, or pages did not match the full inbox")
+        sys.exit(1)
+    print(f"\n✓ Every request stayed within {args.budget} statements and the pages covered the inbox")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: SQL statements and latency of POST /api/match/tutors vs tutor count
+
+Seeds a throwaway SQLite database, then calls the match endpoint (live
+path and precomputed path) for growing numbers of verified tutors. The
+statement count must not depend on the number of tutors; the script exits
+non-zero when a request goes over --budget statements.
+
+Usage (from educonnect-backend/):
+    python benchmarks/match_query_count.py
+    python benchmarks/match_query_count.py --tutors 10 100 1000 --budget 6
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cohort_assignment import make_tutors, SUBJECTS, LANGUAGES, SLOTS
+
+
+class StatementCounter:
+    """Counts SQL statements issued by the calling thread (not background writers)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.thread = None
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is self.thread:
+            self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        self.thread = threading.current_thread()
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def seed(A, n_tutors, rng):
+    A.db.drop_all()
+    A.db.create_all()
+    for i, tutor in enumerate(make_tutors(n_tutors, rng)):
+        user = A.User(email=f"tutor{i}@bench", password_hash='x', user_type='tutor',
+                      full_name=tutor['name'])
+        A.db.session.add(user)
+        A.db.session.flush()
+        profile = A.TutorProfile(
+            user_id=user.id,
+            expertise=json.dumps(tutor['expertise']),
+            languages=json.dumps(tutor['languages']),
+            availability=json.dumps(tutor['availability']),
+            rating=tutor['rating'],
+            total_sessions=tutor['total_sessions'],
+            teaching_style=tutor['teaching_style'],
+            bio='Bench tutor',
+            hourly_rate=30.0,
+            verified=True
+        )
+        A.refresh_tutor_match_features(profile)
+        A.db.session.add(profile)
+
+    student = A.User(email='student@bench', password_hash='x', user_type='student',
+                     full_name='Bench Student')
+    A.db.session.add(student)
+    A.db.session.commit()
+    return student.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tutors', type=int, nargs='+', default=[10, 100, 500, 1000])
+    parser.add_argument('--budget', type=int, default=6, help='max SQL statements per request')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+    from flask_jwt_extended import create_access_token
+
+    rng = random.Random(args.seed)
+    client = A.app.test_client()
+    profile = {
+        'preferred_subjects': rng.sample(SUBJECTS, 2),
+        'preferred_languages': [LANGUAGES[0]],
+        'available_time': SLOTS[2],
+        'learning_style': 'visual',
+        'skill_level': 'beginner'
+    }
+
+    print(f"{'tutors':>7} {'path':>12} {'statements':>11} {'ms':>8}")
+    over_budget = False
+    with A.app.app_context():
+        engine = A.db.engine
+        for n_tutors in args.tutors:
+            with contextlib.redirect_stdout(io.StringIO()):
+                student_id = seed(A, n_tutors, rng)
+            headers = {'Authorization': f"Bearer {create_access_token(identity=str(student_id))}"}
+
+            # First call computes live and stores the row, the second is served from it
+            for path in ('live', 'precomputed'):
+                A.db.session.remove()
+                with StatementCounter(engine) as counter, contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    response = client.post('/api/match/tutors', headers=headers,
+                                           json={'student_profile': profile})
+                    elapsed = time.perf_counter() - start
+
+                assert response.status_code == 200, response.get_json()
+                over_budget |= counter.count > args.budget
+                print(f"{n_tutors:>7} {path:>12} {counter.count:>11} {elapsed * 1000:>8.1f}")
+
+    A.match_event_log.flush()
+    if over_budget:
+        print(f"\n❌ Over the budget of {args.budget} statements per request")
+        sys.exit(1)
+    print(f"\n✓ Every request stayed within {args.budget} statements")
+
+
+if __name__ == '__main__':
+    main()
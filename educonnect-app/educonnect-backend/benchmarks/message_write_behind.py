@@ -0,0 +1,97 @@
+"""
+Benchmark: send_message handler latency, synchronous commit vs write-behind
+
+Seeds a throwaway SQLite database, then sends bursts of chat messages
+through the Socket.IO handler in both modes. Reports per-call handler
+latency and end-to-end throughput (until everything is committed), plus
+the writer's batch sizes.
+
+Usage (from educonnect-backend/):
+    python benchmarks/message_write_behind.py
+    python benchmarks/message_write_behind.py --messages 5000 --pairs 20 --flush-ms 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--pairs', type=int, default=10, help='conversations the messages spread over')
+    parser.add_argument('--flush-ms', type=float, default=5.0)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ['MESSAGE_FLUSH_INTERVAL_MS'] = str(args.flush_ms)
+    os.environ['MESSAGE_FLUSH_BATCH'] = str(args.batch)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+
+    rng = random.Random(args.seed)
+    with A.app.app_context():
+        A.db.create_all()
+        users = []
+        for i in range(args.pairs * 2):
+            user = A.User(email=f"u{i}@bench", password_hash='x', user_type='student', full_name=f"User {i}")
+            A.db.session.add(user)
+            A.db.session.flush()
+            users.append(user.id)
+        A.db.session.commit()
+
+    pairs = [(users[2 * i], users[2 * i + 1]) for i in range(args.pairs)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = A.socketio.test_client(A.app)
+
+    print(f"{'mode':>12} {'p50 ms':>8} {'p99 ms':>8} {'msgs/s':>9} {'batches':>8} {'avg batch':>10}")
+    for mode in ('sync', 'write-behind'):
+        A.MESSAGE_WRITE_BEHIND = mode == 'write-behind'
+        before = A.message_writer.stats()
+        latencies = []
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for i in range(args.messages):
+                sender, receiver = rng.choice(pairs)
+                if rng.random() < 0.5:
+                    sender, receiver = receiver, sender
+                call_start = time.perf_counter()
+                client.emit('send_message', {
+                    'conversationId': f"{min(sender, receiver)}-{max(sender, receiver)}",
+                    'sender_id': str(sender),
+                    'receiver_id': receiver,
+                    'text': f"message {i}",
+                    'timestamp': '2025-01-01T00:00:00Z',
+                    'messageId': f"{mode}-{i}"
+                })
+                latencies.append((time.perf_counter() - call_start) * 1000)
+            A.message_writer.flush()
+            elapsed = time.perf_counter() - start
+
+        after = A.message_writer.stats()
+        batches = after['batches'] - before['batches']
+        committed = after['committed'] - before['committed']
+        latencies.sort()
+        print(f"{mode:>12} {statistics.median(latencies):>8.3f} "
+              f"{latencies[int(len(latencies) * 0.99) - 1]:>8.3f} {args.messages / elapsed:>9.0f} "
+              f"{batches:>8} {committed / batches if batches else 0:>10.1f}")
+
+    with A.app.app_context():
+        stored = A.Message.query.count()
+    assert stored == 2 * args.messages, f"{stored} messages stored, expected {2 * args.messages}"
+    print(f"\n✓ All {stored:,} messages committed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark: several Socket.IO worker processes behind the stand-in broker
+
+Starts a LocalBroker (socket_broker.py) and --workers copies of the app,
+each on its own port with SOCKETIO_MESSAGE_QUEUE pointing at the broker,
+all on one throwaway SQLite database. Two users connect to different
+workers. Checks that presence, room messages and direct (per-user) emits
+cross workers, then times --messages chat messages from one worker to the
+other, and finally kills a worker with a user still connected to check that
+the others sweep it and announce the user offline. Exits non-zero when a
+check fails.
+
+Usage (from educonnect-backend/):
+    python benchmarks/multiprocess_sockets.py
+    python benchmarks/multiprocess_sockets.py --workers 3 --messages 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from socket_broker import LocalBroker
+
+WORKER = "import app; app.socketio.run(app.app, host='127.0.0.1', port={port}, allow_unsafe_werkzeug=True)"
+
+
+class Recorder:
+    """A socketio.Client that keeps every event it receives"""
+
+    def __init__(self, user_id, url):
+        self.events = []
+        self.cond = threading.Condition()
+        self.client = socketio.Client()
+        self.client.on('*', self._record)
+        self.client.connect(url, auth={'userId': str(user_id)}, transports=['polling'])
+
+    def _record(self, event, data=None):
+        with self.cond:
+            self.events.append((event, data, time.perf_counter()))
+            self.cond.notify_all()
+
+    def wait_for(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                for event in self.events:
+                    if predicate(*event[:2]):
+                        return event
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--base-port', type=int, default=15100)
+    args = parser.parse_args()
+    failures = []
+
+    def check(condition, label):
+        print(f"  {'✓' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+    with A.app.app_context():
+        A.db.create_all()
+        users = []
+        for i in range(2):
+            user = A.User(email=f"u{i}@bench", password_hash='x', user_type='student', full_name=f"User {i}")
+            A.db.session.add(user)
+            A.db.session.flush()
+            users.append(user.id)
+        A.get_or_create_conversation(*users)
+        admin = A.User(email='admin@bench', password_hash='x', user_type='admin', full_name='Admin')
+        A.db.session.add(admin)
+        A.db.session.commit()
+        admin_headers = {'Authorization': f"Bearer {A.create_access_token(identity=str(admin.id))}"}
+    alice, bob = users
+
+    broker = LocalBroker().start()
+    env = dict(os.environ, SOCKETIO_MESSAGE_QUEUE=broker.url, PRESENCE_COALESCE_SECONDS='0.1',
+               PRESENCE_HEARTBEAT_SECONDS='0.5')
+    ports = [args.base_port + i for i in range(args.workers)]
+    workers = [
+        subprocess.Popen([sys.executable, '-c', WORKER.format(port=port)], cwd=BACKEND, env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for port in ports
+    ]
+    clients = []
+    try:
+        for port in ports:
+            for _ in range(100):
+                try:
+                    requests.get(f"http://127.0.0.1:{port}/api/socket/status", timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.2)
+
+        urls = [f"http://127.0.0.1:{port}" for port in ports]
+        print(f"{args.workers} workers on {broker.url}:")
+        a = Recorder(alice, urls[0])
+        clients.append(a)
+        time.sleep(0.3)
+        b = Recorder(bob, urls[-1])
+        clients.append(b)
+
+        online = b.wait_for(lambda e, d: e == 'users_online')
+        check(online and str(alice) in online[1], "users_online on worker B lists the user on worker A")
+        check(a.wait_for(lambda e, d: e == 'user_status' and d == {'userId': str(bob), 'status': 'online'}),
+              'presence change reaches a contact on another worker')
+        check(requests.get(f"{urls[0]}/api/socket/online-users").status_code == 401,
+              'online user list needs a login')
+        listed = requests.get(f"{urls[0]}/api/socket/online-users", headers=admin_headers).json()['online_users']
+        check(sorted(listed) == sorted([str(alice), str(bob)]), 'every worker sees every online user')
+
+        room = f"{alice}-{bob}"
+        for client, (me, partner) in ((a, (alice, bob)), (b, (bob, alice))):
+            client.client.emit('join_conversation', {'conversationId': room, 'userId': me, 'partnerId': partner})
+        b.wait_for(lambda e, d: e == 'joined_conversation' and d['userId'] == bob)
+
+        a.client.emit('initiate_video_call', {
+            'meetingId': 'm-1', 'callerId': alice, 'receiverId': bob, 'callerName': 'User 0', 'joinUrl': 'x'
+        })
+        check(b.wait_for(lambda e, d: e == 'incoming_video_call' and d['meetingId'] == 'm-1'),
+              'direct emit to a user reaches their socket on another worker')
+
+        # One at a time: the polling transport refuses more than 16 queued packets
+        latencies = []
+        for i in range(args.messages):
+            message_id = f"bench-{i}"
+            start = time.perf_counter()
+            a.client.emit('send_message', {
+                'conversationId': room, 'sender_id': str(alice), 'receiver_id': bob, 'text': f"message {i}",
+                'timestamp': '2025-01-01T00:00:00Z', 'messageId': message_id
+            })
+            received = b.wait_for(lambda e, d: e == 'receive_message' and d['clientMessageId'] == message_id)
+            if received:
+                latencies.append((received[2] - start) * 1000)
+        latencies.sort()
+        check(len(latencies) == args.messages, f"{len(latencies)}/{args.messages} messages crossed workers")
+        if latencies:
+            print(f"  cross-worker message latency: p50 {statistics.median(latencies):.1f}ms, "
+                  f"max {latencies[-1]:.1f}ms")
+
+        b.client.disconnect()
+        clients.remove(b)
+        check(a.wait_for(lambda e, d: e == 'user_status' and d == {'userId': str(bob), 'status': 'offline'}),
+              'disconnect on one worker is announced on the other')
+
+        a.events.clear()
+        b = Recorder(bob, urls[-1])
+        clients.append(b)
+        a.wait_for(lambda e, d: e == 'user_status' and d == {'userId': str(bob), 'status': 'online'})
+        a.events.clear()
+        workers[-1].kill()
+        workers[-1].wait()
+        check(a.wait_for(lambda e, d: e == 'user_status' and d == {'userId': str(bob), 'status': 'offline'},
+                         timeout=10),
+              'a killed worker is swept and its user announced offline')
+        listed = requests.get(f"{urls[0]}/api/socket/online-users", headers=admin_headers).json()['online_users']
+        check(listed == [str(alice)], 'swept sockets are gone from the store')
+    finally:
+        for client in clients:
+            with contextlib.suppress(Exception):
+                client.client.disconnect()
+        for worker in workers:
+            worker.terminate()
+            worker.wait()
+        broker.stop()
+
+    if failures:
+        print(f"\n❌ {len(failures)} checks failed")
+        sys.exit(1)
+    print('\n✓ All checks passed')
+
+
+if __name__ == '__main__':
+    main()
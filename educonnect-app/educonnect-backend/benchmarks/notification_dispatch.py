@@ -0,0 +1,108 @@
+"""
+Benchmark: send_message handler latency with a slow push provider,
+notifications sent inline vs through the dispatch queue
+
+FCM is replaced by a local stand-in that sleeps --provider-ms per call, so
+no network or credentials are needed. Reports handler latency and, for the
+queued mode, the dispatcher's own metrics once the queue has drained.
+Inline mode sends from the handler as the old code did. Queued mode goes
+through push routing with a --coalesce-ms window (default 0: every message
+is its own push) and closes any open windows before draining; see
+benchmarks/push_routing.py for the routing itself.
+
+Usage (from educonnect-backend/):
+    python benchmarks/notification_dispatch.py
+    python benchmarks/notification_dispatch.py --messages 300 --provider-ms 120 --tokens 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--provider-ms', type=float, default=80.0, help='stand-in FCM latency per batch call')
+    parser.add_argument('--tokens', type=int, default=2, help='devices per receiver')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--coalesce-ms', type=float, default=0.0, help='push coalescing window in queued mode')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ['NOTIFY_WORKERS'] = str(args.workers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+
+    def fake_send_each(messages, dry_run=False, app=None):
+        time.sleep(args.provider_ms / 1000)
+        return A.fcm_messaging.BatchResponse([
+            A.fcm_messaging.SendResponse({'name': f"projects/bench/messages/{i}"}, None)
+            for i in range(len(messages))
+        ])
+
+    A.fcm_messaging.send_each = fake_send_each
+    A.FIREBASE_ENABLED = True
+
+    with A.app.app_context():
+        A.db.create_all()
+        users = []
+        for i in range(2):
+            user = A.User(email=f"u{i}@bench", password_hash='x', user_type='student', full_name=f"User {i}")
+            A.db.session.add(user)
+            A.db.session.flush()
+            users.append(user.id)
+            for t in range(args.tokens):
+                A.db.session.add(A.FCMToken(user_id=user.id, token=f"token-{i}-{t}", is_active=True))
+        A.db.session.commit()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = A.socketio.test_client(A.app)
+    route = A.route_message_notification
+    A.message_push_coalescer.window = args.coalesce_ms / 1000
+
+    def route_inline(sender_id, receiver_id, message_text, conversation_id, room):
+        A.send_message_notification(sender_id, receiver_id, message_text, conversation_id)
+
+    print(f"{'mode':>8} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8}")
+    for mode in ('inline', 'queued'):
+        A.route_message_notification = route_inline if mode == 'inline' else route
+
+        latencies = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for i in range(args.messages):
+                call_start = time.perf_counter()
+                client.emit('send_message', {
+                    'conversationId': 'bench',
+                    'sender_id': str(users[i % 2]),
+                    'receiver_id': users[1 - i % 2],
+                    'text': f"message {i}",
+                    'timestamp': '2025-01-01T00:00:00Z',
+                    'messageId': f"{mode}-{i}"
+                })
+                latencies.append((time.perf_counter() - call_start) * 1000)
+            A.message_push_coalescer.flush_all()
+            A.notification_dispatcher.flush()
+            elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        print(f"{mode:>8} {statistics.median(latencies):>8.2f} "
+              f"{latencies[int(len(latencies) * 0.99) - 1]:>8.2f} {elapsed:>8.2f}")
+
+    print('\ndispatcher stats:')
+    print(json.dumps(A.notification_dispatcher.stats(), indent=2))
+    print('push routing:')
+    print(json.dumps(dict(A.push_routing_stats, coalescer=A.message_push_coalescer.stats()), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: presence messages in a reconnect storm, global broadcast vs
+contact-scoped, coalesced fan-out
+
+N users, each with --contacts conversation partners, all drop and
+reconnect (as after a deploy). The old handlers broadcast every change to
+every client and sent each newcomer the whole online list; PresenceFanout
+sends changes to contacts only and nets out changes within one window.
+Counts the user_status deliveries and users_online entries each way, for
+a storm inside one window and one spread over several windows. Exits
+non-zero when a check fails.
+
+Usage (from educonnect-backend/):
+    python benchmarks/presence_fanout.py
+    python benchmarks/presence_fanout.py --users 20000 --contacts 30
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from presence import PresenceFanout, PresenceRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--contacts', type=int, default=20, help='conversation partners per user')
+    parser.add_argument('--windows', type=int, default=5, help='windows the spread-out storm covers')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    failures = []
+
+    def check(condition, label):
+        print(f"  {'✓' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    rng = random.Random(args.seed)
+    users = [str(i) for i in range(args.users)]
+    graph = {u: set() for u in users}
+    for u in users:
+        while len(graph[u]) < args.contacts:
+            v = rng.choice(users)
+            if v != u:
+                graph[u].add(v)
+                graph[v].add(u)
+    lookups = []
+
+    def contacts(user_ids):
+        lookups.append(len(user_ids))
+        return {u: graph[u] for u in user_ids}
+
+    n = args.users
+    old_status = 2 * n * (n - 1)  # every drop and every return, to everyone else
+    old_lists = n * (n + 1) // 2  # the i-th to reconnect gets i online ids
+    avg_contacts = sum(len(c) for c in graph.values()) / n
+    print(f"{n:,} users, {avg_contacts:.1f} contacts on average")
+    print(f"  global broadcast: {old_status:,} user_status deliveries, {old_lists:,} users_online entries")
+
+    for label, windows in (('storm within one window', 1), (f"storm over {args.windows} windows", args.windows)):
+        registry = PresenceRegistry()
+        delivered = []
+        fanout = PresenceFanout(contacts, lambda recipient, payload: registry.is_online(recipient)
+                                and not delivered.append((recipient, payload)), window=3600)
+        for u in users:
+            registry.connect(f"sid-{u}", u)
+            fanout.changed(u, 'online')
+        fanout.flush()
+        delivered.clear()
+        lookups.clear()
+
+        start = time.perf_counter()
+        per_window = -(-n // windows)
+        list_entries = 0
+        for w in range(windows):
+            batch = users[w * per_window:(w + 1) * per_window]
+            for u in batch:
+                _, offline = registry.disconnect(f"sid-{u}")
+                if offline:
+                    fanout.changed(u, 'offline')
+            if windows > 1:
+                fanout.flush()
+            for u in batch:
+                if registry.connect(f"sid-{u}-2", u):
+                    fanout.changed(u, 'online')
+                list_entries += sum(1 for c in graph[u] if registry.is_online(c))
+            fanout.flush()
+        elapsed = time.perf_counter() - start
+
+        print(f"  {label}: {len(delivered):,} user_status deliveries, {list_entries:,} users_online entries, "
+              f"{len(lookups)} contact lookups, {elapsed * 1000:.0f}ms")
+        if windows == 1:
+            check(not delivered, 'a reconnect inside the window is never announced')
+        else:
+            check(len(delivered) <= 2 * n * avg_contacts, 'deliveries bounded by users x contacts')
+            check(all(registry.is_online(r) for r, _ in delivered), 'only online contacts receive changes')
+        check(len(lookups) <= 2 * windows, 'one contact lookup per flush')
+
+    if failures:
+        print(f"\n❌ {len(failures)} checks failed")
+        sys.exit(1)
+    print('\n✓ All checks passed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: connect/disconnect cost of the presence registry vs the old scan
+
+The old handle_disconnect walked {user_id: sid} to find the sid's user, so
+each disconnect was O(connections). PresenceRegistry keeps sid -> user and
+user -> {sids}. Times both at growing connection counts and checks the
+multi-device rules (online with the first socket, offline with the last),
+including under concurrent connects/disconnects from several threads.
+Exits non-zero when a check fails.
+
+Usage (from educonnect-backend/):
+    python benchmarks/presence_registry.py
+    python benchmarks/presence_registry.py --sizes 1000 10000 50000 --threads 8
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from presence import PresenceRegistry
+
+
+def old_disconnect(active_connections, sid):
+    """The pre-registry handle_disconnect lookup"""
+    for uid, s in active_connections.items():
+        if s == sid:
+            del active_connections[uid]
+            return uid
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 40000])
+    parser.add_argument('--churn', type=int, default=2000, help='disconnect+reconnect pairs timed per size')
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    failures = []
+
+    def check(condition, label):
+        print(f"  {'✓' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    print(f"{'connections':>12} {'old µs/disc':>12} {'registry µs/op':>15}")
+    for size in args.sizes:
+        churn = min(args.churn, size)
+
+        active_connections = {f"user-{i}": f"sid-{i}" for i in range(size)}
+        start = time.perf_counter()
+        # Worst realistic case: the newest connections leave first
+        for i in range(size - 1, size - 1 - churn, -1):
+            old_disconnect(active_connections, f"sid-{i}")
+            active_connections[f"user-{i}"] = f"sid-{i}"
+        old_us = (time.perf_counter() - start) / churn * 1e6
+
+        registry = PresenceRegistry()
+        for i in range(size):
+            registry.connect(f"sid-{i}", f"user-{i}")
+        start = time.perf_counter()
+        for i in range(size - 1, size - 1 - churn, -1):
+            registry.disconnect(f"sid-{i}")
+            registry.connect(f"sid-{i}", f"user-{i}")
+        new_us = (time.perf_counter() - start) / (2 * churn) * 1e6
+        print(f"{size:>12,} {old_us:>12.2f} {new_us:>15.2f}")
+
+    print('multi-device:')
+    registry = PresenceRegistry()
+    check(registry.connect('tab-1', 7) is True, 'first socket brings the user online')
+    check(registry.connect('tab-2', '7') is False, 'second socket (str id) is the same user')
+    registry.join('tab-1', 'room-a')
+    check(registry.in_room(7, 'room-a') and not registry.in_room(7, 'room-b'), 'rooms tracked per socket')
+    check(registry.disconnect('tab-1') == ('7', False), 'closing one tab keeps the user online')
+    check(registry.is_online(7) and not registry.in_room(7, 'room-a'), "closed tab's rooms are gone")
+    check(registry.disconnect('tab-2') == ('7', True), 'closing the last tab takes the user offline')
+    check(registry.disconnect('tab-2') == (None, False), 'unknown sid is a no-op')
+
+    print(f"{args.threads} threads, concurrent churn:")
+    registry = PresenceRegistry()
+    went_online, went_offline = [], []
+
+    def worker(n):
+        for i in range(2000):
+            user = f"user-{i % 50}"
+            sid = f"sid-{n}-{i}"
+            if registry.connect(sid, user):
+                went_online.append(user)
+            _, offline = registry.disconnect(sid)
+            if offline:
+                went_offline.append(user)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check(registry.stats()['sockets'] == 0 and not registry.online_users(), 'registry empty afterwards')
+    check(len(went_online) == len(went_offline), f"{len(went_online)} online / {len(went_offline)} offline transitions match")
+
+    if failures:
+        print(f"\n❌ {len(failures)} checks failed")
+        sys.exit(1)
+    print('\n✓ All checks passed')
+
+
+if __name__ == '__main__':
+    main()
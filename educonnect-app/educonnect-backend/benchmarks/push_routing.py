@@ -0,0 +1,125 @@
+"""
+Benchmark: message pushes sent for chat bursts with presence-aware routing
+
+Two users on a throwaway SQLite database; FCM is replaced by a recorder.
+The receiver is, in turn, live in the conversation, connected but in
+another conversation, and offline, and the sender sends --messages
+messages each time. The old handlers pushed every message. Checks that
+a live receiver gets no push, that a burst within one --window-ms window
+collapses into one push carrying the count and the latest text, and that
+a receiver who opens the conversation before the window closes gets
+nothing (presence is checked again at flush). Exits non-zero when a check
+fails.
+
+Usage (from educonnect-backend/):
+    python benchmarks/push_routing.py
+    python benchmarks/push_routing.py --messages 50 --window-ms 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20, help='messages per burst')
+    parser.add_argument('--window-ms', type=float, default=300.0, help='push coalescing window')
+    args = parser.parse_args()
+    failures = []
+
+    def check(condition, label):
+        print(f"  {'✓' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ['PUSH_COALESCE_SECONDS'] = str(args.window_ms / 1000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+
+    pushes = []
+    A.send_message_notification = lambda **kwargs: pushes.append(kwargs) or True
+
+    with A.app.app_context():
+        A.db.create_all()
+        users = []
+        for i in range(2):
+            user = A.User(email=f"u{i}@bench", password_hash='x', user_type='student', full_name=f"User {i}")
+            A.db.session.add(user)
+            A.db.session.flush()
+            users.append(user.id)
+        A.db.session.commit()
+    sender_id, receiver_id = users
+    room = f"{sender_id}-{receiver_id}"
+
+    def connect(user_id, join=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            client = A.socketio.test_client(A.app, auth={'userId': str(user_id)})
+            if join:
+                client.emit('join_conversation', {'conversationId': join, 'userId': user_id,
+                                                  'partnerId': sender_id})
+        return client
+
+    def burst(label):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(args.messages):
+                sender.emit('send_message', {
+                    'conversationId': room, 'sender_id': str(sender_id), 'receiver_id': receiver_id,
+                    'text': f"{label} {i}", 'timestamp': '2025-01-01T00:00:00Z', 'messageId': f"{label}-{i}"
+                })
+
+    def wait_for_window():
+        time.sleep(args.window_ms / 1000 * 2)
+        A.notification_dispatcher.flush()
+
+    sender = connect(sender_id)
+    print(f"{args.messages} messages per burst, {args.window_ms:.0f}ms window")
+
+    receiver = connect(receiver_id, join=room)
+    burst('live')
+    wait_for_window()
+    check(not pushes and A.push_routing_stats['skipped_live'] == args.messages,
+          f"receiver live in the conversation: {len(pushes)} pushes")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        receiver.disconnect()
+    receiver = connect(receiver_id, join='somewhere-else')
+    burst('elsewhere')
+    wait_for_window()
+    check(len(pushes) == 1 and pushes[0]['message_count'] == args.messages
+          and pushes[0]['message_text'] == f"elsewhere {args.messages - 1}",
+          f"receiver in another conversation: {args.messages} messages -> {len(pushes)} push")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        receiver.disconnect()
+    burst('came-back')
+    receiver = connect(receiver_id, join=room)
+    wait_for_window()
+    check(len(pushes) == 1 and A.push_routing_stats['skipped_at_flush'] == args.messages,
+          'receiver opened the conversation within the window: no push at flush')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        receiver.disconnect()
+    burst('offline')
+    wait_for_window()
+    check(len(pushes) == 2 and pushes[1]['message_count'] == args.messages,
+          f"receiver offline: {args.messages} messages -> {len(pushes) - 1} push")
+
+    sent = args.messages * 4
+    print(f"  {sent} messages: old handlers {sent} pushes, routed {A.push_routing_stats['pushed']}")
+
+    if failures:
+        print(f"\n❌ {len(failures)} checks failed")
+        sys.exit(1)
+    print('\n✓ All checks passed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: offline replay throughput (events/minute) across a process pool
+
+Writes a synthetic outcome log in the `flask export-match-events` NPZ
+format, then replays it for several configurations in parallel.
+
+Usage (from educonnect-backend/):
+    python benchmarks/replay_throughput.py
+    python benchmarks/replay_throughput.py --events 200000 --configs 8 --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_log import npz_stream
+from ml_matcher import RLTutorMatchingSystem
+from replay import run_replays
+from cohort_assignment import make_students, make_tutors
+
+OUTCOME_COLUMNS = [
+    ('id', 'int'),
+    ('student_id', 'int'),
+    ('tutor_id', 'int'),
+    ('reward', 'float'),
+    ('outcome', 'json'),
+    ('student_features', 'json'),
+    ('tutor_features', 'json')
+]
+
+
+def synthetic_chunks(n_events, n_students, n_tutors, rng, chunk_size=5000):
+    """Outcome rows whose satisfaction follows the base feature score, plus noise"""
+    matcher = RLTutorMatchingSystem()
+    students = [
+        json.dumps(matcher.prepare_student_features(profile))
+        for _, profile in make_students(n_students, rng)
+    ]
+    tutors = [
+        json.dumps(matcher.prepare_tutor_features(tutor))
+        for tutor in make_tutors(n_tutors, rng)
+    ]
+    weights = [matcher.base_weights[name] for name in matcher.FEATURE_NAMES]
+
+    rows = []
+    for event_id in range(1, n_events + 1):
+        s, t = rng.randrange(n_students), rng.randrange(n_tutors)
+        features = matcher.feature_score_matrix(json.loads(students[s]), [json.loads(tutors[t])])[0]
+        quality = float(sum(w * f for w, f in zip(weights, features)))
+
+        satisfaction = max(1, min(5, round(1 + 4 * quality + rng.gauss(0, 0.8))))
+        completed = rng.random() < quality
+        recommend = rng.random() < quality
+        rows.append({
+            'id': event_id,
+            'student_id': s,
+            'tutor_id': t,
+            'reward': 0.4 * satisfaction / 5 + 0.3 * completed + 0.3 * recommend,
+            'outcome': json.dumps({'satisfaction_rating': satisfaction, 'completed': completed,
+                                   'would_recommend': recommend}),
+            'student_features': students[s],
+            'tutor_features': tutors[t]
+        })
+        if len(rows) == chunk_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--tutors', type=int, default=200)
+    parser.add_argument('--configs', type=int, default=4, help='performance_blend values to sweep')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--candidates', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'outcomes.npz')
+
+        start = time.perf_counter()
+        with open(path, 'wb') as f:
+            chunks = synthetic_chunks(args.events, args.students, args.tutors, rng)
+            for piece in npz_stream(chunks, OUTCOME_COLUMNS):
+                f.write(piece)
+        print(f"log: {args.events:,} events, {os.path.getsize(path) / 1e6:.1f} MB, "
+              f"written in {time.perf_counter() - start:.1f}s\n")
+
+        configs = {
+            f"performance_blend={blend:.2f}": {'performance_blend': blend}
+            for blend in [i / (2 * max(args.configs - 1, 1)) for i in range(args.configs)]
+        }
+
+        start = time.perf_counter()
+        results = run_replays(configs, path, workers=args.workers, candidates=args.candidates)
+        elapsed = time.perf_counter() - start
+
+    print(f"{'config':<24} {'events/min':>11} {'replay rew':>10} {'ndcg_at_3':>10} {'mrr':>7}")
+    for name, m in results.items():
+        print(f"{name:<24} {m['events_per_minute']:>11,} {m['replay_reward']:>10} "
+              f"{m['ndcg_at_3']:>10} {m['mrr']:>7}")
+
+    total = sum(m['events'] for m in results.values())
+    print(f"\n{total:,} events in {elapsed:.1f}s wall "
+          f"({int(total / elapsed * 60):,} events/min across the pool)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark: connections per process and message latency for each serving mode
+
+For every SOCKETIO_ASYNC_MODE whose library is installed (threading always;
+gevent and eventlet are skipped when missing; see requirements-async.txt),
+starts the app in its own process on a throwaway SQLite database and opens
+--connections idle Socket.IO clients. threading runs on the Werkzeug server;
+the cooperative modes run under gunicorn with gunicorn.conf.py, as in
+production (its listener sets TCP_NODELAY; gevent's own dev server doesn't,
+and Nagle adds ~40ms to every polled message there). Reports the server's OS threads and RSS before and after
+(per connection) and, with all of them connected, the latency of chat
+messages between two more clients in one room. Linux only (reads /proc).
+
+Usage (from educonnect-backend/):
+    python benchmarks/serving_modes.py
+    python benchmarks/serving_modes.py --connections 1000 --messages 200 --modes threading gevent
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+import socketio
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+WORKER = "import app; app.socketio.run(app.app, host='127.0.0.1', port={port}, allow_unsafe_werkzeug=True)"
+
+
+def server_command(mode, port):
+    if mode == 'threading':
+        return [sys.executable, '-c', WORKER.format(port=port)]
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f"127.0.0.1:{port}", 'app:app']
+
+
+def process_stats(pid):
+    """(OS threads, RSS in MB) of a process"""
+    fields = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            key, _, value = line.partition(':')
+            fields[key] = value.strip()
+    return int(fields['Threads']), int(fields['VmRSS'].split()[0]) / 1024
+
+
+def serving_pid(server):
+    """The process holding the sockets: gunicorn's (single) worker, else the server itself"""
+    with open(f"/proc/{server.pid}/task/{server.pid}/children") as children:
+        pids = children.read().split()
+    return int(pids[0]) if pids else server.pid
+
+
+def connect(url, user_id, received=None):
+    client = socketio.Client(reconnection=False)
+    if received is not None:
+        client.on('receive_message', lambda data: received.append((data['clientMessageId'], time.perf_counter())))
+    client.connect(url, auth={'userId': str(user_id)}, transports=['polling'])
+    return client
+
+
+def run_mode(mode, port, args, users):
+    env = dict(os.environ, SOCKETIO_ASYNC_MODE=mode)
+    server = subprocess.Popen(server_command(mode, port), cwd=BACKEND, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    clients = []
+    try:
+        for _ in range(150):
+            try:
+                requests.get(f"{url}/api/socket/status", timeout=1)
+                break
+            except (requests.ConnectionError, requests.Timeout):  # gunicorn accepts before its worker is up
+                time.sleep(0.2)
+        pid = serving_pid(server)
+        threads_before, rss_before = process_stats(pid)
+
+        start = time.perf_counter()
+        failed = 0
+        for i in range(args.connections):
+            try:
+                clients.append(connect(url, users[2 + i % (len(users) - 2)]))
+            except socketio.exceptions.ConnectionError:
+                failed += 1
+        connect_seconds = time.perf_counter() - start
+        time.sleep(1)
+        threads_after, rss_after = process_stats(pid)
+
+        received = []
+        sender = connect(url, users[0])
+        receiver = connect(url, users[1], received)
+        clients += [sender, receiver]
+        room = f"{users[0]}-{users[1]}"
+        for client, (me, partner) in ((sender, users[:2]), (receiver, users[1::-1])):
+            client.emit('join_conversation', {'conversationId': room, 'userId': me, 'partnerId': partner})
+        time.sleep(0.5)
+
+        latencies = []
+        for i in range(args.messages):
+            message_id = f"{mode}-{i}"
+            sent = time.perf_counter()
+            sender.emit('send_message', {
+                'conversationId': room, 'sender_id': str(users[0]), 'receiver_id': users[1],
+                'text': f"message {i}", 'timestamp': '2025-01-01T00:00:00Z', 'messageId': message_id
+            })
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not any(m == message_id for m, _ in received[-3:]):
+                time.sleep(0.0005)
+            at = next((t for m, t in received if m == message_id), None)
+            if at is not None:
+                latencies.append((at - sent) * 1000)
+        latencies.sort()
+
+        connected = args.connections - failed
+        return {
+            'connected': connected,
+            'connect_s': connect_seconds,
+            'threads': threads_after,
+            'threads_per_conn': (threads_after - threads_before) / max(connected, 1),
+            'kb_per_conn': (rss_after - rss_before) * 1024 / max(connected, 1),
+            'p50': statistics.median(latencies) if latencies else float('nan'),
+            'p99': latencies[int(len(latencies) * 0.99) - 1] if latencies else float('nan'),
+            'lost': args.messages - len(latencies)
+        }
+    finally:
+        for client in clients:
+            with contextlib.suppress(Exception):
+                client.disconnect()
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--connections', type=int, default=200, help='idle sockets held open')
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--modes', nargs='+', default=['threading', 'gevent', 'eventlet'])
+    parser.add_argument('--base-port', type=int, default=15200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as A
+    with A.app.app_context():
+        A.db.create_all()
+        users = []
+        for i in range(50):
+            user = A.User(email=f"u{i}@bench", password_hash='x', user_type='student', full_name=f"User {i}")
+            A.db.session.add(user)
+            A.db.session.flush()
+            users.append(user.id)
+        A.db.session.commit()
+
+    print(f"{args.connections} idle connections, {args.messages} messages")
+    print(f"{'mode':>10} {'connected':>9} {'connect s':>9} {'threads':>8} {'thr/conn':>8} "
+          f"{'KB/conn':>8} {'p50 ms':>7} {'p99 ms':>7} {'lost':>5}")
+    for i, mode in enumerate(args.modes):
+        if mode != 'threading' and importlib.util.find_spec(mode) is None:
+            print(f"{mode:>10} skipped ({mode} not installed)")
+            continue
+        r = run_mode(mode, args.base_port + i, args, users)
+        print(f"{mode:>10} {r['connected']:>9} {r['connect_s']:>9.1f} {r['threads']:>8} {r['threads_per_conn']:>8.2f} "
+              f"{r['kb_per_conn']:>8.1f} {r['p50']:>7.1f} {r['p99']:>7.1f} {r['lost']:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: typing events received vs emitted with the typing throttle
+
+Simulates --users users typing in their own conversations. Each sends a
+typing event per keystroke and stop_typing after a pause; --lost-stops of
+them lose it, as if the tab were closed. Time is scaled down (interval,
+timeout and keystroke gaps in milliseconds) so a run takes a few seconds.
+The old handlers re-emitted every event, one emit each. Checks that no
+conversation sees user_typing more than once per interval, that every
+typing session ends with user_stopped_typing, sent by the server when the
+stop was lost, and that such a stop goes out within --late-ms of its
+timeout. Exits non-zero when a check fails.
+
+Usage (from educonnect-backend/):
+    python benchmarks/typing_throttle.py
+    python benchmarks/typing_throttle.py --users 200 --keystroke-ms 5 --interval-ms 100
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing_throttle import TypingThrottle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--bursts', type=int, default=3, help='typing sessions per user')
+    parser.add_argument('--keystrokes', type=int, default=40, help='keystrokes per session')
+    parser.add_argument('--keystroke-ms', type=float, default=8.0)
+    parser.add_argument('--interval-ms', type=float, default=60.0)
+    parser.add_argument('--timeout-ms', type=float, default=150.0)
+    parser.add_argument('--lost-stops', type=float, default=0.2, help='share of sessions without stop_typing')
+    parser.add_argument('--late-ms', type=float, default=20.0, help='allowed delay of a timeout stop')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    failures = []
+
+    def check(condition, label):
+        print(f"  {'✓' if condition else '❌'} {label}")
+        if not condition:
+            failures.append(label)
+
+    emitted = []
+    emit_lock = threading.Lock()
+
+    def emit(event, payload, room, sid):
+        with emit_lock:
+            emitted.append((time.monotonic(), event, room))
+
+    interval = args.interval_ms / 1000
+    throttle = TypingThrottle(emit, interval=interval, timeout=args.timeout_ms / 1000)
+    sessions = [0]
+    lost = []  # (room, last keystroke) of sessions whose stop_typing was lost
+
+    def user(n):
+        rng = random.Random(args.seed + n)
+        room = f"conversation-{n}"
+        for _ in range(args.bursts):
+            for _ in range(args.keystrokes):
+                throttle.typing(n, room, sid=f"sid-{n}")
+                time.sleep(args.keystroke_ms / 1000 * rng.uniform(0.5, 1.5))
+            if rng.random() >= args.lost_stops:
+                throttle.stop(n, room, sid=f"sid-{n}")
+            else:
+                with emit_lock:
+                    lost.append((room, time.monotonic()))
+            with emit_lock:
+                sessions[0] += 1
+            time.sleep(args.timeout_ms / 1000 * 2)  # long enough for a lost stop to time out
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(args.timeout_ms / 1000 * 2)
+    elapsed = time.perf_counter() - start
+
+    stats = throttle.stats()
+    old_emits = stats['received']
+    print(f"{args.users} users, {sessions[0]} typing sessions in {elapsed:.1f}s")
+    print(f"  received {stats['received']:,} events: old handlers {old_emits:,} emits, "
+          f"throttle {stats['emitted']['total']:,} ({stats['emit_ratio']:.1%}), "
+          f"{stats['timed_out']} stops sent on timeout")
+
+    by_room = {}
+    for at, event, room in sorted(emitted):
+        by_room.setdefault(room, []).append((at, event))
+    too_close = 0
+    unterminated = 0
+    for events in by_room.values():
+        last_typing = None
+        for at, event in events:
+            if event == 'user_typing':
+                if last_typing is not None and at - last_typing < interval * 0.95:
+                    too_close += 1
+                last_typing = at
+            else:
+                last_typing = None
+        if events[-1][1] != 'user_stopped_typing':
+            unterminated += 1
+    stops = sum(1 for _, event, _ in emitted if event == 'user_stopped_typing')
+    late = []
+    for room, last_keystroke in lost:
+        stopped = min(at for at, event in by_room[room] if event == 'user_stopped_typing' and at >= last_keystroke)
+        late.append((stopped - last_keystroke) * 1000 - args.timeout_ms)
+    check(too_close == 0, f"user_typing at most once per {args.interval_ms:.0f}ms per conversation ({too_close} closer)")
+    check(stops == sessions[0] and unterminated == 0, f"{stops}/{sessions[0]} sessions ended with user_stopped_typing")
+    if late:
+        check(max(late) <= args.late_ms,
+              f"timeout stops at most {args.late_ms:.0f}ms late (max {max(late):.0f}ms, {len(late)} sessions)")
+    check(stats['typing_now'] == 0, 'no typing state left behind')
+
+    if failures:
+        print(f"\n❌ {len(failures)} checks failed")
+        sys.exit(1)
+    print('\n✓ All checks passed')
+
+
+if __name__ == '__main__':
+    main()
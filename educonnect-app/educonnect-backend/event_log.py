@@ -0,0 +1,272 @@
+import csv
+import io
+import json
+import queue
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from datetime import timezone
+
+import numpy as np
+
+
+class EventLogWriter:
+    """
+    Buffered, append-only writer for match events
+
+    - log() is a non-blocking queue put, so requests never wait on the DB
+    - A background thread drains up to batch_size events (or whatever
+      arrived within flush_interval seconds) and hands them to
+      write_batch({kind: [rows]}) as one write
+    - When the buffer is full, events are dropped and counted rather than
+      slowing requests down
+    """
+
+    def __init__(self, write_batch, max_buffer=10000, batch_size=500, flush_interval=2.0):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_buffer)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def log(self, kind, row):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((kind, row))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+                self._thread.start()
+
+    def _take_batch(self):
+        """Block for the first event, then take whatever else is already queued"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            grouped = defaultdict(list)
+            for kind, row in batch:
+                grouped[kind].append(row)
+
+            try:
+                self.write_batch(dict(grouped))
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"❌ [EVENT LOG] Dropped {len(batch)} events: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until everything logged so far has been written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stats(self):
+        return {
+            'buffered': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed
+        }
+
+
+def iter_chunks(fetch_after, chunk_size=5000, since_id=0):
+    """
+    Keyset-paginate an append-only table
+
+    fetch_after(last_id, limit) must return up to limit rows (mappings with
+    an 'id') with id > last_id in id order. Only one chunk is held at a time.
+    """
+    last_id = since_id
+    while True:
+        rows = fetch_after(last_id, chunk_size)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+# Column kinds understood by the exporters:
+#   int, float, bool, str, datetime   scalar columns
+#   json                              JSON text, exported as-is
+#   int_list, float_list              JSON arrays, padded to a fixed width in NPZ
+#
+# In NPZ, str and json columns are variable-length UTF-8: per chunk, one
+# uint8 array of the concatenated bytes ("<column>.utf8") and one int64
+# array of rows + 1 offsets into it ("<column>.offsets").
+STRING_KINDS = ('str', 'json')
+
+def _csv_value(kind, value):
+    if value is None:
+        return ''
+    if kind == 'datetime':
+        return value.isoformat()
+    return value
+
+
+def csv_stream(chunks, columns):
+    """Yield CSV text, one piece per chunk, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+
+    for rows in chunks:
+        for row in rows:
+            writer.writerow([_csv_value(kind, row[name]) for name, kind in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _column_array(kind, values, width):
+    if kind == 'int':
+        return np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    if kind == 'float':
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if kind == 'bool':
+        return np.array([bool(v) for v in values], dtype=np.bool_)
+    if kind == 'datetime':
+        # Stored timestamps are naive UTC
+        return np.array([
+            v.replace(tzinfo=timezone.utc).timestamp() if v else np.nan
+            for v in values
+        ], dtype=np.float64)
+    if kind in ('int_list', 'float_list'):
+        is_int = kind == 'int_list'
+        out = np.full((len(values), width), -1 if is_int else np.nan,
+                      dtype=np.int64 if is_int else np.float64)
+        for i, value in enumerate(values):
+            items = json.loads(value) if value else []
+            out[i, :len(items[:width])] = items[:width]
+        return out
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def _string_arrays(values):
+    """(utf8 bytes, offsets) for a str/json column; row i is data[offsets[i]:offsets[i + 1]]"""
+    encoded = [b'' if v is None else str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_strings(data, offsets):
+    """Object array of str from _string_arrays output"""
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    out = np.empty(len(bounds) - 1, dtype=object)
+    out[:] = [raw[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
+    return out
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands its bytes back after every chunk"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def npz_stream(chunks, columns, list_width=10):
+    """
+    Yield the bytes of an .npz archive, one piece per chunk
+
+    Every chunk adds one array per column, named "<column>_<chunk #>"
+    (see load_npz_columns). List columns become (rows, list_width) arrays
+    padded with -1 / NaN; datetimes become unix timestamps; str / json
+    columns become a UTF-8 byte array plus offsets (see STRING_KINDS).
+    """
+    sink = _ChunkSink()
+
+    def write_member(archive, key, array):
+        with archive.open(f"{key}.npy", mode='w', force_zip64=True) as member:
+            np.lib.format.write_array(member, array, allow_pickle=False)
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for index, rows in enumerate(chunks):
+            for name, kind in columns:
+                values = [row[name] for row in rows]
+                if kind in STRING_KINDS:
+                    data, offsets = _string_arrays(values)
+                    write_member(archive, f"{name}.utf8_{index:05d}", data)
+                    write_member(archive, f"{name}.offsets_{index:05d}", offsets)
+                else:
+                    write_member(archive, f"{name}_{index:05d}", _column_array(kind, values, list_width))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_npz_chunks(path):
+    """
+    Read an npz_stream export back one chunk at a time, as {column: array}
+
+    str / json columns are decoded into object arrays of str.
+    """
+    with np.load(path) as archive:
+        chunks = defaultdict(dict)
+        for key in archive.files:
+            column, _, index = key.rpartition('_')
+            chunks[int(index)][column] = key
+        for index in sorted(chunks):
+            members = chunks[index]
+            chunk = {}
+            for column, key in members.items():
+                if column.endswith('.offsets'):
+                    continue
+                if column.endswith('.utf8'):
+                    name = column[:-len('.utf8')]
+                    chunk[name] = _decode_strings(archive[key], archive[members[f"{name}.offsets"]])
+                else:
+                    chunk[column] = archive[key]
+            yield chunk
+
+
+def load_npz_columns(path):
+    """Read a whole npz_stream export back as {column: concatenated array}"""
+    parts = defaultdict(list)
+    for chunk in iter_npz_chunks(path):
+        for column, array in chunk.items():
+            parts[column].append(array)
+    return {column: np.concatenate(arrays) for column, arrays in parts.items()}
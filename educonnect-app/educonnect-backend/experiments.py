@@ -0,0 +1,268 @@
+import contextlib
+import hashlib
+import math
+import threading
+from bisect import bisect_right
+from datetime import datetime
+
+# Per-arm counter layout, in the order ShardedCounters keeps them
+COUNTER_FIELDS = (
+    'impressions',
+    'cache_hits',
+    'latency_ms_sum',
+    'latency_ms_max',
+    'outcomes',
+    'reward_sum',
+    'reward_sq_sum'
+)
+_MAX_FIELDS = ('latency_ms_max',)
+
+
+class ShardedCounters:
+    """
+    Per-arm counters with no lock on the request path
+
+    Every thread increments its own shard, a dict no other thread writes to,
+    and totals() sums the shards. Shards of finished threads are folded into
+    a retired total so thread-per-request servers don't grow the shard list.
+    The lock is only taken once per thread (to register its shard) and by
+    totals().
+
+    With sharded=False (gevent/eventlet) there is one shared shard and every
+    increment takes the lock. There each request is a greenlet with its own
+    threading.local, and a greenlet's dummy thread never stops being alive,
+    so per-thread shards would pile up forever. Greenlets only switch on
+    I/O, so the lock is never contended there.
+    """
+
+    def __init__(self, sharded=True):
+        self.sharded = sharded
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # [(thread, {arm: [values in COUNTER_FIELDS order]})]
+        self._retired = {}
+        self._shared = {}  # the only shard when not sharded
+        self._write_lock = contextlib.nullcontext() if sharded else self._lock
+
+    def _row(self, arm):
+        if not self.sharded:
+            shard = self._shared
+        else:
+            shard = getattr(self._local, 'shard', None)
+            if shard is None:
+                shard = self._local.shard = {}
+                with self._lock:
+                    self._shards.append((threading.current_thread(), shard))
+
+        row = shard.get(arm)
+        if row is None:
+            row = shard[arm] = [0] * len(COUNTER_FIELDS)
+        return row
+
+    def add_impression(self, arm, latency_ms, cache_hit=False):
+        with self._write_lock:
+            row = self._row(arm)
+            row[0] += 1
+            if cache_hit:
+                row[1] += 1
+            row[2] += latency_ms
+            if latency_ms > row[3]:
+                row[3] = latency_ms
+
+    def add_outcome(self, arm, reward):
+        with self._write_lock:
+            row = self._row(arm)
+            row[4] += 1
+            row[5] += reward
+            row[6] += reward * reward
+
+    @staticmethod
+    def _merge(into, arm, row):
+        total = into.setdefault(arm, [0] * len(COUNTER_FIELDS))
+        for i, field in enumerate(COUNTER_FIELDS):
+            if field in _MAX_FIELDS:
+                total[i] = max(total[i], row[i])
+            else:
+                total[i] += row[i]
+
+    def totals(self):
+        """Cumulative {arm: {field: value}} across every thread"""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    # The owner is gone, so nothing writes to this shard anymore
+                    for arm, row in shard.items():
+                        self._merge(self._retired, arm, row)
+            self._shards = live
+
+            totals = {arm: list(row) for arm, row in self._retired.items()}
+            for arm, row in self._shared.items():
+                self._merge(totals, arm, list(row))
+            for _, shard in live:
+                # dict.copy()/list() are single C calls, so the owning thread
+                # can't resize them halfway through the copy
+                for arm, row in shard.copy().items():
+                    self._merge(totals, arm, list(row))
+
+        return {
+            arm: dict(zip(COUNTER_FIELDS, row))
+            for arm, row in totals.items()
+        }
+
+
+class Experiment:
+    """
+    A/B test between matcher configurations
+
+    Each arm is a dict:
+    {
+        "name": "rl",
+        "weight": 1,             // share of students, relative to other arms
+        "use_rl": true,
+        "model_version": "v3"    // optional, see ModelRegistry; default is the active model
+    }
+
+    Students are assigned by hashing (experiment name, student id), so an
+    assignment never needs a DB read and a student stays in the same arm
+    across requests, restarts and workers.
+    """
+
+    def __init__(self, name, arms, sharded_counters=True, started_at=None):
+        if not name:
+            raise ValueError('Experiment name required')
+        if len(arms) < 2:
+            raise ValueError('An experiment needs at least two arms')
+
+        self.name = name
+        self.arms = []
+        self._cumulative = []
+        total = 0
+        for arm in arms:
+            arm_name = arm.get('name')
+            weight = int(arm.get('weight', 1))
+            if not arm_name:
+                raise ValueError('Every arm needs a name')
+            if any(a['name'] == arm_name for a in self.arms):
+                raise ValueError(f"Duplicate arm name: {arm_name}")
+            if weight <= 0:
+                raise ValueError(f"Arm {arm_name} needs a positive weight")
+
+            total += weight
+            self._cumulative.append(total)
+            self.arms.append({
+                'name': arm_name,
+                'weight': weight,
+                'use_rl': bool(arm.get('use_rl', True)),
+                'model_version': arm.get('model_version')
+            })
+
+        self._total_weight = total
+        self.counters = ShardedCounters(sharded=sharded_counters)
+        self._flushed = {}  # cumulative totals already written to the DB
+        self.started_at = started_at or datetime.utcnow()
+
+    def assign(self, student_id):
+        """The arm dict for this student"""
+        digest = hashlib.blake2b(
+            f"{self.name}:{student_id}".encode('utf-8'),
+            digest_size=8
+        ).digest()
+        point = int.from_bytes(digest, 'big') % self._total_weight
+        return self.arms[bisect_right(self._cumulative, point)]
+
+    def record_impression(self, arm_name, latency_ms, cache_hit=False):
+        self.counters.add_impression(arm_name, latency_ms, cache_hit)
+
+    def record_outcome(self, arm_name, reward):
+        """Attribute an outcome to the arm that served the impression it follows"""
+        self.counters.add_outcome(arm_name, reward)
+
+    def unflushed(self, snapshot):
+        """
+        Per-arm increments in snapshot (a totals() result) that haven't been
+        flushed yet; max fields carry the cumulative max
+        """
+        deltas = {}
+        for arm, values in snapshot.items():
+            flushed = self._flushed.get(arm, {})
+            delta = {
+                field: value if field in _MAX_FIELDS else value - flushed.get(field, 0)
+                for field, value in values.items()
+            }
+            if delta['impressions'] or delta['outcomes']:
+                deltas[arm] = delta
+        return deltas
+
+    def mark_flushed(self, snapshot):
+        """Call once the deltas from unflushed(snapshot) are committed"""
+        self._flushed = snapshot
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'arms': self.arms,
+            'started_at': self.started_at.isoformat()
+        }
+
+
+class ExperimentRegistry:
+    """
+    This worker's copy of the one experiment running in the match path
+
+    running() is a single attribute read, so checking for an experiment
+    costs nothing when none is configured. Which experiment runs is decided
+    elsewhere (app.py keeps it in the ExperimentRun table) and start/stop
+    follow it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = None
+
+    def running(self):
+        return self._running
+
+    def start(self, experiment):
+        with self._lock:
+            if self._running is not None:
+                raise ValueError(f"Experiment {self._running.name} is already running")
+            self._running = experiment
+        print(f"✓ [EXPERIMENT] Started {experiment.name} "
+              f"({', '.join(arm['name'] for arm in experiment.arms)})")
+        return experiment
+
+    def stop(self, name):
+        """Stop the running experiment; the caller flushes it first"""
+        with self._lock:
+            if self._running is None or self._running.name != name:
+                raise KeyError(name)
+            experiment, self._running = self._running, None
+        print(f"✓ [EXPERIMENT] Stopped {name}")
+        return experiment
+
+
+def summarize_arm(stats):
+    """Report metrics for one arm from its flushed counters"""
+    impressions = stats.get('impressions') or 0
+    outcomes = stats.get('outcomes') or 0
+    reward_sum = stats.get('reward_sum') or 0.0
+
+    mean_reward = reward_sum / outcomes if outcomes else None
+    reward_stderr = None
+    if outcomes > 1:
+        variance = (stats.get('reward_sq_sum', 0.0) - outcomes * mean_reward ** 2) / (outcomes - 1)
+        reward_stderr = math.sqrt(max(variance, 0.0) / outcomes)
+
+    return {
+        'impressions': impressions,
+        'outcomes': outcomes,
+        'outcome_rate': round(outcomes / impressions, 4) if impressions else None,
+        'mean_reward': round(mean_reward, 4) if mean_reward is not None else None,
+        'reward_stderr': round(reward_stderr, 4) if reward_stderr is not None else None,
+        'cache_hit_rate': round(stats.get('cache_hits', 0) / impressions, 4) if impressions else None,
+        'mean_latency_ms': round(stats.get('latency_ms_sum', 0.0) / impressions, 2) if impressions else None,
+        'max_latency_ms': round(stats.get('latency_ms_max', 0.0), 2)
+    }
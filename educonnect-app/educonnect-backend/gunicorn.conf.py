@@ -1,9 +1,23 @@
 import multiprocessing
+import os
 
 # Render free tier has limited memory
-workers = 1  # Use only 1 worker
-worker_class = "sync"
-worker_connections = 1000
+workers = 1  # Use only 1 worker (more need SOCKETIO_MESSAGE_QUEUE, sticky sessions and a shared MODEL_DIR;
+#              online RL learning stays per worker, see activate_model_version)
+
+# Worker class follows SOCKETIO_ASYNC_MODE (see serving.py):
+#   threading -> sync: one OS thread per connected socket
+#   gevent    -> GeventWebSocketWorker
+#   eventlet  -> eventlet
+# (both need pip install -r requirements-async.txt)
+# The cooperative workers hold up to worker_connections sockets each
+async_mode = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+worker_class = {
+    'threading': 'sync',
+    'gevent': 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker',
+    'eventlet': 'eventlet'
+}[async_mode]
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '1000'))
 timeout = 120  # Increase timeout to 120 seconds
 keepalive = 5
 
@@ -17,4 +31,4 @@ bind = "0.0.0.0:10000"
 # Logging
 accesslog = "-"
 errorlog = "-"
-loglevel = "info"
\ No newline at end of file
+loglevel = "info"
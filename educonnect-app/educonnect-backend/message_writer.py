@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+
+
+class GroupCommitWriter:
+    """
+    Write-behind buffer that persists chat messages in group commits
+
+    - submit(key, item, on_done) queues one item and returns at once;
+      on_done(result, error) runs after the commit that contains the item
+      (or after it finally failed), on the shard's callback thread so slow
+      callbacks (emits, pushes) never hold up the next commit. Callbacks of
+      one shard run in commit order
+    - Each shard has one writer thread. Items with the same key (a
+      conversation) always land on the same shard, so they are committed in
+      submission order; with shards=1 the order is global
+    - A shard commits when batch_size items are waiting or flush_interval
+      seconds after the first one arrived, whichever comes first
+    - write_batch(items) -> [result per item] must write all items in one
+      transaction. If it raises, the items are retried one by one so a bad
+      message only fails itself
+    - When a shard's buffer is full, submit() waits up to put_timeout and
+      then raises queue.Full; nothing is ever dropped silently
+    """
+
+    def __init__(self, write_batch, shards=1, max_buffer=5000, batch_size=100,
+                 flush_interval=0.005, put_timeout=1.0, context=None):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.context = context  # () -> context manager around each batch
+        self._queues = [queue.Queue(maxsize=max(1, max_buffer // shards)) for _ in range(shards)]
+        self._callbacks = [queue.Queue() for _ in range(shards)]  # [(on_done, result, error)] per batch
+        self._lock = threading.Lock()
+        self._threads = None
+        self.committed = 0
+        self.batches = 0
+        self.failed = 0
+        self.retried = 0
+        self.commit_seconds = 0.0
+        self.max_wait_ms = 0.0
+
+    def submit(self, key, item, on_done=None):
+        if self._threads is None:
+            self._start()
+        shard = self._queues[hash(key) % len(self._queues)]
+        shard.put((item, on_done, time.monotonic()), timeout=self.put_timeout)
+
+    def _start(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = [
+                    threading.Thread(target=self._run, args=(q, callbacks), name=f"message-writer-{i}", daemon=True)
+                    for i, (q, callbacks) in enumerate(zip(self._queues, self._callbacks))
+                ] + [
+                    threading.Thread(target=self._run_callbacks, args=(callbacks,),
+                                     name=f"message-writer-callbacks-{i}", daemon=True)
+                    for i, callbacks in enumerate(self._callbacks)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    def _take_batch(self, shard):
+        """Block for the first item, then take what arrives within flush_interval"""
+        batch = [shard.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(shard.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, shard, callbacks):
+        while True:
+            batch = self._take_batch(shard)
+            try:
+                if self.context:
+                    with self.context():
+                        done = self._write(batch)
+                else:
+                    done = self._write(batch)
+                if done:
+                    callbacks.put(done)
+            except Exception as e:
+                # Only reachable if the context itself fails
+                print(f"❌ [MESSAGE WRITER] {e}")
+            finally:
+                for _ in batch:
+                    shard.task_done()
+
+    def _run_callbacks(self, callbacks):
+        while True:
+            done = callbacks.get()
+            try:
+                if self.context:
+                    with self.context():
+                        self._call(done)
+                else:
+                    self._call(done)
+            except Exception as e:
+                print(f"❌ [MESSAGE WRITER] {e}")
+            finally:
+                callbacks.task_done()
+
+    def _call(self, done):
+        for on_done, result, error in done:
+            try:
+                on_done(result, error)
+            except Exception as e:
+                print(f"❌ [MESSAGE WRITER] Callback failed: {e}")
+
+    def _write(self, batch):
+        """Commit one batch -> [(on_done, result, error)] still to be called"""
+        items = [item for item, _, _ in batch]
+        start = time.monotonic()
+        try:
+            outcomes = [(result, None) for result in self.write_batch(items)]
+        except Exception as e:
+            print(f"⚠️ [MESSAGE WRITER] Group of {len(items)} failed ({e}), retrying one by one")
+            self.retried += len(items)
+            outcomes = []
+            for item in items:
+                try:
+                    outcomes.append((self.write_batch([item])[0], None))
+                except Exception as item_error:
+                    outcomes.append((None, item_error))
+
+        done = time.monotonic()
+        self.batches += 1
+        self.commit_seconds += done - start
+        self.max_wait_ms = max(self.max_wait_ms, (done - batch[0][2]) * 1000)
+
+        done = []
+        for (_, on_done, _), (result, error) in zip(batch, outcomes):
+            if error is None:
+                self.committed += 1
+            else:
+                self.failed += 1
+            if on_done:
+                done.append((on_done, result, error))
+        return done
+
+    def flush(self):
+        """Block until everything submitted so far has been committed and its callbacks have run"""
+        if self._threads is not None:
+            for shard in self._queues:
+                shard.join()
+            for callbacks in self._callbacks:
+                callbacks.join()
+
+    def stats(self):
+        return {
+            'buffered': sum(q.qsize() for q in self._queues),
+            'callbacks_pending': sum(q.qsize() for q in self._callbacks),
+            'committed': self.committed,
+            'batches': self.batches,
+            'failed': self.failed,
+            'retried': self.retried,
+            'avg_batch_size': round(self.committed / self.batches, 2) if self.batches else 0,
+            'avg_commit_ms': round(self.commit_seconds / self.batches * 1000, 3) if self.batches else 0,
+            'max_wait_ms': round(self.max_wait_ms, 3)
+        }
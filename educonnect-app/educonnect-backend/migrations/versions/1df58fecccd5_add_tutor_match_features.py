@@ -0,0 +1,78 @@
+"""Add tutor match_features
+
+Revision ID: 1df58fecccd5
+Revises: 7d180540e982
+Create Date: 2026-10-19 10:12:31.418207
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1df58fecccd5'
+down_revision = '7d180540e982'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tutor_profile', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('match_features', sa.Text(), nullable=True))
+
+    # Backfill existing tutors with the same normalization the app uses
+    from ml_matcher import RLTutorMatchingSystem
+    matcher = RLTutorMatchingSystem()
+
+    tutor_profile = sa.table(
+        'tutor_profile',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('expertise', sa.Text),
+        sa.column('languages', sa.Text),
+        sa.column('availability', sa.Text),
+        sa.column('rating', sa.Float),
+        sa.column('total_sessions', sa.Integer),
+        sa.column('teaching_style', sa.String),
+        sa.column('match_features', sa.Text),
+    )
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(
+        tutor_profile.c.id,
+        tutor_profile.c.user_id,
+        tutor_profile.c.expertise,
+        tutor_profile.c.languages,
+        tutor_profile.c.availability,
+        tutor_profile.c.rating,
+        tutor_profile.c.total_sessions,
+        tutor_profile.c.teaching_style,
+    )).fetchall()
+
+    for row in rows:
+        try:
+            features = matcher.prepare_tutor_features({
+                'id': row.user_id,
+                'expertise': json.loads(row.expertise) if row.expertise else [],
+                'languages': json.loads(row.languages) if row.languages else [],
+                'availability': json.loads(row.availability) if row.availability else {},
+                'rating': row.rating or 4.0,
+                'total_sessions': row.total_sessions or 0,
+                'teaching_style': row.teaching_style,
+            })
+        except (ValueError, TypeError, AttributeError):
+            # Leave malformed rows for the app's on-read fallback
+            continue
+
+        conn.execute(
+            tutor_profile.update()
+            .where(tutor_profile.c.id == row.id)
+            .values(match_features=json.dumps(features))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('tutor_profile', schema=None) as batch_op:
+        batch_op.drop_column('match_features')
@@ -0,0 +1,105 @@
+"""Add canonical participant pair to conversation
+
+Revision ID: cf887adfd257
+Revises: a9e919f8d098
+Create Date: 2026-10-19 13:49:48.190609
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cf887adfd257'
+down_revision = 'a9e919f8d098'
+branch_labels = None
+depends_on = None
+
+
+conversation = sa.table(
+    'conversation',
+    sa.column('id', sa.Integer),
+    sa.column('participant1_id', sa.Integer),
+    sa.column('participant2_id', sa.Integer),
+    sa.column('min_user_id', sa.Integer),
+    sa.column('max_user_id', sa.Integer),
+    sa.column('last_message', sa.String),
+    sa.column('last_message_time', sa.DateTime),
+)
+
+message = sa.table(
+    'message',
+    sa.column('conversation_id', sa.Integer),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('min_user_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('max_user_id', sa.Integer(), nullable=True))
+
+    # Backfill the pair from the participant columns
+    p1, p2 = conversation.c.participant1_id, conversation.c.participant2_id
+    conn = op.get_bind()
+    conn.execute(
+        conversation.update()
+        .where(p1.isnot(None) & p2.isnot(None))
+        .values(
+            min_user_id=sa.case((p1 <= p2, p1), else_=p2),
+            max_user_id=sa.case((p1 <= p2, p2), else_=p1),
+        )
+    )
+
+    # Racing first messages may have created the same pair twice: keep the
+    # oldest row, move the other rows' messages onto it, then drop them
+    rows = conn.execute(
+        sa.select(
+            conversation.c.id,
+            conversation.c.min_user_id,
+            conversation.c.max_user_id,
+            conversation.c.last_message,
+            conversation.c.last_message_time,
+        )
+        .where(conversation.c.min_user_id.isnot(None))
+        .order_by(conversation.c.min_user_id, conversation.c.max_user_id, conversation.c.id)
+    ).fetchall()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.min_user_id, row.max_user_id), []).append(row)
+
+    for keep, *duplicates in groups.values():
+        if not duplicates:
+            continue
+        duplicate_ids = [row.id for row in duplicates]
+        latest = max([keep] + duplicates, key=lambda row: row.last_message_time or datetime.min)
+
+        conn.execute(
+            message.update()
+            .where(message.c.conversation_id.in_(duplicate_ids))
+            .values(conversation_id=keep.id)
+        )
+        conn.execute(
+            conversation.update()
+            .where(conversation.c.id == keep.id)
+            .values(last_message=latest.last_message, last_message_time=latest.last_message_time)
+        )
+        conn.execute(conversation.delete().where(conversation.c.id.in_(duplicate_ids)))
+        print(f"Merged conversations {duplicate_ids} into {keep.id}")
+
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_conversation_pair', ['min_user_id', 'max_user_id'])
+        batch_op.create_foreign_key('fk_conversation_max_user_id_user', 'user', ['max_user_id'], ['id'])
+        batch_op.create_foreign_key('fk_conversation_min_user_id_user', 'user', ['min_user_id'], ['id'])
+
+
+def downgrade():
+    # Conversations merged by the upgrade stay merged
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_conversation_min_user_id_user', type_='foreignkey')
+        batch_op.drop_constraint('fk_conversation_max_user_id_user', type_='foreignkey')
+        batch_op.drop_constraint('uq_conversation_pair', type_='unique')
+        batch_op.drop_column('max_user_id')
+        batch_op.drop_column('min_user_id')
@@ -1,10 +1,89 @@
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
+from scipy.optimize import linear_sum_assignment
 import json
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import pickle
+import threading
+import hashlib
+
+class StateEncoder:
+    """
+    Maps raw (student, tutor) state tuples onto a fixed number of buckets
+    
+    - coarsen: replace subject/expertise lists by their subject categories
+      before hashing, so similar pairs share a state
+    - n_buckets: states are feature-hashed into this many Q-table keys,
+      which bounds the Q-table no matter how many users we onboard
+    
+    Occupancy and collision metrics are kept in fixed-size arrays. A
+    collision is an encode that lands in a bucket first taken by a
+    different (coarsened) state.
+    """
+    
+    def __init__(self, n_buckets=4096, coarsen=True, categorize=None):
+        self.n_buckets = int(n_buckets)
+        self.coarsen = coarsen
+        self.categorize = categorize
+        self.reset_stats()
+    
+    def get_config(self):
+        return {'n_buckets': self.n_buckets, 'coarsen': self.coarsen}
+    
+    def reset_stats(self):
+        self.bucket_hits = np.zeros(self.n_buckets, dtype=np.int64)
+        self.bucket_owner = np.zeros(self.n_buckets, dtype=np.uint64)
+        self.encodes = 0
+        self.collisions = 0
+    
+    def _coarsen(self, state):
+        subjects, skill, style, time_slot, expertise, teaching_style, experience = state
+        return (
+            tuple(sorted({self.categorize(s) for s in subjects})),
+            skill,
+            style,
+            time_slot,
+            tuple(sorted({self.categorize(e) for e in expertise})),
+            teaching_style,
+            experience
+        )
+    
+    def encode(self, state):
+        """Bucket index (int) for a raw state tuple"""
+        if self.coarsen and self.categorize:
+            state = self._coarsen(state)
+        
+        # hashlib rather than hash(): str hashes change between processes
+        digest = hashlib.blake2b(repr(state).encode('utf-8'), digest_size=8).digest()
+        fingerprint = int.from_bytes(digest, 'little') or 1
+        bucket = fingerprint % self.n_buckets
+        
+        self.encodes += 1
+        self.bucket_hits[bucket] += 1
+        owner = int(self.bucket_owner[bucket])
+        if owner == 0:
+            self.bucket_owner[bucket] = fingerprint
+        elif owner != fingerprint:
+            self.collisions += 1
+        
+        return int(bucket)
+    
+    def stats(self):
+        occupied = int(np.count_nonzero(self.bucket_hits))
+        return {
+            'n_buckets': self.n_buckets,
+            'coarsen': self.coarsen,
+            'encodes': self.encodes,
+            'occupied_buckets': occupied,
+            'occupancy': occupied / self.n_buckets,
+            'max_bucket_hits': int(self.bucket_hits.max()) if self.n_buckets else 0,
+            'mean_hits_per_occupied_bucket': self.encodes / occupied if occupied else 0.0,
+            'collisions': self.collisions,
+            'collision_rate': self.collisions / self.encodes if self.encodes else 0.0
+        }
+
 
 class RLTutorMatchingSystem:
     """
@@ -18,7 +97,18 @@ class RLTutorMatchingSystem:
     - Personalized matching that improves over time
     """
     
-    def __init__(self, learning_rate=0.1, discount_factor=0.9, epsilon=0.15):
+    # Order of the scores returned by _feature_scores()
+    FEATURE_NAMES = (
+        'subject_match',
+        'skill_compatibility',
+        'schedule_match',
+        'language_match',
+        'learning_style_match',
+        'rating'
+    )
+    
+    def __init__(self, learning_rate=0.1, discount_factor=0.9, epsilon=0.15,
+                 state_buckets=4096, coarse_states=True, performance_blend=0.30):
         self.scaler = StandardScaler()
         
         # RL Parameters
@@ -26,6 +116,10 @@ class RLTutorMatchingSystem:
         self.discount_factor = discount_factor  # Future reward importance
         self.epsilon = epsilon  # Exploration rate (15% try new things)
         
+        # Share of the final RL score that comes from tutor performance
+        # (the rest is the weighted feature score)
+        self.performance_blend = performance_blend
+        
         # Base feature weights (will be adjusted by RL)
         self.base_weights = {
             'subject_match': 0.35,
@@ -59,6 +153,13 @@ class RLTutorMatchingSystem:
         # Feature importance learning
         self.feature_rewards = defaultdict(list)
         
+        # Per-student caches of normalized features and personalized weights
+        # (LRU, keyed by str(student_id); see invalidate_student_cache)
+        self.student_cache_size = 10000
+        self._student_features_cache = OrderedDict()
+        self._student_weights_cache = OrderedDict()
+        self._student_cache_lock = threading.Lock()
+        
         # Subject similarity mappings
         self.subject_groups = {
             'math': ['mathematics', 'algebra', 'calculus', 'geometry', 'statistics', 'trigonometry'],
@@ -67,15 +168,22 @@ class RLTutorMatchingSystem:
             'language': ['english', 'writing', 'literature', 'grammar', 'composition'],
             'arts': ['art', 'music', 'drawing', 'painting', 'design']
         }
+        
+        # Bounded Q-table state space (see StateEncoder)
+        self.state_encoder = StateEncoder(
+            n_buckets=state_buckets,
+            coarsen=coarse_states,
+            categorize=self.get_subject_category
+        )
     
     def get_state_representation(self, student_profile, tutor_profile):
         """
         Convert student-tutor pair into a state representation for RL
         """
-        student_features = self.prepare_student_features(student_profile)
-        tutor_features = self.prepare_tutor_features(tutor_profile)
+        student_features = self.resolve_student_features(student_profile)
+        tutor_features = self.resolve_tutor_features(tutor_profile)
         
-        # Create a hashable state key
+        # Raw state; the encoder turns it into a bounded bucket key
         state = (
             tuple(sorted(student_features['preferred_subjects'])),
             student_features['skill_level'],
@@ -86,16 +194,17 @@ class RLTutorMatchingSystem:
             'experienced' if tutor_features['total_sessions'] > 100 else 'new'
         )
         
-        return state
+        return self.state_encoder.encode(state)
     
     def calculate_tutor_performance_score(self, tutor_id):
         """
         Calculate dynamic performance score based on historical data
         This is what differentiates tutors beyond static features
         """
-        perf = self.tutor_performance[tutor_id]
+        # .get() so that scoring unseen tutors doesn't grow tutor_performance
+        perf = self.tutor_performance.get(tutor_id)
         
-        if perf['total_matches'] == 0:
+        if not perf or perf['total_matches'] == 0:
             return 0.7  # Neutral score for new tutors
         
         # Multiple factors contribute to performance
@@ -187,6 +296,15 @@ class RLTutorMatchingSystem:
         - response_time: average response time in hours
         - punctuality_score: 0-1 (showed up on time)
         """
+        # Resolve features once (from the per-student cache when possible)
+        student_profile = {
+            'features': self.get_student_features(student_id, student_profile)
+        }
+        tutor_profile = {
+            'id': tutor_profile.get('id'),
+            'features': self.resolve_tutor_features(tutor_profile)
+        }
+        
         # Calculate reward based on outcome
         satisfaction = outcome_data.get('satisfaction_rating', 3) / 5.0
         completed = 1.0 if outcome_data.get('completed', False) else 0.0
@@ -246,6 +364,9 @@ class RLTutorMatchingSystem:
         self._update_feature_importance(student_id, student_profile, 
                                        tutor_profile, reward)
         
+        # Match history and weight adjustments changed
+        self._cache_pop(self._student_weights_cache, student_id)
+        
         return reward
     
     def _update_feature_importance(self, student_id, student_profile, 
@@ -256,32 +377,12 @@ class RLTutorMatchingSystem:
         prefs = self.student_preferences[student_id]
         
         # Calculate how well each feature matched
-        student_features = self.prepare_student_features(student_profile)
-        tutor_features = self.prepare_tutor_features(tutor_profile)
-        
-        feature_scores = {
-            'subject_match': self.calculate_subject_match(
-                student_features['preferred_subjects'],
-                tutor_features['expertise']
-            ),
-            'skill_compatibility': self.calculate_skill_compatibility(
-                student_features,
-                tutor_features['total_sessions'],
-                student_features['skill_level']
-            ),
-            'schedule_match': self.calculate_schedule_match(
-                student_features['available_time'],
-                tutor_features['availability']
-            ),
-            'language_match': self.calculate_language_match(
-                student_features['preferred_languages'],
-                tutor_features['languages']
-            ),
-            'learning_style_match': self.calculate_learning_style_match(
-                student_features['learning_style'],
-                tutor_features['teaching_style']
-            )
-        }
+        student_features = self.resolve_student_features(student_profile)
+        tutor_features = self.resolve_tutor_features(tutor_profile)
+        
+        scores = self._feature_scores(student_features, tutor_features)
+        # Rating isn't learned per student, so only the first five features count
+        feature_scores = dict(zip(self.FEATURE_NAMES[:5], scores[:5]))
         
         # Update weight adjustments based on correlation with reward
         for feature, score in feature_scores.items():
@@ -297,7 +398,7 @@ class RLTutorMatchingSystem:
                 scores = [h['score'] for h in history[-10:]]
                 rewards = [h['reward'] for h in history[-10:]]
                 
-                correlation = np.corrcoef(scores, rewards)[0, 1]
+                correlation = self._correlation(scores, rewards)
                 
                 # Adjust weight based on correlation
                 if not np.isnan(correlation):
@@ -306,6 +407,23 @@ class RLTutorMatchingSystem:
                     adjustment = correlation * 0.2  # Max 20% adjustment
                     prefs['weight_adjustments'][feature] = adjustment
     
+    @staticmethod
+    def _correlation(xs, ys):
+        """Pearson correlation of two short lists (NaN when either is constant, like np.corrcoef)"""
+        n = len(xs)
+        mean_x = sum(xs) / n
+        mean_y = sum(ys) / n
+        cov = var_x = var_y = 0.0
+        for x, y in zip(xs, ys):
+            dx = x - mean_x
+            dy = y - mean_y
+            cov += dx * dy
+            var_x += dx * dx
+            var_y += dy * dy
+        if var_x == 0 or var_y == 0:
+            return float('nan')
+        return cov / (var_x * var_y) ** 0.5
+    
     def prepare_student_features(self, student_profile):
         """Enhanced student feature extraction with None safety"""
         features = {
@@ -330,6 +448,63 @@ class RLTutorMatchingSystem:
         }
         return features
 
+    def resolve_student_features(self, student_profile):
+        """Use a pre-normalized 'features' record when present, otherwise normalize now"""
+        return student_profile.get('features') or self.prepare_student_features(student_profile)
+    
+    def _cache_get(self, cache, student_id):
+        with self._student_cache_lock:
+            value = cache.get(str(student_id))
+            if value is not None:
+                cache.move_to_end(str(student_id))
+            return value
+    
+    def _cache_put(self, cache, student_id, value):
+        with self._student_cache_lock:
+            cache[str(student_id)] = value
+            cache.move_to_end(str(student_id))
+            while len(cache) > self.student_cache_size:
+                cache.popitem(last=False)
+    
+    def _cache_pop(self, cache, student_id):
+        with self._student_cache_lock:
+            cache.pop(str(student_id), None)
+    
+    def get_student_features(self, student_id, student_profile):
+        """
+        Normalized student features, cached per student id
+        
+        The cache is only dropped by invalidate_student_cache(), so callers
+        must invalidate whenever the stored student profile changes.
+        """
+        if not student_id:
+            return self.resolve_student_features(student_profile)
+        
+        features = self._cache_get(self._student_features_cache, student_id)
+        if features is None:
+            features = self.resolve_student_features(student_profile)
+            self._cache_put(self._student_features_cache, student_id, features)
+        return features
+    
+    def get_student_weights(self, student_id):
+        """Personalized (normalized) weights, cached until the student's next outcome"""
+        weights = self._cache_get(self._student_weights_cache, student_id)
+        if weights is None:
+            weights = self.get_personalized_weights(student_id, self.base_weights)
+            self._cache_put(self._student_weights_cache, student_id, weights)
+        return weights
+    
+    def invalidate_student_cache(self, student_id):
+        """Forget cached features and weights after a student profile edit"""
+        self._cache_pop(self._student_features_cache, student_id)
+        self._cache_pop(self._student_weights_cache, student_id)
+    
+    def clear_student_cache(self):
+        """Forget every cached student feature/weight entry"""
+        with self._student_cache_lock:
+            self._student_features_cache.clear()
+            self._student_weights_cache.clear()
+    
     def prepare_tutor_features(self, tutor_profile):
         """Enhanced tutor feature extraction with None safety"""
         features = {
@@ -350,13 +525,35 @@ class RLTutorMatchingSystem:
         }
         return features
     
+    def resolve_tutor_features(self, tutor_profile):
+        """
+        Use the pre-normalized 'features' record when the caller has one
+        (persisted on TutorProfile at write time), otherwise normalize now
+        """
+        return tutor_profile.get('features') or self.prepare_tutor_features(tutor_profile)
+    
+    @property
+    def subject_groups(self):
+        return self._subject_groups
+    
+    @subject_groups.setter
+    def subject_groups(self, groups):
+        # Assign a new dict (don't edit it in place) so the category memo resets
+        self._subject_groups = groups
+        self._subject_category_cache = {}
+    
     def get_subject_category(self, subject):
-        """Map subject to category"""
+        """Map subject to category (memoized per subject_groups)"""
         subject = subject.lower()
-        for category, keywords in self.subject_groups.items():
-            if subject in keywords or any(keyword in subject for keyword in keywords):
-                return category
-        return subject
+        category = self._subject_category_cache.get(subject)
+        if category is None:
+            category = subject
+            for group, keywords in self._subject_groups.items():
+                if subject in keywords or any(keyword in subject for keyword in keywords):
+                    category = group
+                    break
+            self._subject_category_cache[subject] = category
+        return category
     
     def calculate_subject_match(self, student_subjects, tutor_expertise):
         """Enhanced subject matching with fuzzy matching"""
@@ -390,12 +587,12 @@ class RLTutorMatchingSystem:
     
     def calculate_skill_compatibility(self, student_features, tutor_sessions, student_skill):
         """Multi-factor skill compatibility"""
-        avg_score = np.mean([
-            student_features.get('math_score', 5),
-            student_features.get('science_score', 5),
-            student_features.get('language_score', 5),
+        avg_score = (
+            student_features.get('math_score', 5) +
+            student_features.get('science_score', 5) +
+            student_features.get('language_score', 5) +
             student_features.get('tech_score', 5)
-        ])
+        ) / 4.0
         
         normalized_score = avg_score / 10.0
         
@@ -498,62 +695,84 @@ class RLTutorMatchingSystem:
         normalized = rating / 5.0
         return min(0.92, normalized * 0.90 + 0.02)
     
+    def _feature_scores(self, student_features, tutor_features):
+        """Raw 0-1 scores for each matching feature, in FEATURE_NAMES order"""
+        subject_score = self.calculate_subject_match(
+            student_features['preferred_subjects'],
+            tutor_features['expertise']
+        )
+        
+        skill_score = self.calculate_skill_compatibility(
+            student_features,
+            tutor_features['total_sessions'],
+            student_features['skill_level']
+        )
+        
+        schedule_score = self.calculate_schedule_match(
+            student_features['available_time'],
+            tutor_features['availability']
+        )
+        
+        language_score = self.calculate_language_match(
+            student_features['preferred_languages'],
+            tutor_features['languages']
+        )
+        
+        learning_style_score = self.calculate_learning_style_match(
+            student_features['learning_style'],
+            tutor_features['teaching_style']
+        )
+        
+        rating_score = self.normalize_rating(tutor_features['rating'])
+        
+        return (subject_score, skill_score, schedule_score,
+                language_score, learning_style_score, rating_score)
+    
+    def _weights_for(self, student_id, use_rl):
+        """Personalized weights when RL is on, otherwise a copy of the base weights"""
+        if use_rl and student_id:
+            return self.get_student_weights(student_id)
+        return self.base_weights.copy()
+    
     def match_student_to_tutors(self, student_id, student_profile, tutors_list, 
                                 use_rl=True):
         """
         Enhanced matching with RL and performance-based differentiation
+        
+        Returns lean results (tutor id, name and score only). The per-feature
+        breakdown is only built on demand through explain_match().
         """
-        student_features = self.prepare_student_features(student_profile)
+        student_features = self.get_student_features(student_id, student_profile)
         
         # Get personalized or base weights
-        if use_rl and student_id:
-            weights = self.get_personalized_weights(student_id, self.base_weights)
-        else:
-            weights = self.base_weights.copy()
+        weights = self._weights_for(student_id, use_rl)
+        w_subject = weights['subject_match']
+        w_skill = weights['skill_compatibility']
+        w_schedule = weights['schedule_match']
+        w_language = weights['language_match']
+        w_style = weights['learning_style_match']
+        w_rating = weights['rating']
+        blend = self.performance_blend
         
         matches = []
         
         for tutor in tutors_list:
             tutor_id = tutor.get('id')
-            tutor_features = self.prepare_tutor_features(tutor)
-            
-            # Calculate base feature scores
-            subject_score = self.calculate_subject_match(
-                student_features['preferred_subjects'],
-                tutor_features['expertise']
-            )
-            
-            skill_score = self.calculate_skill_compatibility(
-                student_features,
-                tutor_features['total_sessions'],
-                student_features['skill_level']
-            )
-            
-            schedule_score = self.calculate_schedule_match(
-                student_features['available_time'],
-                tutor_features['availability']
-            )
-            
-            language_score = self.calculate_language_match(
-                student_features['preferred_languages'],
-                tutor_features['languages']
-            )
+            tutor_features = self.resolve_tutor_features(tutor)
             
-            learning_style_score = self.calculate_learning_style_match(
-                student_features['learning_style'],
-                tutor_features['teaching_style']
+            (subject_score, skill_score, schedule_score, language_score,
+             learning_style_score, rating_score) = self._feature_scores(
+                student_features, tutor_features
             )
             
-            rating_score = self.normalize_rating(tutor_features['rating'])
-            
             # Calculate base weighted score
             base_score = (
-                weights['subject_match'] * subject_score +
-                weights['skill_compatibility'] * skill_score +
-                weights['schedule_match'] * schedule_score +
-                weights['language_match'] * language_score +
-                weights['learning_style_match'] * learning_style_score +
-                weights['rating'] * rating_score
+                w_subject * subject_score +
+                w_skill * skill_score +
+                w_schedule * schedule_score +
+                w_language * language_score +
+                w_style * learning_style_score +
+                w_rating * rating_score
             )
             
             # Add RL-based performance score (THIS IS KEY FOR DIFFERENTIATION)
@@ -561,8 +780,8 @@ class RLTutorMatchingSystem:
                 performance_score = self.calculate_tutor_performance_score(tutor_id)
                 
                 # Blend base score with performance score
-                # Performance has 30% influence (significant but not overwhelming)
-                final_score = 0.70 * base_score + 0.30 * performance_score
+                # Performance has 30% influence by default (significant but not overwhelming)
+                final_score = (1 - blend) * base_score + blend * performance_score
             else:
                 final_score = base_score
             
@@ -570,31 +789,10 @@ class RLTutorMatchingSystem:
             if use_rl and np.random.random() < 0.1:
                 final_score += np.random.uniform(0, 0.05)
             
-            match_percentage = int(final_score * 100)
-            
-            breakdown = {
-                'subject_match': int(subject_score * 100),
-                'skill_compatibility': int(skill_score * 100),
-                'schedule_match': int(schedule_score * 100),
-                'language_match': int(language_score * 100),
-                'learning_style_match': int(learning_style_score * 100),
-                'rating': int(rating_score * 100)
-            }
-            
-            if use_rl:
-                breakdown['performance_score'] = int(performance_score * 100)
-            
             matches.append({
                 'tutor_id': tutor_id,
                 'tutor_name': tutor.get('name'),
-                'match_score': match_percentage,
-                'breakdown': breakdown,
-                'weights_used': {k: round(v, 3) for k, v in weights.items()},
-                'total_matches': self.tutor_performance[tutor_id]['total_matches'],
-                'success_rate': (
-                    self.tutor_performance[tutor_id]['successful_matches'] /
-                    max(self.tutor_performance[tutor_id]['total_matches'], 1)
-                ) if use_rl else None
+                'match_score': int(final_score * 100)
             })
         
         # Sort by match score
@@ -602,9 +800,189 @@ class RLTutorMatchingSystem:
         
         return matches
     
-    def save_model(self, filepath):
-        """Save model with RL state"""
-        model_data = {
+    def explain_match(self, student_id, student_profile, tutor, use_rl=True):
+        """
+        Build the full score breakdown for a single student-tutor pair
+        
+        This is the detail that used to be attached to every match result;
+        it is now only computed when a student expands one tutor card.
+        """
+        tutor_id = tutor.get('id')
+        student_features = self.get_student_features(student_id, student_profile)
+        tutor_features = self.resolve_tutor_features(tutor)
+        weights = self._weights_for(student_id, use_rl)
+        
+        scores = self._feature_scores(student_features, tutor_features)
+        feature_names = self.FEATURE_NAMES
+        
+        breakdown = {name: int(score * 100) for name, score in zip(feature_names, scores)}
+        base_score = sum(weights[name] * score for name, score in zip(feature_names, scores))
+        
+        if use_rl:
+            performance_score = self.calculate_tutor_performance_score(tutor_id)
+            breakdown['performance_score'] = int(performance_score * 100)
+            final_score = (
+                (1 - self.performance_blend) * base_score +
+                self.performance_blend * performance_score
+            )
+        else:
+            final_score = base_score
+        
+        perf = self.tutor_performance.get(tutor_id)
+        total_matches = perf['total_matches'] if perf else 0
+        successful_matches = perf['successful_matches'] if perf else 0
+        
+        return {
+            'tutor_id': tutor_id,
+            'tutor_name': tutor.get('name'),
+            'match_score': int(final_score * 100),
+            'breakdown': breakdown,
+            'weights_used': {k: round(v, 3) for k, v in weights.items()},
+            'total_matches': total_matches,
+            'success_rate': (
+                successful_matches / max(total_matches, 1)
+            ) if use_rl else None
+        }
+    
+    def feature_score_matrix(self, student_features, tutor_features_list):
+        """(n_tutors x len(FEATURE_NAMES)) raw feature scores for one student"""
+        return np.array([
+            self._feature_scores(student_features, features)
+            for features in tutor_features_list
+        ]).reshape(len(tutor_features_list), len(self.FEATURE_NAMES))
+    
+    def blend_scores(self, student_id, feature_scores, tutor_ids, use_rl=True, performance=None):
+        """
+        Final deterministic scores (0-1) from a feature_score_matrix()
+        
+        performance may be precomputed tutor performance scores aligned
+        with tutor_ids.
+        """
+        weights = self._weights_for(student_id, use_rl)
+        scores = feature_scores @ np.array([weights[name] for name in self.FEATURE_NAMES])
+        
+        if use_rl:
+            if performance is None:
+                performance = np.array([
+                    self.calculate_tutor_performance_score(tutor_id) for tutor_id in tutor_ids
+                ])
+            scores = (1 - self.performance_blend) * scores + self.performance_blend * performance
+        
+        return scores
+    
+    def score_matrix(self, students, tutors_list, use_rl=True):
+        """
+        Deterministic students x tutors matrix of final match scores (0-1)
+        
+        students is a list of (student_id, student_profile) pairs. Unlike
+        match_student_to_tutors there is no random exploration bonus.
+        """
+        tutor_ids = [t.get('id') for t in tutors_list]
+        tutor_features = [self.resolve_tutor_features(t) for t in tutors_list]
+        
+        performance = None
+        if use_rl:
+            performance = np.array([
+                self.calculate_tutor_performance_score(tutor_id) for tutor_id in tutor_ids
+            ])
+        
+        scores = np.empty((len(students), len(tutors_list)))
+        for i, (student_id, student_profile) in enumerate(students):
+            student_features = self.get_student_features(student_id, student_profile)
+            scores[i] = self.blend_scores(
+                student_id,
+                self.feature_score_matrix(student_features, tutor_features),
+                tutor_ids,
+                use_rl=use_rl,
+                performance=performance
+            )
+        
+        return scores
+    
+    def assign_cohort(self, students, tutors_list, capacities, use_rl=True,
+                      block_size=500, scores=None):
+        """
+        Capacity-aware assignment of a whole cohort of students to tutors
+        
+        Each tutor is expanded into one column per free seat (capacities is
+        aligned with tutors_list) and the total match score is maximized with
+        a min-cost assignment. Large cohorts are solved in blocks of
+        block_size students, each block using the seats the previous ones
+        left. Students beyond the total capacity stay unassigned.
+        
+        scores may be a precomputed score_matrix() for the same inputs.
+        """
+        if scores is None:
+            scores = self.score_matrix(students, tutors_list, use_rl=use_rl)
+        remaining = np.array([max(0, int(c)) for c in capacities], dtype=int)
+        
+        assignments = []
+        unassigned = []
+        blocks = 0
+        
+        for start in range(0, len(students), block_size):
+            block = range(start, min(start + block_size, len(students)))
+            blocks += 1
+            
+            # No tutor can take more than the whole block
+            seats = np.minimum(remaining, len(block))
+            slot_tutors = np.repeat(np.arange(len(tutors_list)), seats)
+            
+            if len(slot_tutors) == 0:
+                unassigned.extend(students[i][0] for i in block)
+                continue
+            
+            block_scores = scores[block.start:block.stop][:, slot_tutors]
+            rows, cols = linear_sum_assignment(block_scores, maximize=True)
+            
+            assigned_rows = set()
+            for row, col in zip(rows, cols):
+                tutor_index = slot_tutors[col]
+                remaining[tutor_index] -= 1
+                assigned_rows.add(row)
+                assignments.append({
+                    'student_id': students[block.start + row][0],
+                    'tutor_id': tutors_list[tutor_index].get('id'),
+                    'tutor_name': tutors_list[tutor_index].get('name'),
+                    'match_score': int(block_scores[row, col] * 100)
+                })
+            
+            unassigned.extend(
+                students[block.start + row][0]
+                for row in range(len(block)) if row not in assigned_rows
+            )
+        
+        return {
+            'assignments': assignments,
+            'unassigned': unassigned,
+            'blocks': blocks,
+            'total_score': int(sum(a['match_score'] for a in assignments))
+        }
+    
+    def _rebucket_q_table(self, q_table):
+        """
+        Fold raw tuple states from pre-bucketing models into encoder buckets
+        
+        Q-values of states that share a bucket are averaged per action.
+        """
+        rebucketed = defaultdict(lambda: defaultdict(float))
+        merged = defaultdict(lambda: defaultdict(int))
+        
+        for state, actions in q_table.items():
+            if isinstance(state, tuple):
+                bucket = self.state_encoder.encode(state)
+                for action, value in actions.items():
+                    n = merged[bucket][action]
+                    rebucketed[bucket][action] = (rebucketed[bucket][action] * n + value) / (n + 1)
+                    merged[bucket][action] = n + 1
+            else:
+                rebucketed[state].update(actions)
+        
+        return rebucketed
+    
+    def get_model_data(self):
+        """Picklable snapshot of the model's configuration and RL state"""
+        return {
             'base_weights': self.base_weights,
             'subject_groups': self.subject_groups,
             'q_table': dict(self.q_table),
@@ -614,23 +992,25 @@ class RLTutorMatchingSystem:
             'learning_rate': self.learning_rate,
             'discount_factor': self.discount_factor,
             'epsilon': self.epsilon,
-            'version': '3.0-RL',
+            'performance_blend': self.performance_blend,
+            'state_encoder': self.state_encoder.get_config(),
+            'version': '3.1-RL',
             'last_updated': datetime.now().isoformat()
         }
-        
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
-        
-        print(f"✓ RL Model saved to {filepath}")
     
-    def load_model(self, filepath):
-        """Load model with RL state"""
-        with open(filepath, 'rb') as f:
-            model_data = pickle.load(f)
-        
+    def set_model_data(self, model_data):
+        """Replace configuration and RL state with a get_model_data() snapshot"""
         self.base_weights = model_data.get('base_weights', self.base_weights)
         self.subject_groups = model_data.get('subject_groups', self.subject_groups)
-        self.q_table = defaultdict(lambda: defaultdict(float), model_data.get('q_table', {}))
+        self.performance_blend = model_data.get('performance_blend', self.performance_blend)
+        
+        # The saved encoder config defines what the saved bucket keys mean
+        encoder_config = model_data.get('state_encoder')
+        if encoder_config:
+            self.state_encoder = StateEncoder(
+                categorize=self.get_subject_category, **encoder_config
+            )
+        self.q_table = self._rebucket_q_table(model_data.get('q_table', {}))
         self.tutor_performance = defaultdict(lambda: {
             'total_matches': 0,
             'successful_matches': 0,
@@ -648,4 +1028,42 @@ class RLTutorMatchingSystem:
         }, model_data.get('student_preferences', {}))
         self.feature_rewards = defaultdict(list, model_data.get('feature_rewards', {}))
         
-        print(f"✓ RL Model loaded from {filepath}")
\ No newline at end of file
+        # Cached weights were derived from the previous preferences
+        with self._student_cache_lock:
+            self._student_weights_cache.clear()
+    
+    def clone(self, **overrides):
+        """
+        Independent deep copy of this model, e.g. to build a new version
+        
+        overrides may replace any get_model_data() key, such as base_weights,
+        subject_groups or epsilon.
+        """
+        model_data = pickle.loads(pickle.dumps(self.get_model_data()))
+        model_data.update(overrides)
+        
+        model = RLTutorMatchingSystem(
+            learning_rate=model_data.get('learning_rate', self.learning_rate),
+            discount_factor=model_data.get('discount_factor', self.discount_factor),
+            epsilon=model_data.get('epsilon', self.epsilon)
+        )
+        model.set_model_data(model_data)
+        return model
+    
+    def save_model(self, filepath):
+        """Save model with RL state"""
+        model_data = self.get_model_data()
+        
+        with open(filepath, 'wb') as f:
+            pickle.dump(model_data, f)
+        
+        print(f"✓ RL Model saved to {filepath}")
+    
+    def load_model(self, filepath):
+        """Load model with RL state"""
+        with open(filepath, 'rb') as f:
+            model_data = pickle.load(f)
+        
+        self.set_model_data(model_data)
+        
+        print(f"✓ RL Model loaded from {filepath}")
@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+class ModelRegistry:
+    """
+    Versioned RLTutorMatchingSystem snapshots with lock-free hot swap
+
+    - Readers call current() once per request and keep using that model,
+      so in-flight matches finish on the snapshot they started with
+    - Publishing a version swaps the single _active reference (atomic under
+      the GIL); readers never take a lock
+    - New versions are built or loaded on a background thread and only
+      become visible once they are fully constructed
+    - The lock only serializes writers (register/activate/discard)
+    - Version ids are v1, v2, ... per process unless the caller passes its
+      own (app.py uses ModelVersion row ids, shared by every worker)
+    """
+
+    def __init__(self, initial_model, description='initial', max_versions=5, version_id=None):
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._versions = OrderedDict()  # {version_id: info dict}
+        self._counter = 0
+        self._active = None  # (version_id, model)
+
+        version_id = self.register(initial_model, source='startup', description=description,
+                                   version_id=version_id)
+        self.activate(version_id)
+
+    def current(self):
+        """The active model (capture once per request)"""
+        return self._active[1]
+
+    def active_version(self):
+        return self._active[0]
+
+    def snapshot(self):
+        """(version_id, model) of the active version, read together"""
+        return self._active
+
+    def get(self, version_id):
+        """A built version's model (active or not), or None"""
+        info = self._versions.get(version_id)
+        if info is None or info['status'] not in ('ready', 'active'):
+            return None
+        return info['model']
+
+    def _next_version_id(self):
+        self._counter += 1
+        return f"v{self._counter}"
+
+    def register(self, model, source, description='', version_id=None):
+        """Add a ready model as a new (inactive) version"""
+        with self._lock:
+            version_id = version_id or self._next_version_id()
+            self._versions[version_id] = {
+                'version': version_id,
+                'status': 'ready',
+                'source': source,
+                'description': description,
+                'created_at': datetime.utcnow().isoformat(),
+                'activated_at': None,
+                'error': None,
+                'model': model
+            }
+            self._evict()
+            return version_id
+
+    def build_async(self, factory, source, description='', on_ready=None, version_id=None):
+        """
+        Build a version in the background with factory() -> model
+
+        Returns the version id immediately; its status goes
+        building -> ready (or failed). on_ready(version_id) is called on the
+        build thread once it is ready, e.g. to activate it.
+        """
+        with self._lock:
+            version_id = version_id or self._next_version_id()
+            self._versions[version_id] = {
+                'version': version_id,
+                'status': 'building',
+                'source': source,
+                'description': description,
+                'created_at': datetime.utcnow().isoformat(),
+                'activated_at': None,
+                'error': None,
+                'model': None
+            }
+
+        def build():
+            try:
+                model = factory()
+            except Exception as e:
+                print(f"❌ [MODEL] Building {version_id} failed: {e}")
+                with self._lock:
+                    self._versions[version_id]['status'] = 'failed'
+                    self._versions[version_id]['error'] = str(e)
+                return
+
+            with self._lock:
+                self._versions[version_id]['model'] = model
+                self._versions[version_id]['status'] = 'ready'
+                self._evict()
+            print(f"✓ [MODEL] Version {version_id} ready ({source})")
+
+            if on_ready:
+                on_ready(version_id)
+
+        threading.Thread(target=build, name=f"model-build-{version_id}", daemon=True).start()
+        return version_id
+
+    def activate(self, version_id):
+        """Publish a ready version; raises KeyError/ValueError if it can't be"""
+        with self._lock:
+            info = self._versions[version_id]
+            if info['status'] not in ('ready', 'active'):
+                raise ValueError(f"Version {version_id} is {info['status']}")
+
+            if self._active:
+                self._versions[self._active[0]]['status'] = 'ready'
+
+            info['status'] = 'active'
+            info['activated_at'] = datetime.utcnow().isoformat()
+
+            # The swap itself: a single reference assignment
+            self._active = (version_id, info['model'])
+
+        print(f"✓ [MODEL] Activated version {version_id}")
+        return version_id
+
+    def discard(self, version_id):
+        """Forget an inactive version (it is loaded again when needed)"""
+        with self._lock:
+            if self._active[0] != version_id:
+                self._versions.pop(version_id, None)
+
+    def list_versions(self):
+        with self._lock:
+            return [
+                {k: v for k, v in info.items() if k != 'model'}
+                for info in self._versions.values()
+            ]
+
+    def _evict(self):
+        """Drop the oldest ready versions beyond max_versions (caller holds the lock)"""
+        for version_id in list(self._versions):
+            if len(self._versions) <= self.max_versions:
+                break
+            info = self._versions[version_id]
+            if info['status'] != 'ready':
+                continue
+            del self._versions[version_id]
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class NotificationDispatcher:
+    """
+    Bounded queue + worker pool for push notifications
+
+    - submit(send, **kwargs) is a non-blocking put; the caller (a Socket.IO
+      handler) never waits on the push provider
+    - Worker threads run send(**kwargs), each call inside context() so it
+      gets its own DB session
+    - When the queue is full, notifications are dropped and counted: a
+      missed push is better than a stalled chat
+    - stats() exposes queue depth, queue wait and send latency (recent
+      p50/p95 per notification kind) and sent/undelivered/failed/dropped
+      counts. send returning False counts as undelivered, raising as failed
+    """
+
+    def __init__(self, workers=4, max_queue=10000, context=None, latency_window=1000):
+        self.workers = workers
+        self.context = context  # () -> context manager around each send
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = None
+        self._latency_window = latency_window
+        self.max_depth = 0
+        self.submitted = 0
+        self.dropped = 0
+        self._kinds = defaultdict(lambda: {
+            'sent': 0,
+            'undelivered': 0,
+            'failed': 0,
+            'latency_ms': deque(maxlen=self._latency_window),
+            'wait_ms': deque(maxlen=self._latency_window)
+        })
+
+    def submit(self, send, **kwargs):
+        """Queue send(**kwargs); False if it was dropped"""
+        if self._threads is None:
+            self._start()
+        try:
+            self._queue.put_nowait((send, kwargs, time.monotonic()))
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ [NOTIFY] Queue full, dropped {send.__name__}")
+            return False
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = [
+                    threading.Thread(target=self._run, name=f"notify-worker-{i}", daemon=True)
+                    for i in range(self.workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    def _run(self):
+        while True:
+            send, kwargs, queued_at = self._queue.get()
+            start = time.monotonic()
+            outcome = 'failed'
+            try:
+                if self.context:
+                    with self.context():
+                        result = send(**kwargs)
+                else:
+                    result = send(**kwargs)
+                outcome = 'sent' if result else 'undelivered'
+            except Exception as e:
+                print(f"❌ [NOTIFY] {send.__name__} failed: {e}")
+            finally:
+                done = time.monotonic()
+                with self._lock:
+                    kind = self._kinds[send.__name__]
+                    kind[outcome] += 1
+                    kind['wait_ms'].append((start - queued_at) * 1000)
+                    kind['latency_ms'].append((done - start) * 1000)
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued notification has been handled"""
+        if self._threads is not None:
+            self._queue.join()
+
+    @staticmethod
+    def _percentile(values, fraction):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {
+                name: dict(kind, latency_ms=list(kind['latency_ms']), wait_ms=list(kind['wait_ms']))
+                for name, kind in self._kinds.items()
+            }
+
+        kinds = {}
+        for name, kind in snapshot.items():
+            latency, wait = kind['latency_ms'], kind['wait_ms']
+            kinds[name] = {
+                'sent': kind['sent'],
+                'undelivered': kind['undelivered'],
+                'failed': kind['failed'],
+                'send_ms_p50': self._percentile(latency, 0.5),
+                'send_ms_p95': self._percentile(latency, 0.95),
+                'wait_ms_p95': self._percentile(wait, 0.95)
+            }
+        return {
+            'workers': self.workers,
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_depth,
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'kinds': kinds
+        }
+
+
+class NotificationCoalescer:
+    """
+    Collapses notifications that share a key (receiver, conversation)
+
+    - add(key, item) opens a window for a new key or joins the open one
+    - When a window closes (window seconds after it opened), flush(key,
+      items) gets everything added to it, in order, on the coalescer's
+      thread; it should only hand off (e.g. to a NotificationDispatcher)
+    - Every window has the same length, so they close in the order they
+      opened and one timer thread serves all of them
+    """
+
+    def __init__(self, flush, window=5.0):
+        self.flush = flush
+        self.window = window
+        self._pending = {}  # key -> [items]
+        self._deadlines = deque()  # (deadline, key), oldest first
+        self._cond = threading.Condition()
+        self._thread = None
+        self.added = 0
+        self.windows = 0
+
+    def add(self, key, item):
+        """Queue item under key; True if it opened a new window"""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notify-coalescer', daemon=True)
+                self._thread.start()
+            self.added += 1
+            if key in self._pending:
+                self._pending[key].append(item)
+                return False
+            self._pending[key] = [item]
+            self._deadlines.append((time.monotonic() + self.window, key))
+            self.windows += 1
+            self._cond.notify()
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._deadlines:
+                    self._cond.wait()
+                deadline, key = self._deadlines[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._deadlines.popleft()
+                items = self._pending.pop(key)
+            self._flush(key, items)
+
+    def _flush(self, key, items):
+        try:
+            self.flush(key, items)
+        except Exception as e:
+            print(f"❌ [NOTIFY] Flushing {key} failed: {e}")
+
+    def flush_all(self):
+        """Close every open window now"""
+        with self._cond:
+            pending = [(key, self._pending.pop(key)) for _, key in self._deadlines]
+            self._deadlines.clear()
+        for key, items in pending:
+            self._flush(key, items)
+
+    def stats(self):
+        return {
+            'window_seconds': self.window,
+            'open_windows': len(self._pending),
+            'added': self.added,
+            'windows': self.windows,
+            'collapsed': self.added - self.windows
+        }
@@ -0,0 +1,494 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+class PresenceRegistry:
+    """
+    Who is connected, on which sockets, in which rooms
+
+    - sid -> user and user -> {sids} maps, so connect, disconnect and
+      lookups are O(1) whatever the number of connections
+    - A user can have several sockets (tabs, devices); they come online with
+      the first one and go offline only when the last one disconnects
+    - Rooms are tracked per socket, since Socket.IO rooms belong to sids
+    - User ids are normalised to str: clients send them as either type
+    - One lock guards everything; handlers run on many threads in
+      async_mode='threading'
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._user_by_sid = {}  # sid -> user id
+        self._sids_by_user = {}  # user id -> {sids}
+        self._rooms_by_sid = {}  # sid -> {rooms}
+        self._last_active = {}  # user id -> time.monotonic() of their last socket event
+        self._announced = set()  # users their contacts were last told are online
+        self.connects = 0
+        self.disconnects = 0
+
+    def connect(self, sid, user_id):
+        """Register a socket; True if it is the user's first (they came online)"""
+        user_id = str(user_id)
+        with self._lock:
+            previous = self._user_by_sid.get(sid)
+            if previous is not None and previous != user_id:
+                self._drop_sid(sid, previous)
+            self._user_by_sid[sid] = user_id
+            self._rooms_by_sid.setdefault(sid, set())
+            sids = self._sids_by_user.setdefault(user_id, set())
+            came_online = not sids
+            sids.add(sid)
+            self._last_active[user_id] = time.monotonic()
+            self.connects += 1
+            return came_online
+
+    def disconnect(self, sid):
+        """Forget a socket; (user id, went offline) or (None, False) if unknown"""
+        with self._lock:
+            user_id = self._user_by_sid.pop(sid, None)
+            self._rooms_by_sid.pop(sid, None)
+            if user_id is None:
+                return None, False
+            self.disconnects += 1
+            return user_id, self._drop_sid(sid, user_id)
+
+    def _drop_sid(self, sid, user_id):
+        sids = self._sids_by_user.get(user_id)
+        if sids is None:
+            return False
+        sids.discard(sid)
+        if sids:
+            return False
+        del self._sids_by_user[user_id]
+        self._last_active.pop(user_id, None)
+        return True
+
+    def join(self, sid, room):
+        """Record that a registered socket joined room"""
+        with self._lock:
+            rooms = self._rooms_by_sid.get(sid)
+            if rooms is not None:
+                rooms.add(str(room))
+
+    def leave(self, sid, room):
+        with self._lock:
+            rooms = self._rooms_by_sid.get(sid)
+            if rooms is not None:
+                rooms.discard(str(room))
+
+    def touch(self, user_id):
+        """Record socket activity for an online user"""
+        user_id = str(user_id)
+        with self._lock:
+            if user_id in self._sids_by_user:
+                self._last_active[user_id] = time.monotonic()
+
+    def user_for(self, sid):
+        return self._user_by_sid.get(sid)
+
+    def sids(self, user_id):
+        """The user's live sockets (a copy, safe to iterate)"""
+        with self._lock:
+            return set(self._sids_by_user.get(str(user_id), ()))
+
+    def is_online(self, user_id):
+        return str(user_id) in self._sids_by_user
+
+    def idle_seconds(self, user_id):
+        """Seconds since the user's last socket event, None if offline"""
+        last = self._last_active.get(str(user_id))
+        return None if last is None else time.monotonic() - last
+
+    def in_room(self, user_id, room):
+        """True if any of the user's sockets joined room"""
+        room = str(room)
+        with self._lock:
+            return any(room in self._rooms_by_sid.get(sid, ())
+                       for sid in self._sids_by_user.get(str(user_id), ()))
+
+    def rooms(self, user_id):
+        with self._lock:
+            rooms = set()
+            for sid in self._sids_by_user.get(str(user_id), ()):
+                rooms |= self._rooms_by_sid.get(sid, set())
+            return rooms
+
+    def online_users(self, limit=None):
+        with self._lock:
+            return list(self._sids_by_user)[:limit]
+
+    def announce(self, user_id, status):
+        """Record the status contacts are told; False if it is what they already know"""
+        user_id = str(user_id)
+        with self._lock:
+            if (user_id in self._announced) == (status == 'online'):
+                return False
+            if status == 'online':
+                self._announced.add(user_id)
+            else:
+                self._announced.discard(user_id)
+            return True
+
+    def snapshot(self, limit=None):
+        """{user id: {sid: [rooms]}} for debug endpoints (at most limit users)"""
+        with self._lock:
+            return {
+                user_id: {sid: sorted(self._rooms_by_sid.get(sid, ())) for sid in self._sids_by_user[user_id]}
+                for user_id in list(self._sids_by_user)[:limit]
+            }
+
+    def stats(self):
+        return {
+            'online_users': len(self._sids_by_user),
+            'sockets': len(self._user_by_sid),
+            'connects': self.connects,
+            'disconnects': self.disconnects
+        }
+
+
+class SharedPresenceRegistry:
+    """
+    PresenceRegistry with its state in a store shared by every process
+
+    - Same interface as PresenceRegistry, so handlers don't care which one
+      they get; store is a socket_broker.BrokerClient or RedisStore
+    - {prefix}:sids:{user} holds the user's sockets on every worker and
+      {prefix}:rooms:{sid} a socket's rooms; the store's add/remove return
+      the set size atomically, which decides online/offline transitions
+    - Only sid -> user stays local: a socket disconnects on the worker that
+      accepted it
+    - Activity times are wall-clock (time.time()) since they are compared
+      across processes, and written at most once per touch_interval
+    - purge_local() at shutdown removes what this worker still holds. For a
+      worker that dies without it (crash, SIGKILL), every worker writes a
+      heartbeat each heartbeat_interval and lists its sockets under
+      {prefix}:worker:{worker_id}; the others sweep a worker whose
+      heartbeat is dead_after seconds old and call on_offline(user_id)
+      for each user that took offline
+    - A worker that was swept while alive (stalled too long) puts its
+      sockets and rooms back on its next heartbeat
+    """
+
+    def __init__(self, store, prefix='presence', touch_interval=1.0, heartbeat_interval=5.0,
+                 dead_after=None, on_offline=None):
+        self.store = store
+        self.prefix = prefix
+        self.touch_interval = touch_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.dead_after = dead_after or heartbeat_interval * 3
+        self.on_offline = on_offline
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._user_by_sid = {}  # sid -> user id, sockets on this process
+        self._rooms_by_sid = {}  # sid -> {rooms}, to restore them after a sweep
+        self._touched = {}  # user id -> when this process last wrote their activity
+        self._thread = None
+        self._registered = False
+        self.connects = 0
+        self.disconnects = 0
+        self.swept_workers = 0
+        self.swept_sockets = 0
+
+    def _sids_key(self, user_id):
+        return f"{self.prefix}:sids:{user_id}"
+
+    def _rooms_key(self, sid):
+        return f"{self.prefix}:rooms:{sid}"
+
+    def _worker_key(self, worker_id):
+        return f"{self.prefix}:worker:{worker_id}"
+
+    def connect(self, sid, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            first = self._thread is None
+            if first:
+                self._thread = threading.Thread(target=self._run, name='presence-heartbeat', daemon=True)
+            previous = self._user_by_sid.get(sid)
+            self._user_by_sid[sid] = user_id
+            self._rooms_by_sid.setdefault(sid, set())
+            self.connects += 1
+        if first:
+            self.heartbeat()  # registered before its first socket, so a crash can be swept
+            self._thread.start()
+        if previous is not None and previous != user_id:
+            self.store.remove(self._sids_key(previous), sid)
+            self.store.remove(self._worker_key(self.worker_id), f"{previous} {sid}")
+        self.store.add(self._worker_key(self.worker_id), f"{user_id} {sid}")
+        _, size = self.store.add(self._sids_key(user_id), sid)
+        self._write_activity(user_id)
+        return size == 1
+
+    def disconnect(self, sid):
+        with self._lock:
+            user_id = self._user_by_sid.pop(sid, None)
+            self._rooms_by_sid.pop(sid, None)
+            if user_id is None:
+                return None, False
+            self.disconnects += 1
+        self.store.delete(self._rooms_key(sid))
+        self.store.remove(self._worker_key(self.worker_id), f"{user_id} {sid}")
+        _, size = self.store.remove(self._sids_key(user_id), sid)
+        if size == 0:
+            self.store.hdel(f"{self.prefix}:active", user_id)
+            self._touched.pop(user_id, None)
+        return user_id, size == 0
+
+    def purge_local(self):
+        """Disconnect every socket this process still holds (at shutdown)"""
+        for sid in list(self._user_by_sid):
+            self.disconnect(sid)
+        self.store.remove(f"{self.prefix}:workers", self.worker_id)
+        self.store.hdel(f"{self.prefix}:heartbeats", self.worker_id)
+
+    def join(self, sid, room):
+        with self._lock:
+            rooms = self._rooms_by_sid.get(sid)
+            if rooms is None:
+                return
+            rooms.add(str(room))
+        self.store.add(self._rooms_key(sid), str(room))
+
+    def leave(self, sid, room):
+        with self._lock:
+            rooms = self._rooms_by_sid.get(sid)
+            if rooms is None:
+                return
+            rooms.discard(str(room))
+        self.store.remove(self._rooms_key(sid), str(room))
+
+    def _run(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.heartbeat()
+                for user_id in self.sweep():
+                    if self.on_offline:
+                        self.on_offline(user_id)
+            except Exception as e:
+                print(f"❌ [PRESENCE] Heartbeat failed: {e}")
+
+    def heartbeat(self):
+        """Tell the other workers this one is alive; restore its sockets if it was swept"""
+        self.store.hset(f"{self.prefix}:heartbeats", self.worker_id, time.time())
+        rejoined, _ = self.store.add(f"{self.prefix}:workers", self.worker_id)
+        was_registered, self._registered = self._registered, True
+        if rejoined and was_registered:
+            with self._lock:
+                sockets = [(sid, user_id, set(self._rooms_by_sid.get(sid, ())))
+                           for sid, user_id in self._user_by_sid.items()]
+            for sid, user_id, rooms in sockets:
+                self.store.add(self._worker_key(self.worker_id), f"{user_id} {sid}")
+                self.store.add(self._sids_key(user_id), sid)
+                for room in rooms:
+                    self.store.add(self._rooms_key(sid), room)
+            print(f"⚠️ [PRESENCE] Worker {self.worker_id} was swept; restored {len(sockets)} sockets")
+
+    def sweep(self):
+        """Drop the sockets of workers whose heartbeat stopped -> users that went offline"""
+        now = time.time()
+        offline = []
+        for worker_id in self.store.members(f"{self.prefix}:workers"):
+            if worker_id == self.worker_id:
+                continue
+            beat = self.store.hget(f"{self.prefix}:heartbeats", worker_id)
+            if beat is not None and now - float(beat) < self.dead_after:
+                continue
+            for entry in self.store.members(self._worker_key(worker_id)):
+                user_id, sid = entry.split(' ', 1)
+                self.store.delete(self._rooms_key(sid))
+                removed, size = self.store.remove(self._sids_key(user_id), sid)
+                if removed:
+                    self.swept_sockets += 1
+                    if size == 0:
+                        self.store.hdel(f"{self.prefix}:active", user_id)
+                        offline.append(user_id)
+            self.store.delete(self._worker_key(worker_id))
+            self.store.hdel(f"{self.prefix}:heartbeats", worker_id)
+            self.store.remove(f"{self.prefix}:workers", worker_id)
+            self.swept_workers += 1
+            print(f"🧹 [PRESENCE] Swept dead worker {worker_id}")
+        return offline
+
+    def _write_activity(self, user_id):
+        now = time.time()
+        self._touched[user_id] = now
+        self.store.hset(f"{self.prefix}:active", user_id, now)
+
+    def touch(self, user_id):
+        user_id = str(user_id)
+        if time.time() - self._touched.get(user_id, 0) < self.touch_interval:
+            return
+        if self.is_online(user_id):
+            self._write_activity(user_id)
+
+    def user_for(self, sid):
+        return self._user_by_sid.get(sid)
+
+    def sids(self, user_id):
+        return self.store.members(self._sids_key(user_id))
+
+    def is_online(self, user_id):
+        return self.store.count(self._sids_key(user_id)) > 0
+
+    def idle_seconds(self, user_id):
+        last = self.store.hget(f"{self.prefix}:active", str(user_id))
+        if last is None or not self.is_online(user_id):
+            return None
+        return time.time() - float(last)
+
+    def in_room(self, user_id, room):
+        return any(self.store.contains(self._rooms_key(sid), str(room)) for sid in self.sids(user_id))
+
+    def rooms(self, user_id):
+        rooms = set()
+        for sid in self.sids(user_id):
+            rooms |= self.store.members(self._rooms_key(sid))
+        return rooms
+
+    def online_users(self, limit=None):
+        """Online users on every worker, at most limit (scans the store: debug and admin use only)"""
+        prefix = self._sids_key('')
+        return [key[len(prefix):] for key in self.store.keys(prefix, limit)]
+
+    def announce(self, user_id, status):
+        key = f"{self.prefix}:announced"
+        if status == 'online':
+            changed, _ = self.store.add(key, str(user_id))
+        else:
+            changed, _ = self.store.remove(key, str(user_id))
+        return changed
+
+    def snapshot(self, limit=None):
+        return {
+            user_id: {sid: sorted(self.store.members(self._rooms_key(sid))) for sid in self.sids(user_id)}
+            for user_id in self.online_users(limit)
+        }
+
+    def stats(self):
+        return {
+            'online_users': len(self.online_users()),
+            'sockets': len(self._user_by_sid),
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'shared': True,
+            'worker_id': self.worker_id,
+            'swept_workers': self.swept_workers,
+            'swept_sockets': self.swept_sockets
+        }
+
+
+class PresenceFanout:
+    """
+    Delivers online/offline changes to a user's contacts only, in batches
+
+    - changed(user_id, status) records the user's latest status; nothing is
+      sent until the window (seconds) after the first pending change closes
+    - Within a window only the last status per user counts, and a user who
+      ends the window in the status their contacts last saw (a reconnect
+      after a deploy, a page reload) is not announced at all
+    - status(user_id), if given, is asked for the user's current status at
+      flush instead of trusting the last change seen here (with several
+      processes, the disconnect and the reconnect may land on different ones)
+    - announce(user_id, status) -> False when contacts already know that
+      status; by default remembered here, SharedPresenceRegistry.announce
+      shares it between processes
+    - At flush, contacts(user_ids) -> {user id: {contact ids}} is called
+      once for all changed users (one query), then deliver(recipient,
+      payload) once per change per contact; deliver returns False when the
+      recipient has no live socket
+    - Runs on its own thread, each flush inside context() if given
+    """
+
+    def __init__(self, contacts, deliver, window=1.0, context=None, status=None, announce=None):
+        self.contacts = contacts
+        self.deliver = deliver
+        self.status = status
+        self.announce = announce or self._announce_locally
+        self.window = window
+        self.context = context  # () -> context manager around each flush
+        self._pending = {}  # user id -> latest status
+        self._published = {}  # user id -> status last sent to contacts (absent: offline)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.changes = 0
+        self.suppressed = 0
+        self.published = 0
+        self.delivered = 0
+        self.flushes = 0
+
+    def changed(self, user_id, status):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='presence-fanout', daemon=True)
+                self._thread.start()
+            self.changes += 1
+            if str(user_id) in self._pending:
+                self.suppressed += 1
+            self._pending[str(user_id)] = status
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self.window)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ [PRESENCE] Fan-out failed: {e}")
+
+    def flush(self):
+        """Publish every pending change now"""
+        with self._flush_lock:
+            with self._cond:
+                pending, self._pending = self._pending, {}
+            changes = {}
+            for user_id, status in pending.items():
+                if self.status:
+                    status = self.status(user_id)
+                if not self.announce(user_id, status):
+                    self.suppressed += 1
+                    continue
+                changes[user_id] = status
+            if not changes:
+                return
+            
+            if self.context:
+                with self.context():
+                    contacts = self.contacts(list(changes))
+            else:
+                contacts = self.contacts(list(changes))
+            
+            self.flushes += 1
+            for user_id, status in changes.items():
+                self.published += 1
+                payload = {'userId': user_id, 'status': status}
+                for contact_id in contacts.get(user_id, ()):
+                    if self.deliver(contact_id, payload):
+                        self.delivered += 1
+
+    def _announce_locally(self, user_id, status):
+        if self._published.get(user_id, 'offline') == status:
+            return False
+        if status == 'online':
+            self._published[user_id] = status
+        else:
+            self._published.pop(user_id, None)
+        return True
+
+    def stats(self):
+        return {
+            'window_seconds': self.window,
+            'pending': len(self._pending),
+            'changes': self.changes,
+            'suppressed': self.suppressed,
+            'published': self.published,
+            'delivered': self.delivered,
+            'flushes': self.flushes
+        }
@@ -0,0 +1,268 @@
+"""
+Offline replay evaluation of matcher configurations
+
+Streams a match outcome log (from `flask export-match-events outcomes
+outcomes.npz`, or the CSV export) through a fresh RLTutorMatchingSystem per
+configuration. Every event is first scored, then learned from: the model
+ranks the logged tutor against a sample of other tutors seen so far, and
+only then records the outcome. So each event is judged by a model that has
+only seen the events before it.
+
+Metrics per configuration:
+    replay_reward   mean logged reward over events where the logged tutor
+                    made the model's top-k (replay_matches of them)
+    ndcg_at_k       reward-weighted NDCG@k of the logged tutor
+    mrr             mean reciprocal rank of the logged tutor
+
+These are sanity checks, not estimates of how a configuration would do
+live. The logged tutor was picked by the serving policy (with its random
+exploration) and the student, and the log has no propensity for that pick,
+so events can't be inverse-propensity weighted: every event counts the
+same, and the metrics favour configurations that rank like the logging
+policy. Use them to catch regressions and broken configs; compare
+configurations for real with an experiment (experiments.py).
+
+Configurations are independent, so they run in parallel on a process pool.
+
+Usage (from educonnect-backend/):
+    python replay.py outcomes.npz --grid performance_blend=0.2,0.3,0.4 epsilon=0.05,0.15
+    python replay.py outcomes.csv --configs configs.json --workers 4 --output results.json
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from event_log import iter_npz_chunks
+from ml_matcher import RLTutorMatchingSystem
+
+# Keys a configuration may set: constructor arguments, then attributes
+CONSTRUCTOR_KEYS = ('learning_rate', 'discount_factor', 'epsilon', 'performance_blend',
+                    'state_buckets', 'coarse_states')
+ATTRIBUTE_KEYS = ('base_weights', 'subject_groups')
+
+_EVENT_COLUMNS = ('id', 'student_id', 'tutor_id', 'reward', 'outcome',
+                  'student_features', 'tutor_features')
+
+
+def build_matcher(config):
+    """A fresh RLTutorMatchingSystem for one configuration dict"""
+    unknown = set(config) - set(CONSTRUCTOR_KEYS) - set(ATTRIBUTE_KEYS) - {'name'}
+    if unknown:
+        raise ValueError(f"Unknown config keys: {sorted(unknown)}")
+
+    matcher = RLTutorMatchingSystem(**{k: config[k] for k in CONSTRUCTOR_KEYS if k in config})
+    for key in ATTRIBUTE_KEYS:
+        if key in config:
+            setattr(matcher, key, config[key])
+    return matcher
+
+
+def iter_outcome_events(path):
+    """
+    Stream (id, student_id, tutor_id, reward, outcome, student_features,
+    tutor_features) from an outcome export; the last three stay JSON text
+    """
+    if path.endswith('.npz'):
+        for chunk in iter_npz_chunks(path):
+            yield from zip(*(chunk[column].tolist() for column in _EVENT_COLUMNS))
+        return
+
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield (int(row['id']), int(row['student_id']), int(row['tutor_id']),
+                   float(row['reward']), row['outcome'], row['student_features'],
+                   row['tutor_features'])
+
+
+def replay(config, path, top_k=3, candidates=20, seed=0, cache_size=200000):
+    """Replay one configuration over the log and return its metrics"""
+    matcher = build_matcher(config)
+    parse = lru_cache(maxsize=cache_size)(json.loads)
+
+    tutor_pool = []  # tutor ids in first-seen order
+    tutor_features = {}  # tutor id -> latest features JSON
+    student_features_seen = {}  # student id -> features JSON last learned from
+    feature_rows = {}  # (student JSON, tutor JSON) -> raw feature scores
+
+    events = hits = 0
+    hit_reward = dcg = total_reward = reciprocal_ranks = 0.0
+    start = time.perf_counter()
+
+    for event_id, student_id, tutor_id, reward, outcome, student_json, tutor_json in iter_outcome_events(path):
+        student_id = str(student_id)
+
+        # The cached features belong to an older version of this profile
+        if student_features_seen.get(student_id) != student_json:
+            matcher.invalidate_student_cache(student_id)
+            student_features_seen[student_id] = student_json
+
+        if tutor_id not in tutor_features:
+            tutor_pool.append(tutor_id)
+        tutor_features[tutor_id] = tutor_json
+
+        # Same candidates for every configuration: seeded by the event id
+        if len(tutor_pool) > candidates + 1:
+            sampled = random.Random(seed * 1000003 + event_id).sample(tutor_pool, candidates + 1)
+        else:
+            sampled = tutor_pool
+        candidate_ids = [tutor_id] + [t for t in sampled if t != tutor_id][:candidates]
+
+        student_features = parse(student_json)
+        keys = [(student_json, tutor_features[t]) for t in candidate_ids]
+        missing = [key for key in keys if key not in feature_rows]
+        if missing:
+            if len(feature_rows) + len(missing) > cache_size:
+                feature_rows.clear()
+                missing = keys
+            computed = matcher.feature_score_matrix(
+                student_features, [parse(key[1]) for key in missing]
+            )
+            feature_rows.update(zip(missing, computed))
+
+        scores = matcher.blend_scores(
+            student_id,
+            np.array([feature_rows[key] for key in keys]),
+            candidate_ids
+        )
+        rank = 1 + int(np.count_nonzero(scores[1:] > scores[0]))
+
+        events += 1
+        total_reward += reward
+        reciprocal_ranks += 1.0 / rank
+        if rank <= top_k:
+            hits += 1
+            hit_reward += reward
+            dcg += reward / math.log2(rank + 1)
+
+        matcher.record_match_outcome(
+            student_id,
+            tutor_id,
+            {'features': student_features},
+            {'id': tutor_id, 'features': parse(tutor_json)},
+            parse(outcome)
+        )
+
+    elapsed = time.perf_counter() - start
+    return {
+        'estimator': 'unweighted (sanity check)',
+        'events': events,
+        'replay_matches': hits,
+        'replay_reward': round(hit_reward / hits, 4) if hits else None,
+        # The ideal ranking puts the logged tutor first (gain = reward, discount 1)
+        f'ndcg_at_{top_k}': round(dcg / total_reward, 4) if total_reward else None,
+        'mrr': round(reciprocal_ranks / events, 4) if events else None,
+        'logged_reward': round(total_reward / events, 4) if events else None,
+        'seconds': round(elapsed, 2),
+        'events_per_minute': int(events / elapsed * 60) if elapsed else None
+    }
+
+
+def _replay_task(name, config, path, options):
+    return name, replay(config, path, **options)
+
+
+def run_replays(configs, path, workers=None, **options):
+    """
+    Replay {name: config} in parallel, one process per configuration
+
+    Returns {name: metrics} in the order of configs.
+    """
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_replay_task, name, config, path, options)
+            for name, config in configs.items()
+        ]
+        for future in futures:
+            name, metrics = future.result()
+            results[name] = metrics
+    return results
+
+
+def parse_grid(specs):
+    """['epsilon=0.05,0.15', 'performance_blend=0.3'] -> {name: config} (cartesian product)"""
+    axes = []
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        if not values:
+            raise ValueError(f"Grid entries look like key=v1,v2 (got {spec!r})")
+        axes.append([(key, json.loads(value)) for value in values.split(',')])
+
+    return {
+        ','.join(f"{key}={value}" for key, value in combo): dict(combo)
+        for combo in itertools.product(*axes)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('log', help='Outcome export (.npz or .csv)')
+    parser.add_argument('--configs', help='JSON file: list of configs, each with a "name"')
+    parser.add_argument('--grid', nargs='+', default=[], metavar='KEY=V1,V2')
+    parser.add_argument('--no-baseline', action='store_true', help="Don't replay the default config")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--candidates', type=int, default=20,
+                        help='Other tutors the logged tutor is ranked against per event')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    configs = {} if args.no_baseline else {'baseline': {}}
+    if args.configs:
+        with open(args.configs) as f:
+            for i, config in enumerate(json.load(f)):
+                configs[config.get('name', f"config{i}")] = config
+    try:
+        configs.update(parse_grid(args.grid))
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not configs:
+        parser.error('Nothing to replay')
+    for config in configs.values():
+        try:
+            build_matcher(config)  # fail fast on bad keys
+        except (ValueError, TypeError) as e:
+            parser.error(str(e))
+
+    start = time.perf_counter()
+    results = run_replays(configs, args.log, workers=args.workers, top_k=args.top_k,
+                          candidates=args.candidates, seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    ndcg = f'ndcg_at_{args.top_k}'
+    width = max(len(name) for name in results)
+    print(f"{'config':<{width}} {'events':>8} {'matches':>8} {'replay rew':>10} "
+          f"{ndcg:>10} {'mrr':>7} {'events/min':>11}")
+    for name, m in results.items():
+        print(f"{name:<{width}} {m['events']:>8} {m['replay_matches']:>8} "
+              f"{m['replay_reward'] if m['replay_reward'] is not None else '-':>10} "
+              f"{m[ndcg] if m[ndcg] is not None else '-':>10} "
+              f"{m['mrr'] if m['mrr'] is not None else '-':>7} "
+              f"{m['events_per_minute'] or 0:>11,}")
+
+    total_events = sum(m['events'] for m in results.values())
+    print("\n⚠️ Unweighted metrics (the log has no propensities): a sanity check, "
+          "not an estimate of live performance")
+    print(f"{len(results)} configs, {total_events:,} events replayed in {elapsed:.1f}s "
+          f"({int(total_events / elapsed * 60):,} events/min overall)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+How the app is served: SOCKETIO_ASYNC_MODE
+
+- threading (default): one OS thread per connection, works with the plain
+  Werkzeug server and gunicorn's sync worker
+- gevent / eventlet: cooperative greenlets, thousands of idle sockets per
+  process. gunicorn.conf.py picks the matching worker class
+- patch() monkey-patches the standard library for the cooperative modes;
+  app.py calls it before anything else imports socket or threading
+- offload(fn, *args, **kwargs) runs a call that would stall the event loop
+  (bcrypt, SMTP, Cloudinary, FCM) on a real OS thread pool of
+  BLOCKING_POOL_SIZE threads; under threading it is a plain call
+"""
+import os
+
+ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+ASYNC_MODES = ('threading', 'gevent', 'eventlet')
+BLOCKING_POOL_SIZE = int(os.getenv('BLOCKING_POOL_SIZE', '10'))
+
+
+def patch():
+    if ASYNC_MODE not in ASYNC_MODES:
+        raise ValueError(f"SOCKETIO_ASYNC_MODE must be one of {', '.join(ASYNC_MODES)}, not {ASYNC_MODE!r}")
+    if ASYNC_MODE == 'threading':
+        return
+
+    if ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+        import gevent
+        gevent.get_hub().threadpool.maxsize = BLOCKING_POOL_SIZE
+    else:
+        os.environ.setdefault('EVENTLET_THREADPOOL_SIZE', str(BLOCKING_POOL_SIZE))
+        import eventlet
+        eventlet.monkey_patch()
+
+    # psycopg2 is C code the monkey-patching can't reach
+    try:
+        if ASYNC_MODE == 'gevent':
+            from psycogreen.gevent import patch_psycopg
+        else:
+            from psycogreen.eventlet import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        print(f"⚠️ [SERVING] psycogreen not installed: Postgres queries will block the {ASYNC_MODE} loop")
+    print(f"✅ [SERVING] {ASYNC_MODE} mode, {BLOCKING_POOL_SIZE} threads for blocking calls")
+
+
+def offload(fn, *args, **kwargs):
+    """fn(*args, **kwargs), off the event loop in the cooperative modes"""
+    if ASYNC_MODE == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
@@ -0,0 +1,368 @@
+"""
+Backends that let several processes serve Socket.IO together
+
+- socketio_options(url): SocketIO() kwargs for a message queue URL. Any
+  Flask-SocketIO queue URL (redis://, amqp://, kafka://, zmq+tcp://) is
+  passed through as message_queue; broker://host:port uses BrokerManager
+- presence_store_url(message_queue, store_url): where presence lives.
+  PRESENCE_STORE_URL when set; otherwise the queue URL, but only a
+  redis:// or broker:// queue can also hold presence, so any other queue
+  needs PRESENCE_STORE_URL
+- open_store(url): the shared store behind SharedPresenceRegistry
+  (presence.py), for redis:// or broker:// URLs
+- LocalBroker: a stand-in broker (pub/sub plus a few set/hash commands)
+  for development and for testing several workers on one machine. Run it
+  with `python socket_broker.py --port 7379`; it keeps everything in memory
+  and is not meant for production
+"""
+import argparse
+import itertools
+import json
+import select
+import socket
+import socketserver
+import threading
+import time
+import urllib.parse
+
+import socketio
+
+
+class LocalBroker:
+    """
+    In-memory pub/sub and set/hash store over TCP, one JSON object per line
+
+    Every command runs under one lock, so each is atomic. A connection that
+    sends subscribe turns into a stream of {"channel", "data"} lines.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._lock = threading.Lock()
+        self._data = {}  # key -> set or dict
+        self._subscribers = {}  # channel -> {handler}
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.write_lock = threading.Lock()
+                try:
+                    for line in self.rfile:
+                        request = json.loads(line)
+                        if request['op'] == 'subscribe':
+                            broker._subscribe(request['args'][0], self)
+                            continue
+                        try:
+                            reply = {'result': broker.execute(request['op'], *request.get('args', []))}
+                        except Exception as e:
+                            reply = {'error': str(e)}
+                        self.send(reply)
+                except ConnectionError:
+                    pass  # a worker went away
+
+            def send(self, payload):
+                with self.write_lock:
+                    self.wfile.write(json.dumps(payload).encode() + b'\n')
+                    self.wfile.flush()
+
+            def finish(self):
+                broker._unsubscribe(self)
+                super().finish()
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self.url = f"broker://{self.host}:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='local-broker', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _subscribe(self, channel, handler):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(handler)
+
+    def _unsubscribe(self, handler):
+        with self._lock:
+            for handlers in self._subscribers.values():
+                handlers.discard(handler)
+
+    def execute(self, op, *args):
+        with self._lock:
+            if op == 'publish':
+                channel, data = args
+                handlers = list(self._subscribers.get(channel, ()))
+            else:
+                return getattr(self, f"_op_{op}")(*args)
+        for handler in handlers:
+            try:
+                handler.send({'channel': channel, 'data': data})
+            except OSError:
+                self._unsubscribe(handler)
+        return len(handlers)
+
+    def _op_add(self, key, member):
+        members = self._data.setdefault(key, set())
+        added = member not in members
+        members.add(member)
+        return [added, len(members)]
+
+    def _op_remove(self, key, member):
+        members = self._data.get(key, set())
+        removed = member in members
+        members.discard(member)
+        if not members:
+            self._data.pop(key, None)
+        return [removed, len(members)]
+
+    def _op_members(self, key):
+        return sorted(self._data.get(key, ()))
+
+    def _op_contains(self, key, member):
+        return member in self._data.get(key, ())
+
+    def _op_count(self, key):
+        return len(self._data.get(key, ()))
+
+    def _op_hset(self, key, field, value):
+        self._data.setdefault(key, {})[field] = value
+
+    def _op_hget(self, key, field):
+        return self._data.get(key, {}).get(field)
+
+    def _op_hdel(self, key, field):
+        fields = self._data.get(key, {})
+        fields.pop(field, None)
+        if not fields:
+            self._data.pop(key, None)
+
+    def _op_delete(self, key):
+        self._data.pop(key, None)
+
+    def _op_keys(self, prefix, limit=None):
+        return list(itertools.islice((key for key in self._data if key.startswith(prefix)), limit))
+
+
+class BrokerClient:
+    """
+    Client for LocalBroker; the store API SharedPresenceRegistry expects
+
+    A connection the broker closed while idle is replaced before sending.
+    Once a command has gone out, only read-only ones are retried: running
+    add/remove twice would report the wrong transition, so a failure
+    there is raised instead.
+    """
+    READ_ONLY = frozenset({'members', 'contains', 'count', 'hget', 'keys'})
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.address = (parts.hostname or '127.0.0.1', parts.port or 7379)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        conn = socket.create_connection(self.address)
+        return conn, conn.makefile('rwb')
+
+    def _open(self):
+        """The connection, reconnecting if the broker closed it (nothing is pending between calls)"""
+        if self._conn is not None:
+            conn, _ = self._conn
+            try:
+                readable, _, _ = select.select([conn], [], [], 0)
+                closed = bool(readable) and conn.recv(1, socket.MSG_PEEK) == b''
+            except OSError:
+                closed = True
+            if closed:
+                self._close()
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn[1]
+
+    def _close(self):
+        conn, _ = self._conn
+        self._conn = None
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _call(self, op, *args):
+        with self._lock:
+            for attempt in (1, 2):
+                stream = self._open()
+                try:
+                    stream.write(json.dumps({'op': op, 'args': list(args)}).encode() + b'\n')
+                    stream.flush()
+                    line = stream.readline()
+                    if not line:
+                        raise ConnectionError('broker closed the connection')
+                    break
+                except OSError:
+                    self._close()
+                    if attempt == 2 or op not in self.READ_ONLY:
+                        raise
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def add(self, key, member):
+        """(added, size after)"""
+        return tuple(self._call('add', key, member))
+
+    def remove(self, key, member):
+        """(removed, size after); an emptied set disappears"""
+        return tuple(self._call('remove', key, member))
+
+    def members(self, key):
+        return set(self._call('members', key))
+
+    def contains(self, key, member):
+        return self._call('contains', key, member)
+
+    def count(self, key):
+        return self._call('count', key)
+
+    def hset(self, key, field, value):
+        self._call('hset', key, field, value)
+
+    def hget(self, key, field):
+        return self._call('hget', key, field)
+
+    def hdel(self, key, field):
+        self._call('hdel', key, field)
+
+    def delete(self, key):
+        self._call('delete', key)
+
+    def keys(self, prefix, limit=None):
+        return self._call('keys', prefix, limit)
+
+    def publish(self, channel, data):
+        return self._call('publish', channel, data)
+
+    def listen(self, channel):
+        """Yield every message published on channel, reconnecting if needed"""
+        retry_sleep = 1
+        while True:
+            try:
+                conn, stream = self._connect()
+                stream.write(json.dumps({'op': 'subscribe', 'args': [channel]}).encode() + b'\n')
+                stream.flush()
+                retry_sleep = 1
+                for line in stream:
+                    yield json.loads(line)['data']
+                conn.close()
+            except OSError as e:
+                print(f"⚠️ [BROKER] Lost {self.address}: {e}, retrying in {retry_sleep}s")
+            time.sleep(retry_sleep)
+            retry_sleep = min(retry_sleep * 2, 30)
+
+
+class BrokerManager(socketio.PubSubManager):
+    """Socket.IO client manager that relays emits between processes through LocalBroker"""
+    name = 'broker'
+
+    def __init__(self, url, channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.client = BrokerClient(url)
+
+    def _publish(self, data):
+        return self.client.publish(self.channel, json.dumps(data))
+
+    def _listen(self):
+        yield from self.client.listen(self.channel)
+
+
+class RedisStore:
+    """The BrokerClient store API on Redis (needs the redis package)"""
+
+    def __init__(self, url):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def add(self, key, member):
+        pipe = self.redis.pipeline()
+        pipe.sadd(key, member)
+        pipe.scard(key)
+        added, size = pipe.execute()
+        return bool(added), size
+
+    def remove(self, key, member):
+        pipe = self.redis.pipeline()
+        pipe.srem(key, member)
+        pipe.scard(key)
+        removed, size = pipe.execute()
+        return bool(removed), size
+
+    def members(self, key):
+        return self.redis.smembers(key)
+
+    def contains(self, key, member):
+        return bool(self.redis.sismember(key, member))
+
+    def count(self, key):
+        return self.redis.scard(key)
+
+    def hset(self, key, field, value):
+        self.redis.hset(key, field, value)
+
+    def hget(self, key, field):
+        value = self.redis.hget(key, field)
+        return None if value is None else float(value)
+
+    def hdel(self, key, field):
+        self.redis.hdel(key, field)
+
+    def delete(self, key):
+        self.redis.delete(key)
+
+    def keys(self, prefix, limit=None):
+        return list(itertools.islice(self.redis.scan_iter(match=prefix + '*'), limit))
+
+
+def socketio_options(url, channel='flask-socketio'):
+    """SocketIO() kwargs for a message queue URL; {} for a single process"""
+    if not url:
+        return {}
+    if url.startswith('broker://'):
+        return {'client_manager': BrokerManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+
+STORE_SCHEMES = ('broker://', 'redis://', 'rediss://')
+
+
+def presence_store_url(message_queue, store_url=None):
+    """The shared presence store URL, or None for in-process presence"""
+    if store_url:
+        return store_url
+    if not message_queue:
+        return None
+    if message_queue.startswith(STORE_SCHEMES):
+        return message_queue
+    raise ValueError(f"SOCKETIO_MESSAGE_QUEUE {message_queue.split(':', 1)[0]}:// can't hold presence; "
+                     f"set PRESENCE_STORE_URL to a redis:// or broker:// URL")
+
+
+def open_store(url):
+    if url.startswith('broker://'):
+        return BrokerClient(url)
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisStore(url)
+    raise ValueError(f"No shared presence store for {url.split(':', 1)[0]}:// (use redis:// or broker://)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stand-in Socket.IO message queue and presence store')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7379)
+    args = parser.parse_args()
+    broker = LocalBroker(args.host, args.port)
+    print(f"📡 [BROKER] Listening on {broker.url}")
+    broker._server.serve_forever()
@@ -0,0 +1,116 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class TypingThrottle:
+    """
+    Typing indicator state per (user, conversation), so keystrokes don't
+    turn into one room emit each
+
+    - typing(): idle -> typing emits user_typing at once; while typing,
+      user_typing is re-sent at most once per interval (clients hide the
+      indicator a few seconds after the last one) and other events are dropped
+    - stop(): typing -> idle emits user_stopped_typing; a stop while idle
+      is dropped
+    - No typing event for timeout seconds: user_stopped_typing is sent for
+      the client (lost stop_typing, closed tab)
+    - clear(): back to idle without an emit, e.g. when the message is sent
+    - emit(event, payload, room, skip_sid) does the sending; it is called
+      from the handler's thread or, for timeouts, the throttle's own
+    """
+
+    def __init__(self, emit, interval=2.0, timeout=5.0):
+        self.emit = emit
+        self.interval = interval
+        self.timeout = timeout
+        self._states = {}  # (str user id, str room) -> {'last_emit', 'last_seen', 'sid', 'payload'}
+        self._deadlines = []  # heap of (deadline, seq, key, state); re-checked when due
+        self._seq = itertools.count()  # tie-breaker, so states are never compared
+        self._cond = threading.Condition()
+        self._thread = None
+        self.received = 0
+        self.dropped = 0
+        self.emitted = {'user_typing': 0, 'user_stopped_typing': 0}
+        self.timed_out = 0
+
+    def typing(self, user_id, room, sid=None):
+        key = (str(user_id), str(room))
+        now = time.monotonic()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='typing-throttle', daemon=True)
+                self._thread.start()
+            self.received += 1
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = {
+                    'last_emit': None, 'last_seen': now, 'sid': sid,
+                    'payload': {'userId': user_id, 'conversationId': room}
+                }
+                heapq.heappush(self._deadlines, (now + self.timeout, next(self._seq), key, state))
+                self._cond.notify()
+            state['last_seen'] = now
+            state['sid'] = sid
+            if state['last_emit'] is not None and now - state['last_emit'] < self.interval:
+                self.dropped += 1
+                return False
+            state['last_emit'] = now
+            self.emitted['user_typing'] += 1
+        self.emit('user_typing', {'userId': user_id, 'conversationId': room}, room, sid)
+        return True
+
+    def stop(self, user_id, room, sid=None):
+        with self._cond:
+            self.received += 1
+            state = self._states.pop((str(user_id), str(room)), None)
+            if state is None:
+                self.dropped += 1
+                return False
+            self.emitted['user_stopped_typing'] += 1
+        self.emit('user_stopped_typing', {'userId': user_id, 'conversationId': room}, room, sid)
+        return True
+
+    def clear(self, user_id, room):
+        with self._cond:
+            self._states.pop((str(user_id), str(room)), None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._deadlines:
+                    self._cond.wait()
+                deadline, _, key, queued = self._deadlines[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                heapq.heappop(self._deadlines)
+                state = self._states.get(key)
+                if state is not queued:
+                    continue  # stopped (and maybe restarted) since
+                expires = state['last_seen'] + self.timeout
+                if expires > time.monotonic():
+                    heapq.heappush(self._deadlines, (expires, next(self._seq), key, state))
+                    continue
+                del self._states[key]
+                self.timed_out += 1
+                self.emitted['user_stopped_typing'] += 1
+            try:
+                self.emit('user_stopped_typing', state['payload'], state['payload']['conversationId'], state['sid'])
+            except Exception as e:
+                print(f"❌ [TYPING] Timing out {key} failed: {e}")
+
+    def stats(self):
+        emitted = sum(self.emitted.values())
+        return {
+            'interval_seconds': self.interval,
+            'timeout_seconds': self.timeout,
+            'typing_now': len(self._states),
+            'received': self.received,
+            'emitted': dict(self.emitted, total=emitted),
+            'dropped': self.dropped,
+            'timed_out': self.timed_out,
+            'emit_ratio': round(emitted / self.received, 3) if self.received else None
+        }
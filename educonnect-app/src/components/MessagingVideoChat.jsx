@@ -6,6 +6,8 @@ import io from 'socket.io-client';
 import DailyVideoCall from './JitsiVideoCall';
 
 const API_URL = process.env.REACT_APP_API_URL || 'https://hult.onrender.com';
+// Messages per page; scrolling back loads the page before the oldest one shown
+const MESSAGE_PAGE_SIZE = 50;
 
 const MessagingVideoChat = ({ currentUserId = 'user123' }) => {
   const [tutors, setTutors] = useState([]);
@@ -19,9 +21,14 @@ const MessagingVideoChat = ({ currentUserId = 'user123' }) => {
   const [connectionStatus, setConnectionStatus] = useState('disconnected');
   const [conversationId, setConversationId] = useState(null);
   const [searchQuery, setSearchQuery] = useState('');
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
 
   const socketRef = useRef(null);
   const messagesEndRef = useRef(null);
+  const messagesContainerRef = useRef(null);
+  const scrollAnchorRef = useRef(null);
   const typingTimeoutRef = useRef(null);
 
   const scrollToBottom = () => {
@@ -34,10 +41,48 @@ const MessagingVideoChat = ({ currentUserId = 'user123' }) => {
   const [audioChunks, setAudioChunks] = useState([]);
   const fileInputRef = useRef(null);
 
+  // After older messages are put on top, keep the view where it was
+  // instead of jumping to the bottom
   useEffect(() => {
+    const container = messagesContainerRef.current;
+    if (scrollAnchorRef.current !== null && container) {
+      container.scrollTop += container.scrollHeight - scrollAnchorRef.current;
+      scrollAnchorRef.current = null;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
+  const loadOlderMessages = async () => {
+    const currentConversationId = conversationId;
+    if (!olderCursor || loadingOlder || typeof currentConversationId !== 'number') return;
+
+    setLoadingOlder(true);
+    try {
+      const res = await fetch(
+        `${API_URL}/api/conversations/${currentConversationId}/messages?limit=${MESSAGE_PAGE_SIZE}&before=${encodeURIComponent(olderCursor)}`
+      );
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const data = await res.json();
+      const older = (data.messages || []).map(m => ({
+        ...m,
+        isOwn: String(m.sender_id) === String(currentUserId)
+      }));
+      scrollAnchorRef.current = messagesContainerRef.current ? messagesContainerRef.current.scrollHeight : null;
+      setMessages(prev => {
+        const shown = new Set(prev.map(m => m.id));
+        return [...older.filter(m => !shown.has(m.id)), ...prev];
+      });
+      setOlderCursor(data.older_cursor);
+      setHasOlder(data.has_older);
+      console.log('[STUDENT] Loaded older messages:', older.length);
+    } catch (err) {
+      console.error('[STUDENT] Failed to load older messages:', err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   // Initialize Socket.IO connection
   useEffect(() => {
     console.log('🔌 [STUDENT] Connecting to Socket.IO server...');
@@ -154,6 +199,8 @@ const MessagingVideoChat = ({ currentUserId = 'user123' }) => {
     setSelectedTutor(tutor);
     setShowMessages(true);
     setLoading(true);
+    setOlderCursor(null);
+    setHasOlder(false);
 
     try {
       const tutorProfileId = tutor.tutor_profile_id || tutor.id;
@@ -178,18 +225,30 @@ const MessagingVideoChat = ({ currentUserId = 'user123' }) => {
           if (conv && conv.id) {
             setConversationId(conv.id);
             
-            const messagesRes = await fetch(`${API_URL}/api/conversations/${conv.id}/messages`);
+            const messagesRes = await fetch(`${API_URL}/api/conversations/${conv.id}/messages?limit=${MESSAGE_PAGE_SIZE}`);
             if (messagesRes.ok) {
               const messagesData = await messagesRes.json();
               const processedMessages = (messagesData.messages || []).map(m => ({
                 ...m,
                 isOwn: String(m.sender_id) === String(currentUserId)
               }));
+              setOlderCursor(messagesData.older_cursor);
+              setHasOlder(messagesData.has_older);
               console.log('[STUDENT] Loaded messages from database:', processedMessages.length);
               if (processedMessages.length > 0) {
                 console.log('[STUDENT] Last message data:', processedMessages[processedMessages.length - 1]);
               }
               setMessages(processedMessages);
+
+              // Opening the chat reads it: move the server's read cursor too
+              const lastMessage = processedMessages[processedMessages.length - 1];
+              if (socketRef.current && lastMessage) {
+                socketRef.current.emit('mark_as_read', {
+                  conversationId: conv.id,
+                  userId: currentUserId,
+                  messageIds: [lastMessage.id]
+                });
+              }
               setLoading(false);
               return;
             }
@@ -640,7 +699,7 @@ const MessagingVideoChat = ({ currentUserId = 'user123' }) => {
           </div>
 
           {/* Messages Container */}
-          <div className="flex-1 p-4 overflow-y-auto bg-gray-50">
+          <div ref={messagesContainerRef} className="flex-1 p-4 overflow-y-auto bg-gray-50">
             {loading ? (
               <div className="flex items-center justify-center h-full">
                 <p className="text-gray-500">Loading messages...</p>
@@ -651,6 +710,17 @@ const MessagingVideoChat = ({ currentUserId = 'user123' }) => {
               </div>
             ) : (
               <div className="flex flex-col space-y-3">
+                {hasOlder && (
+                  <div className="flex justify-center">
+                    <button
+                      onClick={loadOlderMessages}
+                      disabled={loadingOlder}
+                      className="text-sm text-blue-600 hover:underline disabled:text-gray-400"
+                    >
+                      {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                    </button>
+                  </div>
+                )}
                 {messages.map((msg) => {
                   // Debug log
                   console.log('Rendering message:', {
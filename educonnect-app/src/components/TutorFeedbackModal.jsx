@@ -256,34 +256,68 @@ const TutorFeedbackModal = ({ tutor, onClose, onSubmit }) => {
   );
 };
 
+// Match results carry only tutor_id, tutor_name, match_score and
+// explanation_id; the breakdown is fetched the first time details are opened
 const TutorMatchCard = ({ match, onFeedback, showPerformance = true }) => {
   const [showDetails, setShowDetails] = useState(false);
+  const [explanation, setExplanation] = useState(null);
+  const [loadingDetails, setLoadingDetails] = useState(false);
+  const [detailsError, setDetailsError] = useState(null);
+
+  const toggleDetails = async () => {
+    const opening = !showDetails;
+    setShowDetails(opening);
+    if (!opening || explanation || loadingDetails || !match.explanation_id) return;
+
+    setLoadingDetails(true);
+    setDetailsError(null);
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`${API_URL}/api/match/explain/${match.explanation_id}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || 'Failed to load match details');
+      }
+      setExplanation(data.explanation);
+    } catch (error) {
+      console.error('Error loading match details:', error);
+      setDetailsError('Could not load match details. Please try again.');
+    } finally {
+      setLoadingDetails(false);
+    }
+  };
+
+  const breakdown = explanation ? explanation.breakdown : null;
 
   return (
     <div className="bg-white rounded-xl shadow-lg p-6 hover:shadow-xl transition">
       <div className="flex justify-between items-start mb-4">
         <div>
           <h3 className="text-xl font-bold text-gray-800">{match.tutor_name}</h3>
-          <div className="flex items-center gap-2 mt-1">
-            <div className="flex">
-              {[...Array(5)].map((_, i) => (
-                <Star
-                  key={i}
-                  size={16}
-                  className={
-                    i < Math.round(match.breakdown.rating / 20)
-                      ? 'fill-yellow-400 text-yellow-400'
-                      : 'text-gray-300'
-                  }
-                />
-              ))}
+          {breakdown && (
+            <div className="flex items-center gap-2 mt-1">
+              <div className="flex">
+                {[...Array(5)].map((_, i) => (
+                  <Star
+                    key={i}
+                    size={16}
+                    className={
+                      i < Math.round(breakdown.rating / 20)
+                        ? 'fill-yellow-400 text-yellow-400'
+                        : 'text-gray-300'
+                    }
+                  />
+                ))}
+              </div>
+              {showPerformance && explanation.total_matches > 0 && (
+                <span className="text-xs text-gray-500">
+                  ({explanation.total_matches} past matches)
+                </span>
+              )}
             </div>
-            {showPerformance && match.total_matches > 0 && (
-              <span className="text-xs text-gray-500">
-                ({match.total_matches} past matches)
-              </span>
-            )}
-          </div>
+          )}
         </div>
         <div className="text-right">
           <div className="text-3xl font-bold text-blue-600">{match.match_score}%</div>
@@ -291,62 +325,12 @@ const TutorMatchCard = ({ match, onFeedback, showPerformance = true }) => {
         </div>
       </div>
 
-      {/* Performance Badge */}
-      {showPerformance && match.breakdown.performance_score && (
-        <div className="mb-4 inline-block">
-          <div className="bg-gradient-to-r from-purple-500 to-pink-500 text-white px-3 py-1 rounded-full text-xs font-semibold">
-            🏆 Performance Score: {match.breakdown.performance_score}%
-          </div>
-        </div>
-      )}
-
-      {/* Quick Stats */}
-      <div className="grid grid-cols-3 gap-2 mb-4">
-        <div className="bg-blue-50 p-2 rounded text-center">
-          <div className="text-sm font-bold text-blue-600">
-            {match.breakdown.subject_match}%
-          </div>
-          <div className="text-xs text-gray-600">Subject</div>
-        </div>
-        <div className="bg-green-50 p-2 rounded text-center">
-          <div className="text-sm font-bold text-green-600">
-            {match.breakdown.skill_compatibility}%
-          </div>
-          <div className="text-xs text-gray-600">Skills</div>
-        </div>
-        <div className="bg-purple-50 p-2 rounded text-center">
-          <div className="text-sm font-bold text-purple-600">
-            {match.breakdown.schedule_match}%
-          </div>
-          <div className="text-xs text-gray-600">Schedule</div>
-        </div>
-      </div>
-
-      {/* Success Rate */}
-      {showPerformance && match.success_rate !== null && match.total_matches > 5 && (
-        <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-3 mb-4">
-          <div className="flex items-center justify-between">
-            <span className="text-sm font-semibold text-yellow-800">
-              📊 Historical Success Rate
-            </span>
-            <span className="text-sm font-bold text-yellow-800">
-              {(match.success_rate * 100).toFixed(0)}%
-            </span>
-          </div>
-          <div className="mt-2 bg-yellow-200 rounded-full h-2">
-            <div
-              className="bg-yellow-600 h-2 rounded-full transition-all"
-              style={{ width: `${match.success_rate * 100}%` }}
-            ></div>
-          </div>
-        </div>
-      )}
-
       {/* Actions */}
       <div className="flex gap-2">
         <button
-          onClick={() => setShowDetails(!showDetails)}
-          className="flex-1 border-2 border-gray-200 text-gray-700 py-2 rounded-lg hover:bg-gray-50 transition text-sm font-semibold"
+          onClick={toggleDetails}
+          disabled={!match.explanation_id}
+          className="flex-1 border-2 border-gray-200 text-gray-700 py-2 rounded-lg hover:bg-gray-50 transition text-sm font-semibold disabled:opacity-50"
         >
           {showDetails ? 'Hide Details' : 'View Details'}
         </button>
@@ -360,27 +344,72 @@ const TutorMatchCard = ({ match, onFeedback, showPerformance = true }) => {
         )}
       </div>
 
+      {showDetails && loadingDetails && (
+        <div className="mt-4 pt-4 border-t flex items-center justify-center gap-2 text-sm text-gray-500">
+          <div className="w-4 h-4 border-2 border-blue-500 border-t-transparent rounded-full animate-spin"></div>
+          Loading details...
+        </div>
+      )}
+
+      {showDetails && detailsError && (
+        <div className="mt-4 pt-4 border-t flex items-center gap-2 text-sm text-red-600">
+          <AlertCircle size={16} />
+          {detailsError}
+        </div>
+      )}
+
       {/* Detailed Breakdown */}
-      {showDetails && (
-        <div className="mt-4 pt-4 border-t space-y-2">
-          {Object.entries(match.breakdown).map(([key, value]) => (
-            <div key={key} className="flex justify-between items-center">
-              <span className="text-sm text-gray-600 capitalize">
-                {key.replace(/_/g, ' ')}
-              </span>
-              <div className="flex items-center gap-2">
-                <div className="w-32 bg-gray-200 rounded-full h-2">
-                  <div
-                    className="bg-blue-500 h-2 rounded-full transition-all"
-                    style={{ width: `${value}%` }}
-                  ></div>
-                </div>
-                <span className="text-sm font-semibold text-gray-700 w-12 text-right">
-                  {value}%
+      {showDetails && breakdown && (
+        <div className="mt-4 pt-4 border-t">
+          {/* Performance Badge */}
+          {showPerformance && breakdown.performance_score !== undefined && (
+            <div className="mb-4 inline-block">
+              <div className="bg-gradient-to-r from-purple-500 to-pink-500 text-white px-3 py-1 rounded-full text-xs font-semibold">
+                🏆 Performance Score: {breakdown.performance_score}%
+              </div>
+            </div>
+          )}
+
+          {/* Success Rate */}
+          {showPerformance && explanation.success_rate !== null && explanation.total_matches > 5 && (
+            <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-3 mb-4">
+              <div className="flex items-center justify-between">
+                <span className="text-sm font-semibold text-yellow-800">
+                  📊 Historical Success Rate
                 </span>
+                <span className="text-sm font-bold text-yellow-800">
+                  {(explanation.success_rate * 100).toFixed(0)}%
+                </span>
+              </div>
+              <div className="mt-2 bg-yellow-200 rounded-full h-2">
+                <div
+                  className="bg-yellow-600 h-2 rounded-full transition-all"
+                  style={{ width: `${explanation.success_rate * 100}%` }}
+                ></div>
               </div>
             </div>
-          ))}
+          )}
+
+          <div className="space-y-2">
+            {Object.entries(breakdown).map(([key, value]) => (
+              <div key={key} className="flex justify-between items-center">
+                <span className="text-sm text-gray-600 capitalize">
+                  {key.replace(/_/g, ' ')}
+                </span>
+                <div className="flex items-center gap-2">
+                  <div className="w-32 bg-gray-200 rounded-full h-2">
+                    <div
+                      className="bg-blue-500 h-2 rounded-full transition-all"
+                      style={{ width: `${value}%` }}
+                    ></div>
+                  </div>
+                  <span className="text-sm font-semibold text-gray-700 w-12 text-right">
+                    {value}%
+                  </span>
+                </div>
+              </div>
+            ))}
+          </div>
         </div>
       )}
     </div>
@@ -4,6 +4,8 @@ import io from 'socket.io-client';
 import { Video, PhoneOff } from 'lucide-react';
 import DailyVideoCall from './JitsiVideoCall';
 const API_URL = process.env.REACT_APP_API_URL || 'https://hult.onrender.com';
+// Messages per page; scrolling back loads the page before the oldest one shown
+const MESSAGE_PAGE_SIZE = 50;
 
 const TutorMessagingView = ({ 
   currentTutorUserId,  
@@ -19,8 +21,13 @@ const TutorMessagingView = ({
   const [isTyping, setIsTyping] = useState(false);
   const [onlineUsers, setOnlineUsers] = useState(new Set());
   const [connectionStatus, setConnectionStatus] = useState('disconnected');
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   
   const messagesEndRef = useRef(null);
+  const messagesContainerRef = useRef(null);
+  const scrollAnchorRef = useRef(null);
   const socketRef = useRef(null);
   const typingTimeoutRef = useRef(null);
 
@@ -326,10 +333,48 @@ const sendMessage = async () => {
     }
   };
 
+  // After older messages are put on top, keep the view where it was
+  // instead of jumping to the bottom
   useEffect(() => {
+    const container = messagesContainerRef.current;
+    if (scrollAnchorRef.current !== null && container) {
+      container.scrollTop += container.scrollHeight - scrollAnchorRef.current;
+      scrollAnchorRef.current = null;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
+  const loadOlderMessages = async () => {
+    const currentConversationId = selectedConversation?.id;
+    if (!olderCursor || loadingOlder || typeof currentConversationId !== 'number') return;
+
+    setLoadingOlder(true);
+    try {
+      const res = await fetch(
+        `${API_URL}/api/conversations/${currentConversationId}/messages?limit=${MESSAGE_PAGE_SIZE}&before=${encodeURIComponent(olderCursor)}`
+      );
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const data = await res.json();
+      const older = (data.messages || []).map(m => ({
+        ...m,
+        isOwn: String(m.sender_id) === String(currentTutorUserId)
+      }));
+      scrollAnchorRef.current = messagesContainerRef.current ? messagesContainerRef.current.scrollHeight : null;
+      setMessages(prev => {
+        const shown = new Set(prev.map(m => m.id));
+        return [...older.filter(m => !shown.has(m.id)), ...prev];
+      });
+      setOlderCursor(data.older_cursor);
+      setHasOlder(data.has_older);
+      console.log('[TUTOR] Loaded older messages:', older.length);
+    } catch (err) {
+      console.error('[TUTOR] Failed to load older messages:', err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   // Initialize Socket.IO
   useEffect(() => {
     console.log('🔌 [TUTOR] Connecting to Socket.IO server...');
@@ -554,6 +599,8 @@ const sendMessage = async () => {
     
     setSelectedConversation(conversation);
     setLoading(true);
+    setOlderCursor(null);
+    setHasOlder(false);
 
     const studentId = conversation.studentId || conversation.partnerId;
     
@@ -580,7 +627,7 @@ const sendMessage = async () => {
     try {
       if (typeof conversation.id === 'number') {
         console.log('[TUTOR] Loading messages from database...');
-        const messagesRes = await fetch(`${API_URL}/api/conversations/${conversation.id}/messages`);
+        const messagesRes = await fetch(`${API_URL}/api/conversations/${conversation.id}/messages?limit=${MESSAGE_PAGE_SIZE}`);
         
         if (messagesRes.ok) {
           const messagesData = await messagesRes.json();
@@ -588,11 +635,23 @@ const sendMessage = async () => {
             ...m,
             isOwn: String(m.sender_id) === String(currentTutorUserId)
           }));
+          setOlderCursor(messagesData.older_cursor);
+          setHasOlder(messagesData.has_older);
           console.log('[TUTOR] Loaded messages from database:', processedMessages.length);
           if (processedMessages.length > 0) {
             console.log('[TUTOR] Last message data:', processedMessages[processedMessages.length - 1]);
           }
           setMessages(processedMessages);
+
+          // Opening the chat reads it: move the server's read cursor too
+          const lastMessage = processedMessages[processedMessages.length - 1];
+          if (socketRef.current && lastMessage) {
+            socketRef.current.emit('mark_as_read', {
+              conversationId: conversation.id,
+              userId: currentTutorUserId,
+              messageIds: [lastMessage.id]
+            });
+          }
           setLoading(false);
           return;
         }
@@ -769,7 +828,7 @@ const sendMessage = async () => {
           </div>
 
           <div className="flex flex-col" style={{ height: 'calc(100vh - 180px)' }}>
-            <div className="flex-1 overflow-y-auto p-4 bg-gray-50">
+            <div ref={messagesContainerRef} className="flex-1 overflow-y-auto p-4 bg-gray-50">
               {loading ? (
                 <div className="flex items-center justify-center h-full">
                   <p className="text-gray-500">Loading messages...</p>
@@ -783,6 +842,17 @@ const sendMessage = async () => {
                 </div>
               ) : (
                 <div className="flex flex-col space-y-3 max-w-4xl mx-auto">
+                  {hasOlder && (
+                    <div className="flex justify-center">
+                      <button
+                        onClick={loadOlderMessages}
+                        disabled={loadingOlder}
+                        className="text-sm text-blue-600 hover:underline disabled:text-gray-400"
+                      >
+                        {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                      </button>
+                    </div>
+                  )}
                   {messages.map((msg) => {
                     // Debug log
                     console.log('Rendering message:', {